@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+""" Benchmarks for miniglumpy uploads, shaders and drawing
+
+Runs headless by default, for example on Mesa llvmpipe over EGL::
+
+    python bench_miniglumpy.py --output results.json
+    python bench_miniglumpy.py --compare baseline.json --output new.json
+
+Each benchmark records the best time in seconds over several repeats, so
+lower is better, with derived rates for information.  ``--compare`` prints
+the ratio of each time to the baseline, and exits with status 1 if any
+benchmark is slower than the baseline by more than ``--threshold``.
+
+Shader compile timings clear the miniglumpy program cache, and disable the
+Mesa shader cache unless ``MESA_SHADER_CACHE_DISABLE`` is already set.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from collections import OrderedDict
+
+import numpy as np
+import pyglet
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(func):
+    ''' Register benchmark function `func` '''
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def best_time(func, repeat=5, number=1):
+    ''' Best time in seconds per call of `func` over `repeat` runs
+
+    Waits for the GL to finish at the end of each run.
+    '''
+    import pyglet.gl as gl
+    times = []
+    for i in range(repeat):
+        gl.glFinish()
+        start = time.time()
+        for j in range(number):
+            func()
+        gl.glFinish()
+        times.append((time.time() - start) / number)
+    return min(times)
+
+
+@benchmark
+def upload(quick=False):
+    ''' Texture2D.set_data and make_texture for dtypes and shapes '''
+    from miniglumpy.textures import Texture2D, make_texture
+    results = OrderedDict()
+    sizes = (256, 1024) if quick else (256, 1024, 2048)
+    for dtype in ('uint8', 'uint16', 'int16', 'float16', 'float32',
+                  'float64'):
+        for size in sizes:
+            arr = (np.random.random((size, size)) * 100).astype(dtype)
+            texture = Texture2D(arr)
+            seconds = best_time(lambda: texture.set_data(arr))
+            name = 'set_data.%s.%d' % (dtype, size)
+            results[name] = dict(seconds=seconds,
+                                 mb_per_s=arr.nbytes / seconds / 2**20)
+            results['make_texture.%s.%d' % (dtype, size)] = dict(
+                seconds=best_time(lambda: make_texture(arr), repeat=3))
+    return results
+
+
+@benchmark
+def glice_update(quick=False):
+    ''' Window (vmin, vmax) change and redraw, shader and pixel transfer '''
+    import miniglumpy
+    arr = np.random.random((1024, 1024)).astype(np.float32)
+    results = OrderedDict()
+    for mode in ('shader', 'pixel_transfer'):
+        glice = miniglumpy.Glice(arr, vmin=0, vmax=1,
+                                 pixel_transfer=mode == 'pixel_transfer')
+        state = [0]
+
+        def change():
+            state[0] += 1
+            glice.vmax = 1 + (state[0] % 2) * 0.5
+            glice.update()
+            glice.blit(0, 0, 64, 64)
+        results['window_change.%s' % mode] = dict(
+            seconds=best_time(change, number=10))
+    return results
+
+
+@benchmark
+def shaders(quick=False):
+    ''' Shader construction, compiling and linking, with empty caches '''
+    from miniglumpy import gshaders
+    from miniglumpy.contexts import context_cache
+    gshaders.set_program_cache_dir(None)
+    results = OrderedDict()
+    for klass in (gshaders.Nearest, gshaders.Bilinear, gshaders.Bicubic):
+        def construct():
+            context_cache('programs').clear()
+            klass(True, False)
+        results['compile.%s' % klass.__name__] = dict(
+            seconds=best_time(construct, repeat=3))
+        results['cached.%s' % klass.__name__] = dict(
+            seconds=best_time(lambda: klass(True, False), number=10))
+    return results
+
+
+@benchmark
+def bicubic_kernel(quick=False):
+    ''' Kernel weights and kernel texture construction '''
+    from miniglumpy.gshaders.bicubic import build_kernel, kernel_weights
+    from miniglumpy.contexts import context_cache
+
+    def build():
+        context_cache('bicubic_kernels').clear()
+        build_kernel()
+    return OrderedDict((
+        ('kernel_weights', dict(seconds=best_time(kernel_weights,
+                                                  number=10))),
+        ('build_kernel', dict(seconds=best_time(build, number=10)))))
+
+
+@benchmark
+def blit(quick=False):
+    ''' CPU overhead per blit of small slice '''
+    import miniglumpy
+    glice = miniglumpy.Glice(np.random.random((64, 64)).astype(np.float32))
+    results = OrderedDict()
+    for name, shader in (('nearest', miniglumpy.gshaders.Nearest(True)),
+                         ('bicubic', miniglumpy.gshaders.Bicubic(True))):
+        glice.shader = shader
+        seconds = best_time(lambda: glice.blit(0, 0, 8, 8), number=200)
+        results[name] = dict(seconds=seconds, per_s=1 / seconds)
+    return results
+
+
+@benchmark
+def bicubic_fill(quick=False):
+    ''' Bicubic fill rate, one pass of 16 fetches and separable passes '''
+    import miniglumpy
+    from miniglumpy.offscreen import OffscreenTarget
+    size = 512 if quick else 1024
+    target = OffscreenTarget(size, size)
+    glice = miniglumpy.Glice(
+        np.random.random((size // 2, size // 2)).astype(np.float32))
+    results = OrderedDict()
+    for name, separable in (('one_pass', False), ('separable', True)):
+        glice.shader = miniglumpy.gshaders.Bicubic(True, separable=separable)
+        with target:
+            seconds = best_time(lambda: glice.blit(0, 0, size, size),
+                                number=5)
+        results['%s.%d' % (name, size)] = dict(
+            seconds=seconds, mpixels_per_s=size * size / seconds / 1e6)
+    return results
+
+
+@benchmark
+def slices(quick=False):
+    ''' Frames per second for scenes of N slices, blits and batched '''
+    import miniglumpy
+    import pyglet.gl as gl
+    shader = miniglumpy.gshaders.Nearest(True)
+    results = OrderedDict()
+    for n in ((16,) if quick else (16, 64, 256)):
+        glices = [miniglumpy.Glice(
+            np.random.random((128, 128)).astype(np.float32), shader=shader)
+            for i in range(n)]
+        side = int(np.ceil(np.sqrt(n)))
+        size = 256 // side
+        blits = [(glice, (i % side) * size, (i // side) * size, size, size)
+                 for i, glice in enumerate(glices)]
+
+        def frame():
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+            for blit in blits:
+                blit[0].blit(*blit[1:])
+
+        def batched_frame():
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+            miniglumpy.draw_batch(blits)
+        for name, func in (('blits', frame), ('batched', batched_frame)):
+            seconds = best_time(func, number=10)
+            results['%s.%d' % (name, n)] = dict(seconds=seconds,
+                                                fps=1 / seconds)
+    return results
+
+
+def git_revision():
+    ''' Short git revision of the benchmarked tree, or None '''
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'], stderr=devnull,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, quick=False):
+    ''' Run benchmarks `names`, returning results dictionary '''
+    import pyglet.gl as gl
+    window = pyglet.window.Window(256, 256, visible=False)
+    gl.glViewport(0, 0, 256, 256)
+    gl.glMatrixMode(gl.GL_PROJECTION)
+    gl.glLoadIdentity()
+    gl.glOrtho(0, 256, 0, 256, -1, 1)
+    gl.glMatrixMode(gl.GL_MODELVIEW)
+    results = OrderedDict()
+    for name in names:
+        print('%s ...' % name, file=sys.stderr)
+        for key, value in BENCHMARKS[name](quick).items():
+            results['%s.%s' % (name, key)] = value
+    info = OrderedDict((
+        ('revision', git_revision()),
+        ('time', time.strftime('%Y-%m-%dT%H:%M:%S')),
+        ('python', platform.python_version()),
+        ('numpy', np.__version__),
+        ('pyglet', pyglet.version),
+        ('renderer', gl.gl_info.get_renderer()),
+        ('gl_version', gl.gl_info.get_version())))
+    window.close()
+    return OrderedDict((('info', info), ('results', results)))
+
+
+def compare(results, baseline, threshold):
+    ''' Print time ratios to `baseline`; return names of regressions '''
+    regressions = []
+    print('%-45s %12s %12s %7s' % ('benchmark', 'baseline', 'new', 'ratio'))
+    for name, value in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        old = baseline['results'][name]['seconds']
+        new = value['seconds']
+        ratio = new / old
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = ' SLOWER'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = ' faster'
+        print('%-45s %12.3g %12.3g %7.2f%s' % (name, old, new, ratio, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('names', nargs='*',
+                        help='benchmarks to run, from %s; default all'
+                        % ', '.join(BENCHMARKS))
+    parser.add_argument('--output', help='JSON file for results')
+    parser.add_argument('--compare', help='JSON file of baseline results')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='fraction slower than baseline to flag')
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer sizes and scenes')
+    parser.add_argument('--window', action='store_true',
+                        help='use the display rather than running headless')
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error('unknown benchmarks: %s' % ', '.join(unknown))
+    # Time compiles, not the Mesa on-disk shader cache
+    os.environ.setdefault('MESA_SHADER_CACHE_DISABLE', 'true')
+    if not args.window:
+        if 'headless' not in pyglet.options:
+            parser.error('headless rendering needs pyglet >= 1.5; '
+                         'use --window')
+        pyglet.options['headless'] = True
+    results = run(args.names or list(BENCHMARKS), args.quick)
+    if args.output:
+        with open(args.output, 'w') as fobj:
+            json.dump(results, fobj, indent=2)
+    if args.compare:
+        with open(args.compare) as fobj:
+            baseline = json.load(fobj)
+        if compare(results, baseline, args.threshold):
+            return 1
+    else:
+        for name, value in results['results'].items():
+            print('%-45s %12.3g s' % (name, value['seconds']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
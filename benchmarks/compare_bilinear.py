@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+""" Compare hardware filtered and four-fetch Bilinear shader output and speed
+
+Draws random arrays of several dtypes, shapes and zooms with
+``gshaders.Bilinear(hardware=False)`` and ``Bilinear(hardware=True)`` into
+an offscreen target, and prints the largest difference in 8-bit color
+levels and the mean time per blit for each.  Runs headless by default, for
+example on Mesa llvmpipe over EGL.  ``miniglumpy/tests/test_bilinear.py``
+checks the differences.
+"""
+from __future__ import print_function
+
+import time
+import argparse
+
+import numpy as np
+import pyglet
+
+
+def draw(glice, target, n=1):
+    ''' Draw `glice` to fill `target` `n` times; return image, time per draw
+    '''
+    import pyglet.gl as gl
+    with target:
+        target.clear()
+        glice.blit(0, 0, target.width, target.height)
+        gl.glFinish()
+        start = time.time()
+        for i in range(n):
+            glice.blit(0, 0, target.width, target.height)
+        gl.glFinish()
+        seconds = (time.time() - start) / n
+    return target.read(), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='number of blits to time')
+    parser.add_argument('--window', action='store_true',
+                        help='use the display rather than running headless')
+    args = parser.parse_args()
+    if not args.window:
+        if 'headless' not in pyglet.options:
+            parser.error('headless rendering needs pyglet >= 1.5; '
+                         'use --window')
+        pyglet.options['headless'] = True
+    window = pyglet.window.Window(16, 16, visible=False)
+    import miniglumpy
+    from miniglumpy.gshaders import Bilinear
+    from miniglumpy.offscreen import OffscreenTarget
+    rng = np.random.RandomState(42)
+    print('%-8s %-10s %-9s %-9s %6s %12s %12s' % (
+        'dtype', 'shape', 'output', 'elevation', 'diff', '4 fetch s',
+        'hardware s'))
+    for dtype in ('uint8', 'uint16', 'float32'):
+        for shape, out in (((17, 23), (256, 192)), ((256, 256), (1024, 1024)),
+                           ((1024, 768), (300, 200))):
+            arr = rng.rand(*shape)
+            if dtype != 'float32':
+                arr *= np.iinfo(dtype).max
+            arr = arr.astype(dtype)
+            target = OffscreenTarget(*out)
+            for elevation in (0.0, 0.5):
+                glice = miniglumpy.Glice(arr, shader=Bilinear(
+                    True, elevation=elevation))
+                ref, ref_s = draw(glice, target, args.repeat)
+                glice.shader = Bilinear(True, elevation=elevation,
+                                        hardware=True)
+                fast, fast_s = draw(glice, target, args.repeat)
+                diff = np.abs(ref.astype(int) - fast).max()
+                print('%-8s %-10s %-9s %-9s %6d %12.3g %12.3g' % (
+                    dtype, '%dx%d' % shape, '%dx%d' % out, elevation, diff,
+                    ref_s, fast_s))
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+""" Pytest configuration: set pyglet options before miniglumpy imports GL
+
+Without a display, we ask for a pyglet headless (EGL) context where pyglet
+supports it.  Tests needing GL take the ``gl_window`` fixture, and skip if
+there is no context.
+"""
+import os
+
+import pyglet
+
+if not os.environ.get('DISPLAY') and 'headless' in pyglet.options:
+    pyglet.options['headless'] = True
+pyglet.options['shadow_window'] = False
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+""" Draw a grid of slices through a volume with one batched call
+
+Run with ``--headless`` to render offscreen and print draw counts and
+timings for separate blits against the batch.
+"""
+import sys
+import time
+
+import numpy as np
+import pyglet
+if '--headless' in sys.argv:
+    if 'headless' not in pyglet.options:
+        sys.exit('Headless rendering needs pyglet >= 1.5')
+    pyglet.options['headless'] = True
+import miniglumpy
+
+N_ROWS = N_COLS = 8
+N_FRAMES = 50
+
+window = pyglet.window.Window(512, 512, resizable=True,
+                              visible='--headless' not in sys.argv)
+volume = np.random.random((N_ROWS * N_COLS, 64, 64)).astype(np.float32)
+shader = miniglumpy.gshaders.Nearest(True, False)
+slices = [miniglumpy.Glice(vol_slice, shader=shader, vmin=0, vmax=1)
+          for vol_slice in volume]
+
+
+def grid_blits():
+    w = window.width // N_COLS
+    h = window.height // N_ROWS
+    return [(gslice, (i % N_COLS) * w, (i // N_COLS) * h, w, h)
+            for i, gslice in enumerate(slices)]
+
+
+@window.event
+def on_draw():
+    window.clear()
+    miniglumpy.draw_batch(grid_blits())
+
+
+if '--headless' in sys.argv:
+    blits = grid_blits()
+    start = time.time()
+    for i in range(N_FRAMES):
+        for blit in blits:
+            blit[0].blit(*blit[1:])
+    pyglet.gl.glFinish()
+    separate = time.time() - start
+    start = time.time()
+    for i in range(N_FRAMES):
+        stats = miniglumpy.draw_batch(blits)
+    pyglet.gl.glFinish()
+    batched = time.time() - start
+    print('%d blits in %d draws' % stats)
+    print('separate: %.2f ms / frame; batched: %.2f ms / frame'
+          % (separate / N_FRAMES * 1000, batched / N_FRAMES * 1000))
+else:
+    pyglet.app.run()
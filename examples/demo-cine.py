@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+""" Play a time series at a fixed rate from a ring of uploaded frames
+
+Space toggles playback; left / right seek.  Run with ``--headless`` to play
+offscreen for two seconds and print playback statistics.
+"""
+import sys
+import time
+
+import numpy as np
+import pyglet
+if '--headless' in sys.argv:
+    if 'headless' not in pyglet.options:
+        sys.exit('Headless rendering needs pyglet >= 1.5')
+    pyglet.options['headless'] = True
+from pyglet.window import key
+import miniglumpy
+
+window = pyglet.window.Window(512, 512, resizable=True,
+                              visible='--headless' not in sys.argv)
+t, y, x = np.ogrid[0:2 * np.pi:120j, -1:1:256j, -1:1:256j]
+series = np.sin(8 * np.sqrt(x ** 2 + y ** 2) - t).astype(np.float32)
+player = miniglumpy.CinePlayer(series, fps=30, n_textures=8, cmap='viridis')
+player.play()
+
+
+@window.event
+def on_key_press(symbol, modifiers):
+    if symbol == key.SPACE:
+        if player.playing:
+            player.pause()
+        else:
+            player.play()
+    elif symbol in (key.LEFT, key.RIGHT):
+        step = 10 if symbol == key.RIGHT else -10
+        player.seek((player.frame + step) % player.n_frames)
+
+
+@window.event
+def on_draw():
+    window.clear()
+    player.glice.blit(0, 0, window.width, window.height)
+
+
+if '--headless' in sys.argv:
+    start = time.time()
+    while time.time() - start < 2:
+        player.tick()
+        on_draw()
+        window.flip()
+    print(player.stats)
+    player.close()
+else:
+    pyglet.clock.schedule(player.tick)
+    pyglet.app.run()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+""" Grid of volume slices drawn in one call from a texture array
+
+Up / down keys change the slice step, left / right the number of columns,
+and 0, 1, 2 select the slice axis.  Changing step uploads only slices not
+already on the GPU.
+"""
+import numpy as np
+import pyglet
+from pyglet.window import key
+import miniglumpy
+
+window = pyglet.window.Window(768, 768, resizable=True)
+x, y, z = np.ogrid[-1:1:128j, -1:1:128j, -1:1:128j]
+vol = np.sqrt(x ** 2 + y ** 2 + z ** 2).astype(np.float32)
+state = dict(step=2, columns=8)
+lightbox = miniglumpy.LightboxGlice(vol, step=state['step'],
+                                    columns=state['columns'], gap=2,
+                                    cmap='viridis')
+
+
+@window.event
+def on_key_press(symbol, modifiers):
+    if symbol in (key._0, key._1, key._2):
+        lightbox.set_slices(axis=symbol - key._0)
+    elif symbol in (key.UP, key.DOWN):
+        step = state['step'] + (1 if symbol == key.UP else -1)
+        state['step'] = max(step, 1)
+        lightbox.set_slices(step=state['step'])
+    elif symbol in (key.LEFT, key.RIGHT):
+        columns = state['columns'] + (1 if symbol == key.RIGHT else -1)
+        state['columns'] = lightbox.columns = max(columns, 1)
+    print('%d slices, %d uploads' % (len(lightbox.slices), lightbox.uploads))
+
+
+@window.event
+def on_draw():
+    window.clear()
+    lightbox.blit(0, 0, window.width, window.height)
+
+
+pyglet.app.run()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+""" Thresholded statistical map over an anatomical image, in one pass
+
+Up / down keys change the overlay threshold, left / right its opacity.
+"""
+import numpy as np
+import pyglet
+from pyglet.window import key
+import miniglumpy
+
+window = pyglet.window.Window(512, 512, resizable=True)
+y, x = np.ogrid[-1:1:256j, -1:1:256j]
+anatomy = (np.cos(8 * np.sqrt(x ** 2 + y ** 2)) + 1).astype(np.float32)
+y, x = np.ogrid[-1:1:32j, -1:1:32j]
+stats = (6 * np.exp(-((x - 0.3) ** 2 + y ** 2) * 8)).astype(np.float32)
+overlay = miniglumpy.LayeredGlice(
+    [miniglumpy.Glice(anatomy, shader=miniglumpy.gshaders.Bilinear(True)),
+     miniglumpy.Glice(stats, shader=miniglumpy.gshaders.Bilinear(True),
+                      cmap='hot', vmin=2, vmax=6)],
+    thresholds=[None, 2.0], opacities=[1.0, 0.8])
+
+
+@window.event
+def on_key_press(symbol, modifiers):
+    if symbol in (key.UP, key.DOWN):
+        overlay.thresholds[1] += 0.5 if symbol == key.UP else -0.5
+    elif symbol in (key.LEFT, key.RIGHT):
+        opacity = overlay.opacities[1] + (0.1 if symbol == key.RIGHT else -0.1)
+        overlay.opacities[1] = min(max(opacity, 0.0), 1.0)
+
+
+@window.event
+def on_draw():
+    window.clear()
+    overlay.blit(0, 0, window.width, window.height)
+
+
+pyglet.app.run()
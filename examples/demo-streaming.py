@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+""" Stream new frames into a Glice through a ring of pixel buffers
+
+Run with ``--headless`` to render offscreen (for example with Mesa llvmpipe
+over EGL) and print the streaming counters.
+"""
+import sys
+
+import numpy as np
+import pyglet
+if '--headless' in sys.argv:
+    if 'headless' not in pyglet.options:
+        sys.exit('Headless rendering needs pyglet >= 1.5')
+    pyglet.options['headless'] = True
+import miniglumpy
+
+N_FRAMES = 100
+
+window = pyglet.window.Window(512, 512, resizable=True,
+                              visible='--headless' not in sys.argv)
+frames = np.random.random((8, 512, 512)).astype(np.float32)
+gslice = miniglumpy.Glice(frames[0], vmin=0, vmax=1, streaming=2)
+
+
+def next_frame(dt, counter=[0]):
+    counter[0] += 1
+    gslice.set_data(frames[counter[0] % len(frames)])
+
+
+@window.event
+def on_draw():
+    window.clear()
+    gslice.blit(0, 0, window.width, window.height)
+
+
+if '--headless' in sys.argv:
+    for i in range(N_FRAMES):
+        next_frame(0)
+        on_draw()
+        window.flip()
+    print('%d frames, %d bytes streamed' % (gslice.stream.frames_streamed,
+                                           gslice.stream.bytes_streamed))
+else:
+    pyglet.clock.schedule_interval(next_frame, 1 / 30.)
+    pyglet.app.run()
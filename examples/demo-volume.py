@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+""" Scroll through a volume uploaded once as a 3D texture
+
+Up / down keys change slice, and 0, 1, 2 select the slice axis.
+"""
+import numpy as np
+import pyglet
+from pyglet.window import key
+import miniglumpy
+
+window = pyglet.window.Window(512, 512, resizable=True)
+x, y, z = np.ogrid[-1:1:128j, -1:1:128j, -1:1:128j]
+vol = np.sqrt(x ** 2 + y ** 2 + z ** 2).astype(np.float32)
+gslice = miniglumpy.VolumeGlice(vol, shader=miniglumpy.gshaders.Bilinear3D(True))
+
+
+@window.event
+def on_key_press(symbol, modifiers):
+    if symbol in (key._0, key._1, key._2):
+        gslice.set_slice(axis=symbol - key._0)
+    elif symbol in (key.UP, key.DOWN):
+        step = 1 if symbol == key.UP else -1
+        n_slices = gslice.shape[gslice.axis]
+        gslice.set_slice((gslice.index + step) % n_slices)
+
+
+@window.event
+def on_draw():
+    window.clear()
+    gslice.blit(0, 0, window.width, window.height)
+
+
+pyglet.app.run()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+""" Render thumbnails offscreen, and report throughput in images per second
+
+Runs without a display, for example with Mesa llvmpipe over EGL::
+
+    python offscreen-thumbnails.py [n_images] [size]
+
+Compares synchronous readback, which waits for each image, against the
+pipelined readback of ``offscreen.render_thumbnails``.
+"""
+import sys
+import time
+
+import numpy as np
+import pyglet
+if 'headless' not in pyglet.options:
+    sys.exit('Headless rendering needs pyglet >= 1.5')
+pyglet.options['headless'] = True
+import pyglet.gl as gl
+import miniglumpy
+from miniglumpy.offscreen import OffscreenTarget, render_thumbnails
+
+n_images = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+size = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+
+# Hidden window gives us a GL context
+window = pyglet.window.Window(size, size, visible=False)
+images = [np.random.normal(i, 1, (512, 512)).astype(np.float32)
+          for i in range(16)]
+sequence = [images[i % len(images)] for i in range(n_images)]
+target = OffscreenTarget(size, size, n_buffers=3)
+shader = miniglumpy.gshaders.Bilinear(True, False)
+
+# Synchronous: draw, then wait for readback of each image
+glice = miniglumpy.Glice(images[0], shader=shader, cmap='viridis')
+start = time.time()
+for arr in sequence:
+    glice.set_data(arr)
+    glice.vmin, glice.vmax = arr.min(), arr.max()
+    with target:
+        target.clear()
+        glice.blit(0, 0, size, size)
+    thumb = target.read()
+sync_time = time.time() - start
+
+# Pipelined: readback of image N overlaps drawing of N + 1
+start = time.time()
+n_done = 0
+for i, thumb in render_thumbnails(sequence, size, size, target,
+                                  shader=shader, cmap='viridis'):
+    n_done += 1
+async_time = time.time() - start
+assert n_done == n_images
+
+print('%s' % gl.gl_info.get_renderer())
+print('%d thumbnails of %dx%d' % (n_images, size, size))
+print('synchronous readback: %7.1f images / s' % (n_images / sync_time))
+print('pipelined readback:   %7.1f images / s' % (n_images / async_time))
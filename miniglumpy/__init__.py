@@ -1,4 +1,10 @@
 # miniglumpy init
-from .textures import Texture1D, Texture2D
-from .glices import Glice
+from .textures import Texture1D, Texture2D, Texture3D, Texture2DArray
+from .glices import Glice, VolumeGlice
 from . import gshaders
+from .batch import draw_batch, BatchStats
+from .tiles import TiledGlice
+from .lightbox import LightboxGlice
+from .layered import LayeredGlice
+from .cine import CinePlayer
+from . import colormaps
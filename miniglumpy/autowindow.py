@@ -0,0 +1,79 @@
+""" Robust automatic display window from data percentiles """
+
+import math
+
+import numpy as np
+
+
+class AutoWindow(object):
+    ''' Robust `vmin`, `vmax` from percentiles of a strided subsample
+
+    We keep a subsample of the data on a regular grid of at most
+    `max_samples` points, and take `low` and `high` percentiles of the
+    finite values, so outliers do not set the window, and the cost does not
+    depend on the image size.  Region updates refresh only the subsample
+    points inside the regions.  Limits are computed when first asked for
+    after each change of data.
+
+    Parameters
+    ----------
+    low : float, optional
+        percentile for `vmin`
+    high : float, optional
+        percentile for `vmax`
+    max_samples : int, optional
+        maximum number of points in subsample
+    '''
+    def __init__(self, low=1.0, high=99.0, max_samples=2**16):
+        self.low = low
+        self.high = high
+        self.max_samples = max_samples
+        self.version = 0
+        self._sample = None
+        self._limits = None
+        self._limits_version = None
+
+    def _step(self, shape):
+        ''' Step along rows and columns for array of `shape` '''
+        n = shape[0] * shape[1]
+        return max(int(math.ceil(math.sqrt(n / float(self.max_samples)))), 1)
+
+    def set_data(self, arr, regions=None):
+        ''' Take new subsample from `arr`
+
+        If `regions` is not None, it is a sequence of ``(x, y, width,
+        height)`` rectangles in array (column, row) coordinates, and only
+        these parts of `arr` have changed since the last ``set_data``.
+        '''
+        step = self._step(arr.shape)
+        if (regions is None or self._sample is None or
+            step != self._step_size or arr.shape != self._shape):
+            self._sample = np.array(arr[::step, ::step])
+        else:
+            for x, y, w, h in regions:
+                # Sample points inside region
+                r0, c0 = -(-max(y, 0) // step), -(-max(x, 0) // step)
+                r1, c1 = -(-(y + h) // step), -(-(x + w) // step)
+                self._sample[r0:r1, c0:c1] = arr[r0 * step:r1 * step:step,
+                                                 c0 * step:c1 * step:step]
+        self._step_size = step
+        self._shape = arr.shape
+        self.version += 1
+
+    @property
+    def limits(self):
+        ''' `vmin`, `vmax` for current data
+
+        `vmax` is greater than `vmin`, even for constant data.
+        '''
+        if self._limits_version != self.version:
+            sample = self._sample[np.isfinite(self._sample)]
+            if sample.size == 0:
+                vmin, vmax = 0.0, 1.0
+            else:
+                vmin, vmax = np.percentile(sample, [self.low, self.high])
+            if vmax <= vmin:
+                vmax = vmin + 1
+            self._limits = (vmin, vmax)
+            self._limits_version = self.version
+        return self._limits
@@ -0,0 +1,83 @@
+""" Draw many slices with few GL calls """
+
+from collections import OrderedDict, namedtuple
+
+from .textures import QuadBuffer, quad_vertices
+from .contexts import context_cache
+
+
+BatchStats = namedtuple('BatchStats', ['blits', 'draws'])
+
+
+def draw_batch(blits):
+    ''' Draw sequence of ``(glice, x, y, w, h)`` `blits`
+
+    We put the quads for all blits into one vertex buffer, then group the
+    blits by shader, and within shader by texture, LUT and window, and issue
+    one draw call for each group.  The vertex buffer is shared for the GL
+    context, and only refilled when the blit rectangles change.
+
+    Blits are drawn in group order, so overlapping blits from different
+    groups may not draw in the order given.  Blits of objects that are not
+    ``batchable``, such as Glices with multipass shaders, are drawn one by
+    one with their ``blit`` method, after the groups, each counting as one
+    draw.
+
+    Parameters
+    ----------
+    blits : sequence
+        sequence of ``(glice, x, y, w, h)`` tuples
+
+    Returns
+    -------
+    stats : BatchStats
+        namedtuple with number of `blits` requested, and number of `draws`
+        issued.
+    '''
+    groups = {}
+    shaders = OrderedDict()
+    singles = []
+    n_blits = 0
+    for blit in blits:
+        glice, rect = blit[0], tuple(blit[1:5])
+        n_blits += 1
+        if not glice.batchable:
+            singles.append((glice, rect))
+            continue
+        key = glice.bind_key
+        if key not in groups:
+            shaders.setdefault(id(glice.shader), []).append(key)
+            groups[key] = (glice, [])
+        groups[key][1].append(rect)
+    n_draws = _draw_groups(groups, shaders) if groups else 0
+    for glice, rect in singles:
+        glice.blit(*rect)
+    return BatchStats(n_blits, n_draws + len(singles))
+
+
+def _draw_groups(groups, shaders):
+    ''' Draw rectangles of `groups` ordered by `shaders`; return draws '''
+    spans = []
+    rects = []
+    for keys in shaders.values():
+        for key in keys:
+            glice, group_rects = groups[key]
+            spans.append((glice, len(rects), len(group_rects)))
+            rects += group_rects
+    cache = context_cache('batch')
+    if 'quads' not in cache:
+        cache['quads'] = QuadBuffer()
+    quads = cache['quads']
+    rects = tuple(rects)
+    if rects != quads.key:
+        quads.set_vertices(
+            quad_vertices([rect + (0, 1, 0, 1) for rect in rects]), rects)
+    shader = None
+    for glice, first, count in spans:
+        if shader is not None and glice.shader is not shader:
+            shader.unbind()
+        glice.bind()
+        quads.draw(first, count)
+        shader = glice.shader
+    shader.unbind()
+    return len(spans)
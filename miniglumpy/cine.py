@@ -0,0 +1,260 @@
+""" Cine playback of frame sequences from a ring of pre-uploaded textures """
+
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from .textures import Texture2D, native_dtype
+from .glices import Glice
+
+
+CineStats = namedtuple('CineStats', ['fps', 'presented', 'skipped',
+                                     'occupancy', 'uploads'])
+
+
+class CinePlayer(object):
+    ''' Play a sequence of 2D frames through a Glice at a fixed rate
+
+    A producer thread reads frames ahead of the playhead, and converts them
+    to an uploadable dtype and layout.  At each ``tick``, the render thread
+    uploads up to `max_uploads` of these frames into a ring of
+    `n_textures` ``Texture2D`` objects, and presents the frame due at the
+    current time by setting it as the Glice texture, which costs no upload.
+
+    When playback falls behind, we present the newest uploaded frame that
+    is due, skipping the frames before it, rather than slowing down.  For
+    indexable frame sources, the producer also jumps ahead to the playhead,
+    so it does not read frames that are already late.
+
+    Parameters
+    ----------
+    frames : array-like or iterable
+        3D array or memmap of frames along the first axis, or an iterable,
+        such as a generator, of 2D arrays
+    glice : None or Glice, optional
+        Glice to present frames through; None makes a new ``Glice`` of the
+        first frame, with `kwargs`.  Its window and colormap apply to all
+        frames.
+    fps : float, optional
+        presentation rate in frames per second
+    n_textures : int, optional
+        number of frames held on the GPU ahead of the playhead; the
+        producer holds up to as many again in host memory
+    max_uploads : int, optional
+        maximum number of frames to upload per ``tick``
+    loop : bool, optional
+        whether to loop indexable frame sources
+    clock : callable, optional
+        returns the current time in seconds
+    kwargs : dict
+        keyword arguments for new ``Glice``
+    '''
+    def __init__(self, frames, glice=None, fps=25.0, n_textures=8,
+                 max_uploads=2, loop=True, clock=time.time, **kwargs):
+        self.fps = float(fps)
+        self.n_textures = n_textures
+        self.max_uploads = max_uploads
+        self.clock = clock
+        if hasattr(frames, '__getitem__') and hasattr(frames, '__len__'):
+            self._frames = frames
+            self._iterator = None
+            self.n_frames = len(frames)
+            self.loop = loop
+        else:
+            self._frames = None
+            self._iterator = iter(frames)
+            self.n_frames = None
+            self.loop = False
+        first = self._read(0)
+        if glice is None:
+            glice = Glice(first, **kwargs)
+        if glice.pixel_transfer:
+            raise ValueError('Cine playback needs window in the shader')
+        self.glice = glice
+        self._cond = threading.Condition()
+        self._closed = False
+        self._generation = 0
+        # Frames read by producer, as (sequence number, array)
+        self._staged = deque()
+        self._next_seq = 1
+        self._wanted_seq = 1
+        self._ended = False
+        # Textures in the ring, as [sequence number or None, texture]
+        self._ring = [[None, None] for i in range(n_textures)]
+        self.frame = 0
+        self._seq = None
+        self.playing = False
+        # Frame to show while paused
+        self._hold_seq = 0
+        self.presented = self.skipped = self.uploads = 0
+        self._present_times = deque(maxlen=max(int(self.fps), 2))
+        self._staged.append((0, first))
+        self._producer = threading.Thread(target=self._produce)
+        self._producer.daemon = True
+        self._producer.start()
+
+    def _read(self, seq):
+        ''' Return frame for sequence number `seq`, or None at the end '''
+        if self._iterator is not None:
+            try:
+                arr = next(self._iterator)
+            except StopIteration:
+                return None
+        else:
+            if seq >= self.n_frames and not self.loop:
+                return None
+            arr = self._frames[seq % self.n_frames]
+        arr = np.asarray(arr)
+        return np.ascontiguousarray(arr, dtype=native_dtype(arr.dtype))
+
+    def _produce(self):
+        while True:
+            with self._cond:
+                while not self._closed and (
+                    self._ended or
+                    len(self._staged) >= self.n_textures):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                generation = self._generation
+                if self._iterator is None:
+                    # Jump ahead to frames not yet late
+                    self._next_seq = max(self._next_seq, self._wanted_seq)
+                seq = self._next_seq
+                self._next_seq += 1
+            arr = self._read(seq)
+            with self._cond:
+                if generation != self._generation:
+                    continue
+                if arr is None:
+                    self._ended = True
+                elif seq >= self._wanted_seq or self._iterator is None:
+                    self._staged.append((seq, arr))
+
+    def _due_seq(self):
+        ''' Sequence number of frame due at the current time '''
+        if not self.playing:
+            return self._hold_seq
+        elapsed = self.clock() - self._start_time
+        # Allow for rounding error in clock sums at exact frame times
+        return self._start_seq + int(elapsed * self.fps + 1e-6)
+
+    def play(self):
+        ''' Start playback from the frame after the current frame '''
+        if self.playing:
+            return
+        self._start_time = self.clock()
+        self._start_seq = 0 if self._seq is None else self._seq + 1
+        self.playing = True
+
+    def pause(self):
+        ''' Stop playback at the current frame '''
+        self.playing = False
+        if self._seq is not None:
+            self._hold_seq = self._seq
+
+    def seek(self, index):
+        ''' Move playhead to frame `index`; show it at the next ``tick``
+
+        Only for indexable frame sources.
+        '''
+        if self._iterator is not None:
+            raise ValueError('Cannot seek in iterable frame source')
+        with self._cond:
+            self._generation += 1
+            self._staged.clear()
+            self._ended = False
+            self._next_seq = self._wanted_seq = index
+            self._cond.notify()
+        for slot in self._ring:
+            # Keep the texture on screen until the next frame replaces it
+            slot[0] = -1 if slot[1] is self.glice.texture else None
+        self._seq = index - 1
+        self._hold_seq = index
+        self._start_time = self.clock()
+        self._start_seq = index
+
+    def _upload(self, due):
+        ''' Upload staged frames to free textures; return number uploaded '''
+        with self._cond:
+            # Drop staged frames overtaken by a later frame that is due
+            while len(self._staged) > 1 and self._staged[1][0] <= due:
+                self._staged.popleft()
+            self._wanted_seq = max(self._wanted_seq, due)
+            self._cond.notify()
+        n = 0
+        while n < self.max_uploads:
+            free = [slot for slot in self._ring if slot[0] is None or
+                    self._seq is not None and slot[0] < self._seq]
+            if not free:
+                break
+            with self._cond:
+                if not self._staged:
+                    break
+                seq, arr = self._staged.popleft()
+                self._cond.notify()
+            slot = free[0]
+            if slot[1] is None:
+                slot[1] = Texture2D(arr, keep_data=False)
+            else:
+                slot[1].set_data(arr)
+            slot[0] = seq
+            self.uploads += 1
+            n += 1
+        return n
+
+    def tick(self, dt=None):
+        ''' Upload frames ahead, and present the frame due now
+
+        Call once per drawn frame, before drawing the Glice, from the
+        thread of the GL context; for example ``pyglet.clock.schedule``
+        `tick`.  Returns True if we presented a new frame.
+        '''
+        due = self._due_seq()
+        self._upload(due)
+        shown = -1 if self._seq is None else self._seq
+        candidates = [slot for slot in self._ring if slot[0] is not None and
+                      shown < slot[0] <= due]
+        if not candidates:
+            return False
+        seq, texture = max(candidates, key=lambda slot: slot[0])
+        if self._seq is not None and self.presented:
+            self.skipped += seq - self._seq - 1
+        self._seq = seq
+        self.frame = seq if self.n_frames is None else seq % self.n_frames
+        self.glice.texture = texture
+        self.presented += 1
+        self._present_times.append(self.clock())
+        return True
+
+    @property
+    def occupancy(self):
+        ''' Fraction of texture ring holding frames not yet presented '''
+        shown = -1 if self._seq is None else self._seq
+        ahead = [slot for slot in self._ring
+                 if slot[0] is not None and slot[0] > shown]
+        return len(ahead) / float(self.n_textures)
+
+    @property
+    def stats(self):
+        ''' CineStats namedtuple
+
+        `fps` is the presentation rate over the last second or so of
+        playback, `skipped` the number of frames not presented because
+        playback was behind, and `occupancy` as for ``occupancy``.
+        '''
+        times = self._present_times
+        fps = 0.0
+        if len(times) > 1 and times[-1] > times[0]:
+            fps = (len(times) - 1) / (times[-1] - times[0])
+        return CineStats(fps, self.presented, self.skipped, self.occupancy,
+                         self.uploads)
+
+    def close(self):
+        ''' Stop producer thread '''
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._producer.join()
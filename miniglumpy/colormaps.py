@@ -0,0 +1,138 @@
+""" Named colormaps and shared LUT textures
+
+Each colormap becomes a (N, 3) float32 RGB array, generated once, and
+uploaded once per GL context as a 1D LUT texture that all users share.
+"""
+
+import hashlib
+
+import numpy as np
+
+from .textures import Texture1D
+from .contexts import context_cache
+
+# Number of entries in LUTs from named colormaps
+LUT_SIZE = 512
+
+# Polynomial fit to matplotlib viridis; coefficients of t**0 .. t**6
+_VIRIDIS_COEFFS = np.array([
+    (0.2777273272234177, 0.005407344544966578, 0.3340998053353061),
+    (0.1050930431085774, 1.404613529898575, 1.384590162594685),
+    (-0.3308618287255563, 0.214847559468213, 0.09509516302823659),
+    (-4.634230498983486, -5.799100973351585, -19.33244095627987),
+    (6.228269936347081, 14.17993336680509, 56.69055260068105),
+    (4.776384997670288, -13.74514537774601, -65.35303263337234),
+    (-5.435455855934631, 4.645852612178535, 26.3124352495832)])
+
+
+def _grey(x):
+    return np.column_stack((x, x, x))
+
+
+def _hot(x):
+    return np.clip(np.column_stack((3 * x, 3 * x - 1, 3 * x - 2)), 0, 1)
+
+
+def _viridis(x):
+    colors = np.zeros((len(x), 3))
+    for coeffs in _VIRIDIS_COEFFS[::-1]:
+        colors = colors * x[:, None] + coeffs
+    return np.clip(colors, 0, 1)
+
+
+_makers = {
+    'grey': _grey,
+    'hot': _hot,
+    'viridis': _viridis}
+_cmaps = {}
+# Count of registrations by name, to key LUTs of re-registered names
+_registrations = {}
+
+
+def register_cmap(name, colors):
+    ''' Register colormap `name`
+
+    Parameters
+    ----------
+    name : str
+    colors : array-like or callable
+        (N, 3) RGB array with values in [0, 1], or callable returning such
+        an array for a vector of N positions in [0, 1].  We interpolate
+        arrays linearly to ``LUT_SIZE`` entries.
+    '''
+    _cmaps.pop(name, None)
+    _registrations[name] = _registrations.get(name, 0) + 1
+    if callable(colors):
+        _makers[name] = colors
+    else:
+        _makers[name] = _interpolator(colors)
+
+
+def _interpolator(colors):
+    ''' Return colormap callable interpolating (N, 3) array `colors` '''
+    colors = np.asarray(colors, dtype=np.float64)
+    points = np.linspace(0, 1, len(colors))
+    def interpolate(x):
+        return np.column_stack([np.interp(x, points, channel)
+                                for channel in colors.T])
+    return interpolate
+
+
+def cmap_names():
+    ''' Return sorted names of registered colormaps '''
+    return sorted(_makers)
+
+
+def get_cmap(name):
+    ''' Return (N, 3) float32 RGB array for colormap `name`
+
+    Examples
+    --------
+    >>> get_cmap('hot')[-1]
+    array([1., 1., 1.], dtype=float32)
+    '''
+    if name not in _cmaps:
+        if name not in _makers:
+            raise ValueError('No colormap named "%s"; choose from %s'
+                             % (name, ', '.join(cmap_names())))
+        x = np.linspace(0, 1, LUT_SIZE)
+        _cmaps[name] = np.ascontiguousarray(_makers[name](x),
+                                            dtype=np.float32)
+    return _cmaps[name]
+
+
+def lut_bias_scale(vmin, vmax, size):
+    ''' Return bias, scale mapping `vmin`, `vmax` into LUT of `size` entries
+
+    A value ``v`` maps to LUT coordinate ``v * scale + bias``.  `vmin` maps
+    into the second entry, and `vmax` into the second to last entry, leaving
+    the end entries for values out of range.
+    '''
+    s = size
+    return (1.0/(s-1)-vmin*((s-3.1)/(s-1))/(vmax-vmin),
+            ((s-3.1)/(s-1))/(vmax-vmin))
+
+
+def lut_texture(cmap):
+    ''' Return LUT texture for `cmap`, shared in the current GL context
+
+    Parameters
+    ----------
+    cmap : str or array-like
+        name of registered colormap, or (N, 3) RGB array.  We share the
+        texture between arrays of equal contents.
+
+    Returns
+    -------
+    lut : Texture1D
+    '''
+    if isinstance(cmap, str):
+        key = (cmap, _registrations.get(cmap, 0))
+        colors = get_cmap(cmap)
+    else:
+        colors = np.ascontiguousarray(cmap, dtype=np.float32)
+        key = (colors.shape, hashlib.sha1(colors.tobytes()).hexdigest())
+    luts = context_cache('luts')
+    if key not in luts:
+        luts[key] = Texture1D(colors)
+    return luts[key]
@@ -0,0 +1,62 @@
+""" Caches of GL objects per GL context """
+
+import weakref
+
+import pyglet.gl as gl
+
+# Per-context caches, keyed on pyglet context object space
+_context_caches = weakref.WeakKeyDictionary()
+_no_context_caches = {}
+
+# (delete function, names) of GL objects to delete when their object space is
+# next current, keyed on object space
+_doomed = weakref.WeakKeyDictionary()
+
+
+def current_space():
+    ''' Return object space of the current context, or None if no context '''
+    context = gl.current_context
+    if context is None:
+        return None
+    return getattr(context, 'object_space', context)
+
+
+def context_cache(name):
+    ''' Return dict `name` for GL objects shared by the current context
+
+    GL objects such as programs and textures belong to a context, or to the
+    group of contexts sharing objects with it.  We keep caches of these
+    objects per pyglet context object space.
+    '''
+    space = current_space()
+    if space is None:
+        caches = _no_context_caches
+    else:
+        caches = _context_caches.setdefault(space, {})
+        if space in _doomed:
+            for delete, names in _doomed.pop(space):
+                _delete(delete, names)
+    return caches.setdefault(name, {})
+
+
+def delete_objects(space, delete, names):
+    ''' Delete GL objects `names` belonging to object space `space`
+
+    `delete` is a GL delete function such as ``glDeleteBuffers``, and
+    `names` a sequence of integer object names.  If the current context
+    does not share `space`, we delete when a context that does is next
+    current, at its next ``context_cache`` call.  With no current context,
+    as at interpreter exit, we do nothing; the objects go with the context.
+    '''
+    current = current_space()
+    if current is None:
+        return
+    if space is not None and space is not current:
+        _doomed.setdefault(space, []).append((delete, list(names)))
+        return
+    _delete(delete, names)
+
+
+def _delete(delete, names):
+    names = list(names)
+    delete(len(names), (gl.GLuint * len(names))(*names))
@@ -0,0 +1,183 @@
+""" NumPy reference renderer for the Glice shader pipeline
+
+Reproduces what ``Glice.blit`` draws into a `width` by `height` pixel
+rectangle: interpolation as in the nearest, bilinear and bicubic shaders,
+the vmin, vmax window, and the LUT lookup, all without a GL context.  Use it
+as a fallback renderer, or as a reference to check GPU output.
+"""
+
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from .textures import native_dtype, value_scale
+from .colormaps import get_cmap, lut_bias_scale
+from .gshaders.bicubic import kernel_weights
+
+
+def _texel_coords(n_out, n_tex):
+    ''' Texel coordinates ``uv / pixel`` of `n_out` fragment centres '''
+    return (np.arange(n_out) + 0.5) / n_out * n_tex
+
+
+def _taps(coords, n_tex, offsets):
+    ''' Clamped texel indices at `offsets` from floor of `coords`, fractions
+    '''
+    base = np.floor(coords).astype(int)
+    indices = [np.clip(base + offset, 0, n_tex - 1) for offset in offsets]
+    return indices, coords - base
+
+
+def _tex_rows(tex, indices, factor):
+    ''' Rows `indices` of `tex` as float64 texture values, times `factor` '''
+    return tex[indices].astype(np.float64) * factor
+
+
+def interpolate(tex, width, height, rows=None, interpolation='nearest',
+                kernel=None, factor=1.0):
+    ''' Resample 2D texture values `tex` to `height` by `width` fragments
+
+    We convert only the rows of `tex` that output rows `rows` need, so
+    memory use follows the number of output rows, not the size of `tex`.
+
+    Parameters
+    ----------
+    tex : 2D array
+        texture values, before scaling by `factor`
+    width, height : int
+        output size
+    rows : None or slice, optional
+        output rows to compute; None for all
+    interpolation : {'nearest', 'bilinear', 'bicubic'}, optional
+    kernel : None or (N, 4) array, optional
+        bicubic kernel weights, from ``gshaders.bicubic.kernel_weights``
+    factor : float, optional
+        scale from `tex` to texture values, as ``textures.value_scale``
+
+    Returns
+    -------
+    values : 2D array
+        interpolated values for output rows `rows`; row 0 is the top of the
+        image, and texture row 0.
+    '''
+    h, w = tex.shape
+    y = _texel_coords(height, h)
+    if rows is not None:
+        y = y[rows]
+    x = _texel_coords(width, w)
+    if interpolation == 'nearest':
+        (ys,), fy = _taps(y, h, [0])
+        (xs,), fx = _taps(x, w, [0])
+        return _tex_rows(tex, ys, factor)[:, xs]
+    if interpolation == 'bilinear':
+        ys, fy = _taps(y, h, [0, 1])
+        xs, fx = _taps(x, w, [0, 1])
+        row_tex = _tex_rows(tex, ys[0], factor)
+        top = row_tex[:, xs[0]] * (1 - fx) + row_tex[:, xs[1]] * fx
+        row_tex = _tex_rows(tex, ys[1], factor)
+        bottom = row_tex[:, xs[0]] * (1 - fx) + row_tex[:, xs[1]] * fx
+        return top * (1 - fy[:, None]) + bottom * fy[:, None]
+    if interpolation == 'bicubic':
+        if kernel is None:
+            kernel = kernel_weights()
+        size = len(kernel)
+        ys, fy = _taps(y, h, [-1, 0, 1, 2])
+        xs, fx = _taps(x, w, [-1, 0, 1, 2])
+        # Kernel texture lookup is nearest
+        wx = kernel[np.clip(np.floor(fx * size).astype(int), 0, size - 1)]
+        wy = kernel[np.clip(np.floor(fy * size).astype(int), 0, size - 1)]
+        out = 0
+        for i in range(4):
+            row_tex = _tex_rows(tex, ys[i], factor)
+            across = sum(row_tex[:, xs[j]] * wx[:, j] for j in range(4))
+            out = out + across * wy[:, i:i + 1]
+        return out
+    raise ValueError('Unknown interpolation "%s"' % interpolation)
+
+
+def render(arr, width, height, interpolation='nearest', vmin=None,
+           vmax=None, cmap='grey', filter='bspline', chunk_rows=256,
+           n_threads=1):
+    ''' Render 2D `arr` as ``Glice.blit`` would to `width` by `height` pixels
+
+    Parameters
+    ----------
+    arr : 2D array
+    width, height : int
+        output size in pixels
+    interpolation : {'nearest', 'bilinear', 'bicubic'}, optional
+    vmin, vmax : None or float, optional
+        window; None for the minimum, maximum of `arr`
+    cmap : str or array-like, optional
+        name of registered colormap, or (N, 3) RGB array; see ``colormaps``
+    filter : str or tuple, optional
+        bicubic filter; see ``gshaders.bicubic.kernel_weights``
+    chunk_rows : int, optional
+        number of output rows to compute at a time, bounding memory use
+    n_threads : int, optional
+        number of threads over which to spread chunks
+
+    Returns
+    -------
+    rgba : (height, width, 4) float32 array
+        colors in [0, 1]; row 0 is the top of the image
+    '''
+    arr = np.asarray(arr)
+    if arr.ndim != 2:
+        raise ValueError('Can only render 2D arrays')
+    if vmin is None:
+        vmin = arr.min()
+    if vmax is None:
+        vmax = arr.max()
+    # Scale to texture values as the GL sees them
+    factor = value_scale(native_dtype(arr.dtype))
+    lut = get_cmap(cmap) if isinstance(cmap, str) else np.asarray(cmap)
+    n_lut = len(lut)
+    bias, scale = lut_bias_scale(vmin * factor, vmax * factor, n_lut)
+    kernel = None
+    if interpolation == 'bicubic':
+        kernel = kernel_weights(filter=filter).astype(np.float64)
+    out = np.empty((height, width, 4), dtype=np.float32)
+    out[..., 3] = 1
+
+    def render_rows(start):
+        rows = slice(start, min(start + chunk_rows, height))
+        values = interpolate(arr, width, height, rows, interpolation, kernel,
+                             factor)
+        coords = values * scale + bias
+        # Nearest LUT lookup, clamped
+        indices = np.clip(np.floor(coords * n_lut).astype(int), 0,
+                          n_lut - 1)
+        out[rows, :, :3] = lut[indices]
+
+    starts = range(0, height, chunk_rows)
+    if n_threads > 1:
+        pool = ThreadPool(n_threads)
+        try:
+            pool.map(render_rows, starts)
+        finally:
+            pool.close()
+    else:
+        for start in starts:
+            render_rows(start)
+    return out
+
+
+def render_glice(glice, width, height, **kwargs):
+    ''' Render `glice` as its ``blit`` would to `width` by `height` pixels
+
+    Takes data, window, colormap and interpolation from `glice`, which must
+    keep its data.  We render from the full resolution data, whatever the
+    `lod` of `glice`.  Other keyword arguments pass to ``render``.
+    '''
+    from . import gshaders
+    if glice._arr is None:
+        raise ValueError('Glice does not keep its data')
+    shader = glice.shader
+    if isinstance(shader, gshaders.Bicubic):
+        kwargs.setdefault('interpolation', 'bicubic')
+        kwargs.setdefault('filter', shader.filter)
+    elif isinstance(shader, gshaders.Bilinear):
+        kwargs.setdefault('interpolation', 'bilinear')
+    return render(glice._arr, width, height, vmin=glice.vmin,
+                  vmax=glice.vmax, cmap=glice.cmap, **kwargs)
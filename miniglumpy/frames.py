@@ -0,0 +1,146 @@
+""" Latest-wins queue of frames prepared off the render thread """
+
+import threading
+import time
+from collections import namedtuple
+
+
+FrameStats = namedtuple('FrameStats', ['submitted', 'delivered', 'dropped',
+                                       'queued', 'latency', 'mean_latency',
+                                       'errors'])
+
+
+class FrameQueue(object):
+    ''' Latest-wins queue of frames from producer threads
+
+    Any thread can ``submit`` a frame.  Worker threads run `prepare` on the
+    newest submitted frame, and put the result in a ready slot, from which
+    the render thread can ``take`` it.  Each stage holds at most one frame;
+    a newer frame replaces an older one waiting in the same stage, and
+    counts the older one as dropped.  So producers never block on the
+    render loop, and the render loop always gets the newest frame.
+
+    If `prepare` raises an exception, the worker carries on, and the
+    exception takes the place of the prepared frame; ``take`` raises it.
+
+    Parameters
+    ----------
+    prepare : callable
+        called in a worker thread with submitted frame, returning the frame
+        for the render thread
+    n_workers : int, optional
+        number of worker threads, started at first ``submit``
+    '''
+    def __init__(self, prepare, n_workers=1):
+        self._prepare = prepare
+        self.n_workers = n_workers
+        self._cond = threading.Condition()
+        self._workers = []
+        # Workers stop when ``close`` moves on the generation
+        self._generation = 0
+        self._seq = 0
+        self._pending = None
+        self._ready = None
+        self._taken_seq = 0
+        self._busy = 0
+        self.submitted = self.delivered = self.dropped = self.errors = 0
+        self.latency = 0.0
+        self._total_latency = 0.0
+
+    def submit(self, frame):
+        ''' Queue `frame` for preparation, replacing any waiting frame '''
+        with self._cond:
+            if not self._workers:
+                for i in range(self.n_workers):
+                    worker = threading.Thread(target=self._work,
+                                              args=(self._generation,))
+                    worker.daemon = True
+                    worker.start()
+                    self._workers.append(worker)
+            if self._pending is not None:
+                self.dropped += 1
+            self._seq += 1
+            self._pending = (self._seq, frame, time.time())
+            self.submitted += 1
+            self._cond.notify()
+
+    def _work(self, generation):
+        while True:
+            with self._cond:
+                while (self._pending is None and
+                       generation == self._generation):
+                    self._cond.wait()
+                if generation != self._generation:
+                    return
+                seq, frame, submit_time = self._pending
+                self._pending = None
+                self._busy += 1
+            prepared = error = None
+            try:
+                prepared = self._prepare(frame)
+            except Exception as e:
+                error = e
+            finally:
+                with self._cond:
+                    self._busy -= 1
+            with self._cond:
+                if error is not None:
+                    self.errors += 1
+                if seq < self._taken_seq:
+                    # A newer frame finished first, and has been taken
+                    self.dropped += 1
+                    continue
+                if self._ready is not None:
+                    self.dropped += 1
+                    if self._ready[0] > seq:
+                        # A newer frame finished first
+                        continue
+                self._ready = (seq, prepared, submit_time, error)
+
+    def take(self):
+        ''' Return newest prepared frame, or None if no new frame is ready
+
+        Call from the render thread.  Raises the exception from `prepare`
+        if preparing the newest frame failed.
+        '''
+        with self._cond:
+            ready, self._ready = self._ready, None
+            if ready is not None:
+                self._taken_seq = ready[0]
+        if ready is None:
+            return None
+        if ready[3] is not None:
+            raise ready[3]
+        self.latency = time.time() - ready[2]
+        self._total_latency += self.latency
+        self.delivered += 1
+        return ready[1]
+
+    @property
+    def stats(self):
+        ''' FrameStats namedtuple of counts, and latencies in seconds
+
+        `queued` is the number of frames waiting, in preparation, or ready.
+        `latency` is from submit to take, for the last frame taken.
+        `errors` is the number of frames for which `prepare` raised.
+        '''
+        with self._cond:
+            queued = ((self._pending is not None) + self._busy +
+                      (self._ready is not None))
+        mean_latency = (self._total_latency / self.delivered
+                        if self.delivered else 0.0)
+        return FrameStats(self.submitted, self.delivered, self.dropped,
+                          queued, self.latency, mean_latency, self.errors)
+
+    def close(self, wait=True):
+        ''' Stop worker threads; with `wait`, wait until they have stopped
+
+        A later ``submit`` starts new workers.
+        '''
+        with self._cond:
+            self._generation += 1
+            self._cond.notify_all()
+            workers, self._workers = self._workers, []
+        if wait:
+            for worker in workers:
+                worker.join()
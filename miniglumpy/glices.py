@@ -2,52 +2,401 @@
 
 # Adapted in part from image.py in glumpy.  See COPYING.txt
 
+import weakref
+
 import numpy as np
 
-from .textures import Texture1D, Texture2D
+from .textures import Texture2D, Texture3D, native_dtype
+from .sources import VolumeSource
+from .pyramid import Pyramid
+from .colormaps import lut_texture, lut_bias_scale
+from .autowindow import AutoWindow
+from .frames import FrameQueue
 from . import gshaders
 
 
 class Glice(object):
-    def __init__(self, arr, shader=None, cmap=None, vmin=None, vmax=None):
-        self._texture = Texture2D(arr)
-        self._arr = arr
+    texture_class = Texture2D
+
+    def __init__(self, arr, shader=None, cmap=None, vmin=None, vmax=None,
+                 streaming=0, pixel_transfer=False, keep_data=True,
+                 index=None, lod=None, auto_window=False):
+        ''' Create GL slice object from 2D array `arr`
+
+        By default we upload the raw data once, and apply the `vmin`, `vmax`
+        window in the shader, so changing the window costs no upload.  With
+        `pixel_transfer` True, we instead scale the data with GL pixel
+        transfer parameters on upload, and each window change re-uploads the
+        texture.
+
+        With `keep_data` False, we do not keep a reference to the data after
+        upload; `pixel_transfer` mode then needs `streaming` to re-upload on
+        window changes.
+
+        `arr` can also be a ``sources.VolumeSource``; we then show slice
+        `index` (default middle slice) from the source, and ``set_slice``
+        selects other slices.  `vmin` and `vmax` default to the range of
+        this first slice.
+
+        `lod` is None, or one of 'mean', 'max' or 'min'.  If not None, we
+        build a multi-resolution pyramid of the data with this block
+        reduction (see ``pyramid.Pyramid``), and ``blit`` uploads the
+        coarsest level with at least one texel per screen pixel, refining
+        as the blit size grows.
+
+        `auto_window` is False, True, or a ``(low, high)`` percentile pair.
+        If not False, we set `vmin` and `vmax` to robust percentiles of the
+        data (default 1 and 99), at creation and at each ``set_data``; see
+        ``autowindow.AutoWindow``.  Given `vmin` or `vmax` apply at creation
+        only.
+        '''
+        self.source = None
+        if isinstance(arr, VolumeSource):
+            self.source = arr
+            if index is None:
+                index = len(arr) // 2
+            self.index = index
+            arr = self.source[index]
+        self.pixel_transfer = pixel_transfer
+        self.keep_data = keep_data
+        self._pyramid = None
+        self._level = 0
+        self._extent = (1.0, 1.0)
+        tex_arr = arr
+        if lod is not None:
+            self._pyramid = Pyramid(arr, lod)
+            self._level = self._pyramid.n_levels - 1
+            tex_arr = self._pyramid.level(self._level)
+            self._extent = self._pyramid.extent(self._level)
+        self._texture = self.texture_class(tex_arr, streaming, keep_data)
+        self._arr = arr if keep_data else None
         if shader is None:
-            shader = gshaders.Nearest(True, False)
+            shader = self._default_shader()
         self.shader = shader
         self.cmap = cmap
+        self._frames = self._frame_queue()
+        self.auto_window = None
+        if auto_window is not False:
+            if auto_window is True:
+                self.auto_window = AutoWindow()
+            else:
+                self.auto_window = AutoWindow(*auto_window)
+            self.auto_window.set_data(arr)
+            auto_vmin, auto_vmax = self.auto_window.limits
+            if vmin is None:
+                vmin = auto_vmin
+            if vmax is None:
+                vmax = auto_vmax
         if vmin is None:
             vmin = arr.min()
         if vmax is None:
             vmax = arr.max()
         self.vmin, self.vmax = vmin, vmax
+        if pixel_transfer:
+            self.update()
+
+    def _default_shader(self):
+        return gshaders.Nearest(True, False)
 
     def _get_cmap(self):
         return self._cmap
 
     def _set_cmap(self, cmap):
         if cmap is None:
-            cmap = np.tile(
-                np.linspace(0, 1, 512)[:,None], (1,3)).astype(np.float32)
+            cmap = 'grey'
         self._cmap = cmap
-        self._lut = Texture1D(cmap)
+        self._lut = lut_texture(cmap)
+
+    cmap = property(_get_cmap, _set_cmap, None,
+                    'get / set cmap; name of registered colormap, or '
+                    '(N, 3) RGB array.  See ``colormaps``')
+
+    def _get_texture(self):
+        return self._texture
+
+    def _set_texture(self, texture):
+        if self._pyramid is not None:
+            raise ValueError('Cannot set texture of Glice with lod')
+        self._texture = texture
+        self._arr = None
+
+    texture = property(_get_texture, _set_texture, None,
+                       'get / set texture to draw.  Setting a texture that '
+                       'already holds data draws that data with no upload; '
+                       'the Glice then has no data array.  See ``cine``')
+
+    @property
+    def stream(self):
+        ''' Pixel buffer ring for streaming uploads, or None '''
+        return self._texture.stream
+
+    def set_data(self, arr, region=None):
+        ''' Set new data from `arr`
+
+        `region` is None, an ``(x, y, width, height)`` rectangle in array
+        (column, row) coordinates, or a sequence of such rectangles.  If not
+        None, only these parts of `arr` have changed since the last
+        ``set_data``, and we upload only those (merged) rectangles.
+
+        With `lod`, we rebuild the pyramid, upload the whole current level,
+        and ignore `region`.
+
+        With `auto_window`, we also update `vmin` and `vmax` for the new
+        data.
+        '''
+        if region is not None and np.ndim(region) == 1:
+            region = [region]
+        if self.auto_window is not None:
+            old_window = self.vmin, self.vmax
+            self.auto_window.set_data(arr, region)
+            self.vmin, self.vmax = self.auto_window.limits
+            if self.pixel_transfer and (self.vmin, self.vmax) != old_window:
+                # New window applies to all of the texture
+                region = None
+        self._upload_data(arr, region)
+
+    def _upload_data(self, arr, region=None):
+        ''' Upload `arr` to texture or pyramid '''
+        if self._pyramid is not None:
+            self._pyramid.set_data(arr)
+            self._set_texture_data(self._pyramid.level(self._level))
+        else:
+            self._set_texture_data(arr, region)
+        self._arr = arr if self.keep_data else None
+
+    def _set_texture_data(self, arr, region=None):
+        if self.pixel_transfer:
+            bias, scale = self._bias_scale()
+            self._texture.set_data(arr, bias, scale, region)
+        else:
+            self._texture.set_data(arr, regions=region)
+
+    def submit(self, arr):
+        ''' Queue `arr` for upload at the next blit
+
+        Safe to call from any thread.  Worker threads convert `arr` to an
+        uploadable dtype and layout, and find the `auto_window` limits, if
+        any.  The next ``blit`` uploads the newest prepared frame; older
+        frames not yet uploaded are dropped.  See ``frame_stats``.  If
+        preparing the newest frame raises an exception, the next ``blit``
+        raises it.
+        '''
+        self._frames.submit(arr)
+
+    @property
+    def frame_stats(self):
+        ''' Statistics of frames from ``submit``; see ``frames.FrameStats`` '''
+        return self._frames.stats
+
+    def close(self):
+        ''' Stop the worker threads preparing frames from ``submit``
+
+        Workers start at the first ``submit``.  They do not keep the Glice
+        alive, and stop when it is garbage collected, but ``close`` stops
+        them now.  A later ``submit`` starts new workers.
+        '''
+        self._frames.close()
+
+    def __del__(self):
+        frames = self.__dict__.get('_frames')
+        if frames is not None:
+            # May run in a worker thread, which cannot join itself
+            frames.close(wait=False)
+
+    def _frame_queue(self):
+        ''' Return FrameQueue for ``submit``, calling us by weak reference '''
+        ref = weakref.ref(self)
+
+        def prepare(arr):
+            glice = ref()
+            if glice is None:
+                return None
+            return glice._prepare_frame(arr)
+        return FrameQueue(prepare, n_workers=2)
+
+    def _prepare_frame(self, arr):
+        ''' Prepare submitted `arr` for upload; runs in worker thread
 
-    cmap = property(_get_cmap, _set_cmap, None, 'get / set cmap')
+        Returns the array, and the new AutoWindow and its limits, or None,
+        None without `auto_window`.  We find the limits here, to keep the
+        percentile calculation out of the render thread.
+        '''
+        arr = np.asarray(arr)
+        arr = np.ascontiguousarray(arr, dtype=native_dtype(arr.dtype))
+        window = limits = None
+        if self.auto_window is not None:
+            old = self.auto_window
+            window = AutoWindow(old.low, old.high, old.max_samples)
+            window.set_data(arr)
+            limits = window.limits
+        return arr, window, limits
 
-    def set_data(self, arr):
-        self._texture.set_data(arr)
-        self._arr = arr
-        self.update()
+    def _apply_frame(self):
+        ''' Upload newest frame from ``submit``, if any '''
+        frame = self._frames.take()
+        if frame is None:
+            return
+        arr, window, limits = frame
+        if window is not None:
+            self.auto_window = window
+            self.vmin, self.vmax = limits
+        self._upload_data(arr)
+
+    def set_slice(self, index=None, axis=None):
+        ''' Show slice `index` along `axis` from our slice source
+
+        None for `axis` keeps the current axis of the source; None for
+        `index` selects the middle slice.
+        '''
+        if self.source is None:
+            raise ValueError('Glice has no slice source')
+        if axis is not None:
+            self.source.axis = axis
+        if index is None:
+            index = len(self.source) // 2
+        self.set_data(self.source[index])
+        self.index = index
+
+    @property
+    def value_scale(self):
+        ''' Factor scaling data values to GL texture values '''
+        return self._texture.value_scale
+
+    def _bias_scale(self):
+        ''' Return bias, scale mapping vmin, vmax into the LUT
+
+        The bias and scale apply to texture values, which the GL has scaled
+        to [0, 1] (unsigned) or [-1, 1] (signed) for integer types.
+        '''
+        return lut_bias_scale(self.vmin * self.value_scale,
+                              self.vmax * self.value_scale,
+                              self._lut.width)
+
+    def _shader_bias_scale(self):
+        ''' Return bias, scale for shader to apply to texture values '''
+        if self.pixel_transfer:
+            return 0.0, 1.0
+        return self._bias_scale()
 
     def update(self):
-        s = self._lut.width
-        vmin = self.vmin
-        vmax = self.vmax
-        self._texture.update(bias = 1.0/(s-1)-vmin*((s-3.1)/(s-1))/(vmax-vmin),
-                             scale = ((s-3.1)/(s-1))/(vmax-vmin))
+        ''' Apply changed `vmin`, `vmax`
+
+        Only needed for `pixel_transfer` mode; otherwise the shader picks up
+        the new window at the next blit.
+        '''
+        if self.pixel_transfer:
+            self._texture.update(*self._bias_scale())
+
+    @property
+    def bind_key(self):
+        ''' Key identifying the GL state that ``bind`` sets '''
+        return (id(self.shader), self._texture.id, self._lut.id,
+                self._shader_bias_scale())
+
+    @property
+    def batchable(self):
+        ''' True if ``draw_batch`` can draw us with ``bind`` and its quads
+
+        False for shaders drawing in several passes, and with a `lod`
+        pyramid, where ``blit`` selects the level for the blit size;
+        ``draw_batch`` then calls ``blit``.
+        '''
+        return not self.shader.multipass and self._pyramid is None
+
+    def bind(self):
+        ''' Bind shader, textures and window for drawing '''
+        self._apply_frame()
+        self.shader.bind(self._texture, self._lut, *self._shader_bias_scale())
+
+    def unbind(self):
+        self.shader.unbind()
+
+    @property
+    def level(self):
+        ''' Pyramid level in texture; 0 is full resolution '''
+        return self._level
+
+    def _select_level(self, w, h):
+        ''' Upload pyramid level matching blit size `w`, `h` '''
+        rows, cols = self._pyramid.shape[:2]
+        density = max(abs(w) / float(cols), abs(h) / float(rows))
+        level = self._pyramid.level_for(density)
+        if level != self._level:
+            self._set_texture_data(self._pyramid.level(level))
+            self._level = level
+            self._extent = self._pyramid.extent(level)
 
     def blit(self, x, y, w, h):
         ''' Blit array onto active framebuffer. '''
-        self.shader.bind(self._texture, self._lut)
-        self._texture.blit(x,y,w,h)
-        self.shader.unbind()
+        self._apply_frame()
+        if self._pyramid is not None:
+            self._select_level(w, h)
+        self.bind()
+        t_extent, s_extent = self._extent
+        self.shader.blit(self._texture, x, y, w, h,
+                         s=(0, s_extent), t=(0, t_extent))
+        self.unbind()
+
+
+class VolumeGlice(Glice):
+    ''' GL slice object drawing slices from a 3D volume
+
+    We upload the volume once, as a 3D texture, and select the slice to draw
+    with shader uniforms, so changing slice or axis costs no upload.
+    '''
+    texture_class = Texture3D
+
+    def __init__(self, vol, axis=0, index=None, shader=None, cmap=None,
+                 vmin=None, vmax=None, keep_data=True):
+        ''' Create GL slice object from 3D array `vol`
+
+        `axis` is the array axis to slice along, and `index` is the slice
+        index along `axis`, defaulting to the middle slice.  `shader` should
+        be a ``gshaders.VolumeShader`` such as ``gshaders.Bilinear3D``.  The
+        other parameters are as for ``Glice``.
+        '''
+        Glice.__init__(self, vol, shader, cmap, vmin, vmax,
+                       keep_data=keep_data)
+        self.axis = axis
+        self.set_slice(index)
+
+    def _default_shader(self):
+        return gshaders.Nearest3D(True)
+
+    @property
+    def shape(self):
+        ''' Shape of volume '''
+        texture = self._texture
+        return texture.depth, texture.height, texture.width
+
+    def set_slice(self, index=None, axis=None):
+        ''' Select slice `index` along `axis` for drawing
+
+        None for `axis` keeps the current axis; None for `index` selects the
+        middle slice.
+        '''
+        if axis is None:
+            axis = self.axis
+        n_slices = self.shape[axis]
+        if index is None:
+            index = n_slices // 2
+        if not 0 <= index < n_slices:
+            raise IndexError('Slice index %d out of range for axis %d'
+                             % (index, axis))
+        self.axis, self.index = axis, index
+
+    def set_data(self, vol):
+        ''' Set new volume data from `vol` '''
+        self._texture.set_data(vol)
+        self._arr = vol if self.keep_data else None
+        self.set_slice(min(self.index, self.shape[self.axis] - 1))
+
+    @property
+    def bind_key(self):
+        return Glice.bind_key.fget(self) + (self.axis, self.index)
+
+    def bind(self):
+        self._apply_frame()
+        self.shader.bind(self._texture, self._lut,
+                         *self._shader_bias_scale(),
+                         axis=self.axis, index=self.index)
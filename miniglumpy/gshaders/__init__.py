@@ -39,7 +39,10 @@
     that is in the corresponding space, even if it is occluded; the Z-buffer
     sorts this out later.)
 '''
-from shader import Shader
-from nearest import Nearest
-from bilinear import Bilinear
-from bicubic import Bicubic
+from .shader import Shader, set_program_cache_dir
+from .nearest import Nearest
+from .bilinear import Bilinear
+from .bicubic import Bicubic
+from .volume import VolumeShader, Nearest3D, Bilinear3D
+from .lightbox import LightboxShader, NearestArray, BilinearArray
+from .layered import Layered, layered_shader
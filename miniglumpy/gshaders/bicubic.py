@@ -6,40 +6,106 @@
 # Distributed under the terms of the BSD License. The full license is in
 # the file COPYING, distributed as part of this software.
 # -----------------------------------------------------------------------------
-import math
 import ctypes
+from collections import OrderedDict
+
+import numpy as np
 
 import pyglet.gl as gl
 
-from shader import Shader, read_shader
-
-
-def build_kernel(size=256):
-    # From GPU Gems
-    # Chapter 24. High-Quality Filtering
-    # Kevin Bjorke, NVIDIA
-    # http://http.developer.nvidia.com/GPUGems/gpugems_ch24.html
-    #
-    # Mitchell Netravali Reconstruction Filter
-    # a = 1.0, b = 0.0  - cubic B-spline
-    # B = 1/3, b = 1/3  - recommended
-    # a = 0.5, b = 0.0  - Catmull-Rom spline
-    def MitchellNetravali(x, a=1, b=0):
-        x = math.fabs(x)
-        if x < 1.0:
-            return ((12-9*a-6*b) *x*x*x + (-18+12*a+6*b)*x*x + (6-2*a))/6.0
-        elif x < 2.0:
-            return ((-a-6*b)*x*x*x + (6*a+30*b)*x*x + (-12*a-48*b)*x + (8*a+24*b))/6.0
-        else:
-            return 0
-    
-    data = (gl.GLfloat*(4*size))()
-    for i in range(size):
-        x = i/float(size-1)
-        data[i*4+0] = MitchellNetravali(x+1)
-        data[i*4+1] = MitchellNetravali(x)
-        data[i*4+2] = MitchellNetravali(1-x)
-        data[i*4+3] = MitchellNetravali(2-x)
+from .shader import Shader, read_shader
+from ..contexts import context_cache, current_space, delete_objects
+from ..textures import QuadBuffer, quad_vertices
+
+
+# Mitchell Netravali (B, C) parameters for named filters
+# From GPU Gems
+# Chapter 24. High-Quality Filtering
+# Kevin Bjorke, NVIDIA
+# http://http.developer.nvidia.com/GPUGems/gpugems_ch24.html
+FILTERS = {
+    'bspline': (1.0, 0.0),          # cubic B-spline
+    'mitchell': (1.0/3, 1.0/3),     # recommended
+    'catmull-rom': (0.0, 0.5),      # Catmull-Rom spline
+}
+
+
+def mitchell_netravali(x, b=1.0, c=0.0):
+    ''' Mitchell Netravali reconstruction filter at distances `x` '''
+    x = np.abs(np.asarray(x, dtype=np.float64))
+    x2 = x * x
+    x3 = x2 * x
+    near = ((12-9*b-6*c)*x3 + (-18+12*b+6*c)*x2 + (6-2*b))/6.0
+    far = ((-b-6*c)*x3 + (6*b+30*c)*x2 + (-12*b-48*c)*x + (8*b+24*c))/6.0
+    return np.where(x < 1, near, np.where(x < 2, far, 0))
+
+
+def lanczos(x, a=2):
+    ''' Lanczos windowed sinc filter with `a` lobes at distances `x` '''
+    x = np.asarray(x, dtype=np.float64)
+    return np.where(np.abs(x) < a, np.sinc(x) * np.sinc(x / a), 0)
+
+
+def _check_filter(filter):
+    ''' Return `filter` name, or Mitchell Netravali ``(B, C)`` float tuple
+
+    Raises ValueError for an unknown filter.
+    '''
+    names = sorted(FILTERS) + ['lanczos']
+    if filter in names:
+        return filter
+    try:
+        if isinstance(filter, str):
+            raise ValueError
+        b, c = (float(p) for p in filter)
+    except (TypeError, ValueError):
+        raise ValueError('Unknown filter %r; choose from %s, or a (B, C) '
+                         'tuple' % (filter, ', '.join(names)))
+    return b, c
+
+
+def kernel_weights(size=256, filter='bspline'):
+    ''' Return weights of 4 taps for `size` fractional texel positions
+
+    Parameters
+    ----------
+    size : int, optional
+        number of fractional positions, spread over [0, 1]
+    filter : str or tuple, optional
+        key into ``FILTERS``, 'lanczos' for the two lobe Lanczos filter, or a
+        Mitchell Netravali ``(B, C)`` tuple.
+
+    Returns
+    -------
+    weights : (size, 4) float32 array
+        weights for texels at distance ``(x+1, x, 1-x, 2-x)`` for fractional
+        positions ``x``.
+    '''
+    filter = _check_filter(filter)
+    x = np.arange(size) / float(size - 1)
+    distances = np.column_stack((x + 1, x, 1 - x, 2 - x))
+    if filter == 'lanczos':
+        weights = lanczos(distances)
+        # Two lobes truncated to four taps; normalize to preserve brightness
+        weights /= weights.sum(axis=1)[:, None]
+    else:
+        b, c = FILTERS[filter] if filter in FILTERS else filter
+        weights = mitchell_netravali(distances, b, c)
+    return weights.astype(np.float32)
+
+
+def build_kernel(size=256, filter='bspline'):
+    ''' Return id of 1D RGBA texture with weights for bicubic filtering
+
+    The texture for given `size` and `filter` is made once per GL context,
+    and shared.  See ``kernel_weights`` for parameters.
+    '''
+    filter = _check_filter(filter)
+    kernels = context_cache('bicubic_kernels')
+    key = (filter, size)
+    if key in kernels:
+        return kernels[key]
+    data = kernel_weights(size, filter)
     texid = gl.GLuint()
     gl.glGenTextures(1, ctypes.byref(texid))
     kernel = texid.value
@@ -54,17 +120,146 @@ def build_kernel(size=256):
                         gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP)
     gl.glTexParameterf (gl.GL_TEXTURE_1D,
                         gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP)
-    gl.glTexImage1D (gl.GL_TEXTURE_1D,  0, gl.GL_RGBA16, size, 0,
-                     gl.GL_RGBA, gl.GL_FLOAT, data)
+    # Float storage keeps the negative lobes of Catmull-Rom and others
+    gl.glTexImage1D (gl.GL_TEXTURE_1D,  0, gl.GL_RGBA32F_ARB, size, 0,
+                     gl.GL_RGBA, gl.GL_FLOAT, data.ctypes.data)
+    kernels[key] = kernel
     return kernel
 
 
+class _PassTarget(object):
+    ''' `width` by `height` float texture and framebuffer for first pass '''
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self._space = current_space()
+        texid = gl.GLuint()
+        gl.glGenTextures(1, ctypes.byref(texid))
+        self.id = texid.value
+        fbo = gl.GLuint()
+        gl.glGenFramebuffers(1, ctypes.byref(fbo))
+        self._fbo = fbo
+        self._saved = []
+        self._allocate()
+
+    def __del__(self):
+        delete_objects(self._space, gl.glDeleteFramebuffers,
+                       [self._fbo.value])
+        delete_objects(self._space, gl.glDeleteTextures, [self.id])
+
+    @staticmethod
+    def _bound_fbo():
+        previous = gl.GLint()
+        gl.glGetIntegerv(gl.GL_FRAMEBUFFER_BINDING, ctypes.byref(previous))
+        return previous.value
+
+    def _allocate(self):
+        width, height = self.width, self.height
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.id)
+        for param in (gl.GL_TEXTURE_MIN_FILTER, gl.GL_TEXTURE_MAG_FILTER):
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, param, gl.GL_NEAREST)
+        for param in (gl.GL_TEXTURE_WRAP_S, gl.GL_TEXTURE_WRAP_T):
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, param, gl.GL_CLAMP_TO_EDGE)
+        # Float storage keeps unwindowed values, and the negative lobes
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA32F_ARB, width, height,
+                        0, gl.GL_RGBA, gl.GL_FLOAT, None)
+        previous = self._bound_fbo()
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._fbo)
+        gl.glFramebufferTexture2D(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0,
+                                  gl.GL_TEXTURE_2D, self.id, 0)
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, previous)
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError('Float framebuffer incomplete; status 0x%x'
+                               % status)
+
+    def bind(self):
+        ''' Draw into target, with pixel viewport and projection '''
+        viewport = (gl.GLint * 4)()
+        gl.glGetIntegerv(gl.GL_VIEWPORT, viewport)
+        self._saved.append((self._bound_fbo(), tuple(viewport)))
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._fbo)
+        gl.glViewport(0, 0, self.width, self.height)
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
+        gl.glOrtho(0, self.width, 0, self.height, -1, 1)
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
+
+    def unbind(self):
+        ''' Restore framebuffer, viewport and projection from ``bind`` '''
+        fbo, viewport = self._saved.pop()
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPopMatrix()
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glPopMatrix()
+        gl.glViewport(*viewport)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, fbo)
+
+
+def _pass_sources(direction, use_lut=False):
+    ''' Return vertex, fragment sources for separable pass along `direction`
+
+    The first pass, along (1, 0), writes raw filtered values; the second,
+    along (0, 1), applies window and LUT.
+    '''
+    interpolation = read_shader('bicubic.txt')
+    separable     = read_shader('bicubic_separable.txt')
+    lut           = read_shader('lut.txt')
+    vertex        = read_shader('vertex_standard.txt')
+    fragment      = read_shader('fragment_bicubic_pass.txt')
+    if direction == (1, 0):
+        output_code = 'gl_FragColor = color;'
+    else:
+        output_code = 'color.a = color.a*scale + bias;\n'
+        if use_lut:
+            output_code += '    color = texture1D_lut(lut, color.a);\n'
+        output_code += '    gl_FragColor = color*gl_Color;'
+    fragment = fragment % ('%.1f, %.1f' % direction, output_code)
+    return [vertex], [interpolation] + [separable] + [lut] + [fragment]
+
+
 class Bicubic(Shader):
-    def __init__(self, use_lut=False, lighted=False, gridsize=(0.0,0.0,0.0), elevation=0.0):
+    # Number of first pass framebuffer sizes to keep, for separable
+    max_pass_targets = 4
+
+    def __init__(self, use_lut=False, lighted=False, gridsize=(0.0,0.0,0.0), elevation=0.0,
+                 filter='bspline', separable=False):
+        ''' Bicubic interpolation shader
+
+        `filter` selects the cubic kernel; see ``kernel_weights``.
+
+        With `separable` True, ``blit`` filters in two passes of four
+        texture fetches each, instead of one pass of sixteen: first along
+        texture rows, into a float framebuffer of the blit width by the
+        texture height, then along columns from that framebuffer to the
+        output.  We keep the framebuffers for the `max_pass_targets` most
+        recently used sizes, so blits of the same size, and Glices of
+        different heights sharing the shader, reuse them.  The kernel
+        texture is shared with the one pass shader.  Separable filtering
+        needs a pixel projection, as for ``OffscreenTarget``.  As it draws
+        in two passes, ``draw_batch`` draws its blits one by one.  It does
+        not support `lighted`, `gridsize` or `elevation`.
+        '''
         self._lighted = lighted
         self._gridsize = gridsize
         self._gridwidth = (1.0,1.0,1.0)
         self._elevation = elevation
+        self.separable = self.multipass = separable
+        self.filter = filter = _check_filter(filter)
+        if separable:
+            if lighted or elevation or any(gridsize):
+                raise ValueError('Separable bicubic does not support light, '
+                                 'grid or elevation')
+            # Our own program is the second pass
+            vert, frag = _pass_sources((0, 1), use_lut)
+            Shader.__init__(self, vert=vert, frag=frag)
+            self._horizontal = Shader(*_pass_sources((1, 0)))
+            self._pass_targets = OrderedDict()
+            self._quads = QuadBuffer()
+            self.kernel = build_kernel(filter=filter)
+            return
         interpolation = read_shader('bicubic.txt')
         light         = read_shader('phong.txt')
         lut           = read_shader('lut.txt')
@@ -84,24 +279,74 @@ class Bicubic(Shader):
         Shader.__init__(self,
           vert = [interpolation] + [vertex],
           frag = [interpolation] + [light] + [lut] + [fragment])
-        self.kernel = build_kernel()
+        self.kernel = build_kernel(filter=filter)
+
+    def bind(self, texture, lut=None, bias=0.0, scale=1.0):
+        ''' Bind the program, i.e. use it.
 
-    def bind(self, texture, lut=None):
-        ''' Bind the program, i.e. use it. '''
+        For `separable`, this binds the second pass; ``blit`` draws the
+        first pass before drawing the second.
+        '''
         Shader.bind(self)
         gl.glActiveTexture(gl.GL_TEXTURE2)
         gl.glBindTexture(gl.GL_TEXTURE_1D, self.kernel)
-        self.uniformi('kernel', 2)
         if lut is not None:
             gl.glActiveTexture(gl.GL_TEXTURE1)
             gl.glBindTexture(lut.target, lut.id)
-            self.uniformi('lut', 1)
         gl.glEnable(texture.target)
         gl.glActiveTexture(gl.GL_TEXTURE0)
         gl.glBindTexture(texture.target, texture.id)
-        self.uniformi('texture', 0)
-        self.uniformf('elevation', self._elevation)
-        self.uniformf('pixel', 1.0/texture.width, 1.0/texture.height)
-        self.uniformf('gridsize', *self._gridsize)
-        self.uniformf('gridwidth', *self._gridwidth)
-        self.uniformi('lighted', self._lighted)
+        texture.set_filter('nearest')
+        uniforms = dict(kernel=2, lut=1, texture=0, bias=bias, scale=scale)
+        if not self.separable:
+            uniforms.update(elevation=self._elevation,
+                            pixel=(1.0/texture.width, 1.0/texture.height),
+                            gridsize=self._gridsize,
+                            gridwidth=self._gridwidth,
+                            lighted=self._lighted)
+        self.set_uniforms(**uniforms)
+
+    def blit(self, texture, x, y, w, h, s=(0,1), t=(0,1)):
+        ''' Draw `texture` into rectangle, in two passes if separable '''
+        if not self.separable:
+            return Shader.blit(self, texture, x, y, w, h, s=s, t=t)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        bound = gl.GLint()
+        gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D, ctypes.byref(bound))
+        # Horizontal pass: one column per output pixel, one row per texel
+        # row.  Texture row 0 at the bottom, so rows match texture rows.
+        width, height = max(int(round(abs(w))), 1), texture.height
+        target = self._pass_target(width, height)
+        target.bind()
+        self._horizontal.bind()
+        gl.glBindTexture(texture.target, texture.id)
+        self._horizontal.set_uniforms(kernel=2, texture=0,
+                                      pixel=(1.0/texture.width,
+                                             1.0/texture.height))
+        self._draw_quad((0, 0, width, height) + tuple(s) + (1, 0))
+        target.unbind()
+        # Vertical pass from framebuffer, with window and LUT
+        Shader.bind(self)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, target.id)
+        self.set_uniforms(pixel=(1.0/width, 1.0/height))
+        self._draw_quad((x, y, w, h, 0, 1) + tuple(t))
+        # Restore caller's texture
+        gl.glBindTexture(gl.GL_TEXTURE_2D, bound.value)
+
+    def _pass_target(self, width, height):
+        ''' Return first pass target of `width`, `height`, most recent last '''
+        key = (width, height)
+        target = self._pass_targets.pop(key, None)
+        if target is None:
+            if len(self._pass_targets) >= self.max_pass_targets:
+                self._pass_targets.popitem(last=False)
+            target = _PassTarget(width, height)
+        self._pass_targets[key] = target
+        return target
+
+    def _draw_quad(self, rect):
+        ''' Draw one quad from ``(x, y, w, h, s0, s1, t0, t1)`` `rect` '''
+        quads = self._quads
+        if rect != quads.key:
+            quads.set_vertices(quad_vertices([rect]), rect)
+        quads.draw()
@@ -8,16 +8,23 @@
 # -----------------------------------------------------------------------------
 import pyglet.gl as gl
 
-from shader import Shader, read_shader
+from .shader import Shader, read_shader
 
 
 class Bilinear(Shader):
-    def __init__(self, use_lut=False, lighted=False, gridsize=(0.0,0.0,0.0), elevation=0.0):
+    def __init__(self, use_lut=False, lighted=False, gridsize=(0.0,0.0,0.0), elevation=0.0,
+                 hardware=False):
+        ''' With `hardware` True, interpolate with one fetch from the texture
+        set to GL_LINEAR filtering, rather than four nearest fetches. '''
+        self.hardware = hardware
         self._lighted = lighted
         self._gridsize = gridsize
         self._gridwidth = (1.0,1.0,1.0)
         self._elevation = elevation
-        interpolation = read_shader('bilinear.txt')
+        if hardware:
+            interpolation = read_shader('bilinear_hardware.txt')
+        else:
+            interpolation = read_shader('bilinear.txt')
         light         = read_shader('phong.txt')
         lut           = read_shader('lut.txt')
         vertex        = read_shader('vertex.txt')
@@ -38,19 +45,20 @@ class Bilinear(Shader):
           frag = [interpolation] + [light] + [lut] + [fragment])
 
 
-    def bind(self, texture, lut=None):
+    def bind(self, texture, lut=None, bias=0.0, scale=1.0):
         ''' Bind the program, i.e. use it. '''
         Shader.bind(self)
         if lut is not None:
             gl.glActiveTexture(gl.GL_TEXTURE1)
             gl.glBindTexture(lut.target, lut.id)
-            self.uniformi('lut', 1)
         gl.glEnable(texture.target)
         gl.glActiveTexture(gl.GL_TEXTURE0)
         gl.glBindTexture(texture.target, texture.id)
-        self.uniformi('texture', 0)
-        self.uniformf('elevation', self._elevation)
-        self.uniformf('pixel', 1.0/texture.width, 1.0/texture.height)
-        self.uniformf('gridsize', *self._gridsize)
-        self.uniformf('gridwidth', *self._gridwidth)
-        self.uniformi('lighted', self._lighted)
+        texture.set_filter('linear' if self.hardware else 'nearest')
+        self.set_uniforms(lut=1, texture=0,
+                          elevation=self._elevation,
+                          pixel=(1.0/texture.width, 1.0/texture.height),
+                          gridsize=self._gridsize,
+                          gridwidth=self._gridwidth,
+                          lighted=self._lighted,
+                          bias=bias, scale=scale)
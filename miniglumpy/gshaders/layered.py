@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2009-2010  Nicolas P. Rougier
+#
+# Distributed under the terms of the BSD License. The full license is in
+# the file COPYING, distributed as part of this software.
+# -----------------------------------------------------------------------------
+''' Shaders compositing several windowed, colormapped layers in one pass '''
+import pyglet.gl as gl
+
+from .shader import Shader, read_shader
+from ..contexts import context_cache
+
+# Each layer takes two texture units, for data and LUT
+MAX_LAYERS = 8
+
+# Interpolation snippets by name
+INTERPOLATIONS = {
+    'nearest': 'nearest.txt',
+    'bilinear': 'bilinear.txt'}
+
+
+class Layered(Shader):
+    ''' Composite layers, each with own interpolation, LUT and window
+
+    Layer ``i`` draws over layers ``0`` to ``i - 1``, with its own opacity.
+    Texel values below the layer threshold are transparent.  The fragment
+    program comes from the ``nearest.txt``, ``bilinear.txt`` and ``lut.txt``
+    snippets, with one block per layer, so drawing costs one pass whatever
+    the number of layers.  Use ``layered_shader`` to share shaders between
+    layer configurations.
+
+    Parameters
+    ----------
+    interpolations : sequence
+        interpolation name for each layer, one of 'nearest', 'bilinear'
+    '''
+    def __init__(self, interpolations):
+        interpolations = tuple(interpolations)
+        if not 0 < len(interpolations) <= MAX_LAYERS:
+            raise ValueError('Need between 1 and %d layers' % MAX_LAYERS)
+        self.interpolations = interpolations
+        sources = []
+        for name in sorted(set(interpolations)):
+            if name not in INTERPOLATIONS:
+                raise ValueError('Unknown interpolation "%s"' % name)
+            # Each snippet defines interpolated_texture2D; rename per snippet
+            sources.append(read_shader(INTERPOLATIONS[name]).replace(
+                'interpolated_texture2D', 'interpolated_texture2D_' + name))
+        lut      = read_shader('lut.txt')
+        vertex   = read_shader('vertex_standard.txt')
+        fragment = read_shader('fragment_layered.txt')
+        uniforms = read_shader('layer_uniforms.txt')
+        layer    = read_shader('layer.txt')
+        uniform_code = layer_code = ''
+        for index, name in enumerate(interpolations):
+            values = dict(index=index,
+                          interpolation='interpolated_texture2D_' + name)
+            uniform_code += uniforms % values
+            layer_code += layer % values
+        fragment = fragment % (uniform_code, layer_code)
+        Shader.__init__(self,
+          vert = [vertex],
+          frag = sources + [lut] + [fragment])
+
+    def bind(self, layers):
+        ''' Bind the program, textures and parameters of `layers`
+
+        Parameters
+        ----------
+        layers : sequence
+            sequence of ``(texture, lut, bias, scale, threshold, opacity,
+            extent)`` for each layer.  `threshold` is in texture values;
+            `extent` is the ``(s, t)`` texture coordinate range to draw.
+        '''
+        Shader.bind(self)
+        uniforms = {}
+        for i, layer in enumerate(layers):
+            texture, lut, bias, scale, threshold, opacity, extent = layer
+            gl.glActiveTexture(gl.GL_TEXTURE0 + 2 * i + 1)
+            gl.glBindTexture(lut.target, lut.id)
+            gl.glActiveTexture(gl.GL_TEXTURE0 + 2 * i)
+            gl.glBindTexture(texture.target, texture.id)
+            texture.set_filter('nearest')
+            uniforms.update({
+                'texture%d' % i: 2 * i,
+                'lut%d' % i: 2 * i + 1,
+                'pixel%d' % i: (1.0/texture.width, 1.0/texture.height),
+                'extent%d' % i: extent,
+                'bias%d' % i: bias,
+                'scale%d' % i: scale,
+                'threshold%d' % i: threshold,
+                'opacity%d' % i: opacity})
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        self.set_uniforms(**uniforms)
+
+
+def layered_shader(interpolations):
+    ''' Return ``Layered`` shader for `interpolations`, shared per context '''
+    interpolations = tuple(interpolations)
+    shaders = context_cache('layered_shaders')
+    if interpolations not in shaders:
+        shaders[interpolations] = Layered(interpolations)
+    return shaders[interpolations]
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2009-2010  Nicolas P. Rougier
+#
+# Distributed under the terms of the BSD License. The full license is in
+# the file COPYING, distributed as part of this software.
+# -----------------------------------------------------------------------------
+''' Shaders drawing grids of 2D texture array layers with instancing '''
+import pyglet.gl as gl
+
+from .shader import Shader, read_shader
+
+# Number of grid cells per instanced draw; the size of the layers uniform
+MAX_INSTANCES = 256
+
+
+class LightboxShader(Shader):
+    ''' Draw grid cells from layers of a ``Texture2DArray``
+
+    Each instance of one quad draws one grid cell, from the texture array
+    layer for that cell, so the whole grid is one instanced draw of up to
+    `MAX_INSTANCES` cells.  Needs GLSL 1.20 with the
+    ``GL_EXT_texture_array`` and ``GL_ARB_draw_instanced`` extensions.
+    Subclasses set the interpolation code in `_interpolation`.
+    '''
+    _interpolation = None
+
+    def __init__(self, use_lut=False):
+        interpolation = read_shader(self._interpolation)
+        lut           = read_shader('lut.txt')
+        vertex        = read_shader('vertex_lightbox.txt')
+        fragment      = read_shader('fragment_lightbox.txt')
+        lut_code = ''
+        if use_lut:
+            lut_code = 'color = texture1D_lut(lut, color.a);'
+        vertex    = vertex % MAX_INSTANCES
+        fragment  = fragment % lut_code
+        Shader.__init__(self,
+          vert = [vertex],
+          frag = [interpolation] + [lut] + [fragment])
+
+    def bind(self, texture, lut=None, bias=0.0, scale=1.0):
+        ''' Bind the program, texture array `texture` and window '''
+        Shader.bind(self)
+        if lut is not None:
+            gl.glActiveTexture(gl.GL_TEXTURE1)
+            gl.glBindTexture(lut.target, lut.id)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        gl.glBindTexture(texture.target, texture.id)
+        self.set_uniforms(lut=1, texture=0,
+                          pixel=(1.0/texture.width, 1.0/texture.height),
+                          bias=bias, scale=scale)
+
+    def set_cells(self, layers, columns, cell, first=0):
+        ''' Set texture array `layers` for grid cells from cell `first`
+
+        `columns` is the number of cells per grid row, and `cell` the
+        ``(x, y)`` step between cells.  Draw ``len(layers)`` instances.
+        '''
+        self.uniform_arrayf('layers', layers)
+        self.set_uniforms(first=first, columns=columns, cell=cell)
+
+
+class NearestArray(LightboxShader):
+    _interpolation = 'nearest_array.txt'
+
+
+class BilinearArray(LightboxShader):
+    _interpolation = 'bilinear_array.txt'
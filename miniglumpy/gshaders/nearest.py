@@ -9,7 +9,7 @@
 ''' Nearest interpolation shaders '''
 import pyglet.gl as gl
 
-from shader import Shader, read_shader
+from .shader import Shader, read_shader
 
 class Nearest(Shader):
     def __init__(self, use_lut=False, lighted=False,
@@ -38,20 +38,21 @@ class Nearest(Shader):
           vert = [interpolation] + [vertex],
           frag = [interpolation] + [light] + [lut] + [fragment])
 
-    def bind(self, texture, lut=None):
+    def bind(self, texture, lut=None, bias=0.0, scale=1.0):
         ''' Bind the program and relevant parameters '''
 
         Shader.bind(self)
         if lut is not None:
             gl.glActiveTexture(gl.GL_TEXTURE1)
             gl.glBindTexture(lut.target, lut.id)
-            self.uniformi('lut', 1)
         gl.glEnable(texture.target)
         gl.glActiveTexture(gl.GL_TEXTURE0)
         gl.glBindTexture(texture.target, texture.id)
-        self.uniformi('texture', 0)
-        self.uniformf('elevation', self._elevation)
-        self.uniformf('pixel', 1.0/texture.width, 1.0/texture.height)
-        self.uniformf('gridsize', *self._gridsize)
-        self.uniformf('gridwidth', *self._gridwidth)
-        self.uniformi('lighted', self._lighted)
+        texture.set_filter('nearest')
+        self.set_uniforms(lut=1, texture=0,
+                          elevation=self._elevation,
+                          pixel=(1.0/texture.width, 1.0/texture.height),
+                          gridsize=self._gridsize,
+                          gridwidth=self._gridwidth,
+                          lighted=self._lighted,
+                          bias=bias, scale=scale)
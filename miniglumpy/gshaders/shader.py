@@ -32,30 +32,88 @@
     shader.unbind()
 '''
 import os
+import hashlib
+import struct
 import pyglet.gl as gl
 import ctypes
 
+from ..contexts import context_cache
+
+# Directory for linked program binaries; None means do not store binaries
+_program_cache_dir = os.environ.get('MINIGLUMPY_PROGRAM_CACHE')
+
+
+def set_program_cache_dir(path):
+    ''' Set directory to store linked program binaries, None to disable
+
+    With a cache directory, we save each newly linked program with
+    ``glGetProgramBinary`` and, in later processes, load it with
+    ``glProgramBinary`` instead of compiling.  The default comes from the
+    ``MINIGLUMPY_PROGRAM_CACHE`` environment variable.
+    '''
+    global _program_cache_dir
+    _program_cache_dir = path
+
+
 class Shader:
     ''' Base shader class. '''
 
+    # True for shaders whose ``blit`` draws in more than one pass
+    multipass = False
+
     def __init__(self, vert = None, frag = None, name=''):
         ''' vert, frag and geom take arrays of source strings
-            the arrays will be concatenated into one string by OpenGL.'''
+            the arrays will be concatenated into one string by OpenGL.
+
+            Programs with identical sources share one GL program per context.
+        '''
 
-        self.uniforms = {}
         self.name = name
+        key = _source_key(vert, frag)
+        programs = context_cache('programs')
+        if key not in programs:
+            self._make_program(vert, frag, key)
+            state = _ProgramState(self.handle, self.linked)
+            if not self.linked:
+                self._set_state(state)
+                return
+            programs[key] = state
+        state = programs[key]
+        self.handle = state.handle
+        self.linked = True
+        self._set_state(state)
+
+    def _set_state(self, state):
+        # Uniform locations, types and last set values belong to the GL
+        # program, and so are shared between Shaders using that program
+        self.uniforms = state.locations
+        self._types = state.types
+        self._values = state.values
+
+    def _make_program(self, vert, frag, key):
+        ''' Make and link program, or load program binary '''
         # create the program handle
         self.handle = gl.glCreateProgram()
         # we are not linked yet
         self.linked = False
-        # create the vertex shader
-        self._build_shader(vert, gl.GL_VERTEX_SHADER)
-        # create the fragment shader
-        self._build_shader(frag, gl.GL_FRAGMENT_SHADER)
-        # the geometry shader will be the same, once pyglet supports the
-        # extension self.createShader(frag, GL_GEOMETRY_SHADER_EXT) attempt to
-        # link the program
-        self._link()
+        binary_path = _program_binary_path(key)
+        if binary_path is not None:
+            self._load_binary(binary_path)
+        if not self.linked:
+            # create the vertex shader
+            self._build_shader(vert, gl.GL_VERTEX_SHADER)
+            # create the fragment shader
+            self._build_shader(frag, gl.GL_FRAGMENT_SHADER)
+            # the geometry shader will be the same, once pyglet supports the
+            # extension self.createShader(frag, GL_GEOMETRY_SHADER_EXT)
+            # attempt to link the program
+            if binary_path is not None:
+                gl.glProgramParameteri(self.handle,
+                                       gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT,
+                                       gl.GL_TRUE)
+            self._link()
+            if self.linked and binary_path is not None:
+                self._save_binary(binary_path)
 
     def _build_shader(self, strings, stype):
         ''' Actual building of the shader '''
@@ -70,7 +128,8 @@ class Shader:
 
         # convert the source strings into a ctypes pointer-to-char array, and upload them
         # this is deep, dark, dangerous black magick - don't try stuff like this at home!
-        src = (ctypes.c_char_p * count)(*strings)
+        src = (ctypes.c_char_p * count)(*[s.encode('ascii')
+                                          for s in strings])
         gl.glShaderSource(shader, count,
                           ctypes.cast(ctypes.pointer(src),
                                       ctypes.POINTER(ctypes.POINTER(ctypes.c_char))), None)
@@ -91,7 +150,7 @@ class Shader:
             # retrieve the log text
             gl.glGetShaderInfoLog(shader, temp, None, buffer)
             # print the log to the console
-            print buffer.value
+            print(buffer.value)
         else:
             # all is well, so attach the shader to the program
             gl.glAttachShader(self.handle, shader)
@@ -114,11 +173,52 @@ class Shader:
             # retrieve the log text
             gl.glGetProgramInfoLog(self.handle, temp, None, buffer)
             # print the log to the console
-            print buffer.value
+            print(buffer.value)
         else:
             # all is well, so we are linked
             self.linked = True
 
+    def _load_binary(self, path):
+        ''' Load linked program binary from `path` if present '''
+        try:
+            fid = open(path, 'rb')
+            data = fid.read()
+            fid.close()
+        except IOError:
+            return
+        if len(data) <= 4:
+            return
+        fmt, = struct.unpack('<I', data[:4])
+        binary = ctypes.create_string_buffer(data[4:], len(data) - 4)
+        gl.glProgramBinary(self.handle, fmt, binary, len(binary))
+        temp = ctypes.c_int(0)
+        gl.glGetProgramiv(self.handle, gl.GL_LINK_STATUS, ctypes.byref(temp))
+        # A driver update can invalidate the binary; we then compile instead
+        self.linked = bool(temp.value)
+
+    def _save_binary(self, path):
+        ''' Save linked program binary to `path` '''
+        length = ctypes.c_int(0)
+        gl.glGetProgramiv(self.handle,
+                          gl.GL_PROGRAM_BINARY_LENGTH, ctypes.byref(length))
+        if not length.value:
+            return
+        binary = ctypes.create_string_buffer(length.value)
+        written = gl.GLsizei(0)
+        fmt = gl.GLenum(0)
+        gl.glGetProgramBinary(self.handle, length.value,
+                              ctypes.byref(written), ctypes.byref(fmt), binary)
+        # Write to temporary file and rename, so readers never see part files
+        tmp_path = '%s.%d' % (path, os.getpid())
+        try:
+            fid = open(tmp_path, 'wb')
+            fid.write(struct.pack('<I', fmt.value))
+            fid.write(binary.raw[:written.value])
+            fid.close()
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            pass
+
     def bind(self):
         ''' Bind the program, i.e. use it. '''
         gl.glUseProgram(self.handle)
@@ -128,59 +228,196 @@ class Shader:
             program, so this should probably be a class method instead. '''
         gl.glUseProgram(0)
 
+    def blit(self, texture, x, y, w, h, s=(0,1), t=(0,1)):
+        ''' Draw `texture` with bound program into rectangle `x, y, w, h`
+
+        `s` and `t` are the texture coordinate ranges to draw.  Shaders
+        drawing in several passes override this, and set `multipass`.
+        '''
+        texture.blit(x, y, w, h, s=s, t=t)
+
+    def _location(self, name):
+        ''' Return location of uniform `name`, -1 if not an active uniform '''
+        loc = self.uniforms.get(name)
+        if loc is None:
+            loc = gl.glGetUniformLocation(self.handle,
+                                           name.encode('ascii'))
+            self.uniforms[name] = loc
+        return loc
+
+    def _changed(self, name, vals):
+        ''' True if uniform `name` is active and does not have `vals` '''
+        if self._location(name) == -1 or self._values.get(name) == vals:
+            return False
+        self._values[name] = vals
+        return True
+
     def uniformf(self, name, *vals):
-        ''' Uploads float uniform(s), program must be currently bound. '''
+        ''' Uploads float uniform(s), program must be currently bound.
 
-        loc = self.uniforms.get(name,
-                                gl.glGetUniformLocation(self.handle,name))
-        self.uniforms[name] = loc
+        We skip the upload if the uniform already has these values.
+        '''
 
         # Check there are 1-4 values
-        if len(vals) in range(1, 5):
+        if len(vals) in range(1, 5) and self._changed(name, vals):
             # Select the correct function
             { 1 : gl.glUniform1f,
               2 : gl.glUniform2f,
               3 : gl.glUniform3f,
               4 : gl.glUniform4f
               # Retrieve uniform location, and set it
-            }[len(vals)](loc, *vals)
+            }[len(vals)](self.uniforms[name], *vals)
 
     def uniformi(self, name, *vals):
-        ''' Upload integer uniform(s), program must be currently bound. '''
+        ''' Upload integer uniform(s), program must be currently bound.
 
-        loc = self.uniforms.get(name,
-                                gl.glGetUniformLocation(self.handle,name))
-        self.uniforms[name] = loc
+        We skip the upload if the uniform already has these values.
+        '''
 
         # Checks there are 1-4 values
-        if len(vals) in range(1, 5):
+        if len(vals) in range(1, 5) and self._changed(name, vals):
             # Selects the correct function
             { 1 : gl.glUniform1i,
               2 : gl.glUniform2i,
               3 : gl.glUniform3i,
               4 : gl.glUniform4i
               # Retrieves uniform location, and set it
-            }[len(vals)](loc, *vals)
+            }[len(vals)](self.uniforms[name], *vals)
 
 
-    def uniform_matrixf(self, name, mat):
-        ''' Upload uniform matrix, program must be currently bound. '''
+    def uniform_arrayf(self, name, vals):
+        ''' Upload float array uniform, program must be currently bound.
 
-        loc = self.uniforms.get(name,
-                                gl.glGetUniformLocation(self.handle,name))
-        self.uniforms[name] = loc
+        We skip the upload if the uniform already has these values.
+        '''
+        vals = tuple(float(v) for v in vals)
+        if vals and self._changed(name, vals):
+            gl.glUniform1fv(self.uniforms[name], len(vals),
+                            (ctypes.c_float * len(vals))(*vals))
 
-        # Upload the 4x4 floating point matrix
-        gl.glUniformMatrix4fv(loc, 1, False, (ctypes.c_float * 16)(*mat))
+    def uniform_matrixf(self, name, mat):
+        ''' Upload uniform matrix, program must be currently bound. '''
 
+        mat = tuple(mat)
+        if self._changed(name, mat):
+            # Upload the 4x4 floating point matrix
+            gl.glUniformMatrix4fv(self.uniforms[name], 1, False,
+                                  (ctypes.c_float * 16)(*mat))
+
+    def set_uniforms(self, **values):
+        ''' Upload uniforms given as keyword arguments
+
+        Program must be currently bound.  We pick the upload function from
+        the uniform type in the program, so ``elevation=0`` sets a float
+        uniform, and ``texture=0`` a sampler.  We skip uniforms that are not
+        active in the program, or that already have the given values.
+        '''
+        for name, value in values.items():
+            utype = self._types.get(name)
+            if utype is None:
+                continue
+            if utype == gl.GL_FLOAT_MAT4:
+                self.uniform_matrixf(name, value)
+                continue
+            if not hasattr(value, '__len__'):
+                value = (value,)
+            if utype in _FLOAT_TYPES:
+                self.uniformf(name, *[float(v) for v in value])
+            else:
+                self.uniformi(name, *[int(v) for v in value])
+
+
+# GL types of float uniforms; we take other non-matrix types as integer
+_FLOAT_TYPES = (gl.GL_FLOAT, gl.GL_FLOAT_VEC2, gl.GL_FLOAT_VEC3,
+                gl.GL_FLOAT_VEC4)
+
+
+class _ProgramState(object):
+    ''' Uniform locations, types and last set values for linked program '''
+
+    def __init__(self, handle, linked=True):
+        self.handle = handle
+        self.locations = {}
+        self.types = {}
+        self.values = {}
+        if linked:
+            self._read_uniforms()
+
+    def _read_uniforms(self):
+        ''' Read locations and types of active uniforms in program '''
+        count = ctypes.c_int(0)
+        gl.glGetProgramiv(self.handle, gl.GL_ACTIVE_UNIFORMS,
+                          ctypes.byref(count))
+        max_length = ctypes.c_int(0)
+        gl.glGetProgramiv(self.handle, gl.GL_ACTIVE_UNIFORM_MAX_LENGTH,
+                          ctypes.byref(max_length))
+        buffer = ctypes.create_string_buffer(max_length.value + 1)
+        length = gl.GLsizei(0)
+        size = gl.GLint(0)
+        utype = gl.GLenum(0)
+        for i in range(count.value):
+            gl.glGetActiveUniform(self.handle, i, len(buffer),
+                                  ctypes.byref(length), ctypes.byref(size),
+                                  ctypes.byref(utype), buffer)
+            name = buffer.value.decode('ascii')
+            if name.startswith('gl_'):
+                continue
+            loc = gl.glGetUniformLocation(self.handle, buffer)
+            # Arrays appear as "name[0]"
+            if name.endswith('[0]'):
+                name = name[:-3]
+            self.locations[name] = loc
+            self.types[name] = utype.value
+
+
+def _source_key(vert, frag):
+    ''' Return hash identifying program built from `vert`, `frag` sources '''
+    hasher = hashlib.sha1()
+    for strings in (vert, frag):
+        for string in strings or []:
+            hasher.update(string.encode('utf-8'))
+            hasher.update(b'\0')
+        hasher.update(b'\1')
+    return hasher.hexdigest()
+
+
+def _program_binary_path(key):
+    ''' Return path of program binary for source `key`, or None
+
+    None if there is no cache directory, or the GL cannot save binaries.
+    Binaries only work on the driver that made them, so the file name
+    includes the GL vendor, renderer and version.
+    '''
+    if _program_cache_dir is None:
+        return None
+    if not (gl.gl_info.have_version(4, 1) or
+            gl.gl_info.have_extension('GL_ARB_get_program_binary')):
+        return None
+    n_formats = ctypes.c_int(0)
+    gl.glGetIntegerv(gl.GL_NUM_PROGRAM_BINARY_FORMATS,
+                     ctypes.byref(n_formats))
+    if not n_formats.value:
+        return None
+    hasher = hashlib.sha1(key.encode('utf-8'))
+    for info in (gl.gl_info.get_vendor(),
+                 gl.gl_info.get_renderer(),
+                 gl.gl_info.get_version()):
+        hasher.update(info.encode('utf-8'))
+    return os.path.join(_program_cache_dir, hasher.hexdigest() + '.bin')
+
+
+# Shader sources by file name; we read each file once per process
+_sources = {}
 
 
 def read_shader(filename):
     ''' Read a file from within the shader directory and return content '''
-    
+    if filename in _sources:
+        return _sources[filename]
     dirname = os.path.dirname(__file__)
     path = os.path.join(dirname, filename)
     fid = open(path)
     buf = fid.read()
     fid.close()
+    _sources[filename] = buf
     return buf
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2009-2010  Nicolas P. Rougier
+#
+# Distributed under the terms of the BSD License. The full license is in
+# the file COPYING, distributed as part of this software.
+# -----------------------------------------------------------------------------
+''' Shaders drawing slices from volume (3D) textures '''
+import pyglet.gl as gl
+
+from .shader import Shader, read_shader
+
+
+class VolumeShader(Shader):
+    ''' Draw slice along one array axis of a 3D texture
+
+    The slice axis and index are uniforms, so changing slice costs no upload.
+    Subclasses set the interpolation code in `_interpolation`.
+    '''
+    _interpolation = None
+
+    def __init__(self, use_lut=False, gridsize=(0.0, 0.0, 0.0)):
+        self._gridsize = gridsize
+        self._gridwidth = (1.0,1.0,1.0)
+        slice_coord   = read_shader('slice3d.txt')
+        interpolation = read_shader(self._interpolation)
+        lut           = read_shader('lut.txt')
+        vertex        = read_shader('vertex3d.txt')
+        fragment      = read_shader('fragment3d.txt')
+        lut_code = grid_code = ''
+        if use_lut:
+            lut_code = 'color = texture1D_lut(lut, color.a);'
+        if self._gridsize[0] or self._gridsize[1] or self._gridsize[2]:
+            grid_code = read_shader('grid.txt')
+        fragment  = fragment % (lut_code,grid_code)
+        Shader.__init__(self,
+          vert = [vertex],
+          frag = [slice_coord] + [interpolation] + [lut] + [fragment])
+
+    def bind(self, texture, lut=None, bias=0.0, scale=1.0, axis=0, index=0):
+        ''' Bind the program for slice `index` along array `axis` '''
+        Shader.bind(self)
+        if lut is not None:
+            gl.glActiveTexture(gl.GL_TEXTURE1)
+            gl.glBindTexture(lut.target, lut.id)
+        gl.glEnable(texture.target)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        gl.glBindTexture(texture.target, texture.id)
+        # Texture sizes along array axes 0, 1, 2
+        sizes = (texture.depth, texture.height, texture.width)
+        plane = [size for i, size in enumerate(sizes) if i != axis]
+        self.set_uniforms(lut=1, texture=0,
+                          axis=axis,
+                          slice=(index + 0.5) / sizes[axis],
+                          pixel=(1.0/plane[1], 1.0/plane[0]),
+                          gridsize=self._gridsize,
+                          gridwidth=self._gridwidth,
+                          bias=bias, scale=scale)
+
+
+class Nearest3D(VolumeShader):
+    _interpolation = 'nearest3d.txt'
+
+
+class Bilinear3D(VolumeShader):
+    _interpolation = 'bilinear3d.txt'
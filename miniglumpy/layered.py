@@ -0,0 +1,118 @@
+""" Stacked Glices composited in one pass """
+
+from .textures import QuadBuffer, quad_vertices
+from . import gshaders
+from .gshaders.layered import MAX_LAYERS, layered_shader
+
+
+def _interpolation(shader):
+    ''' Interpolation name for layer drawn with 2D `shader` '''
+    if isinstance(shader, gshaders.Nearest):
+        return 'nearest'
+    if isinstance(shader, gshaders.Bilinear):
+        return 'bilinear'
+    raise ValueError('Layers need Nearest or Bilinear shaders')
+
+
+class LayeredGlice(object):
+    ''' Stack of Glices composited by one generated fragment program
+
+    Each layer is a ``Glice``, with its own data texture, colormap and
+    `vmin`, `vmax` window, and interpolation from its Nearest or Bilinear
+    shader.  Each layer draws over the layers before it, with its
+    `opacity`; values below the layer `threshold` are transparent.  For
+    example, to show a statistical map over an anatomical image:
+
+        overlay = LayeredGlice([anatomy, stats], thresholds=[None, 3.1],
+                               opacities=[1.0, 0.7])
+        overlay.blit(0, 0, width, height)
+
+    Drawing is one pass with one program, whatever the number of layers.
+    Programs are shared between LayeredGlices with the same layer
+    interpolations; see ``gshaders.layered_shader``.  LayeredGlice works
+    with ``draw_batch``.
+
+    Parameters
+    ----------
+    glices : sequence
+        up to `MAX_LAYERS` 2D ``Glice`` objects, bottom layer first.  Layers
+        can differ in shape; each stretches over the blit rectangle.
+    thresholds : None or sequence, optional
+        threshold in data values for each layer, or None for no threshold
+    opacities : None or sequence, optional
+        opacity in [0, 1] for each layer; default 1
+    '''
+    def __init__(self, glices, thresholds=None, opacities=None):
+        glices = list(glices)
+        if not 0 < len(glices) <= MAX_LAYERS:
+            raise ValueError('Need between 1 and %d layers' % MAX_LAYERS)
+        self.glices = glices
+        if thresholds is None:
+            thresholds = [None] * len(glices)
+        if opacities is None:
+            opacities = [1.0] * len(glices)
+        self.thresholds = list(thresholds)
+        self.opacities = list(opacities)
+        self._quads = QuadBuffer()
+
+    @property
+    def shader(self):
+        ''' Layered shader for the interpolations of our layers '''
+        return layered_shader([_interpolation(glice.shader)
+                               for glice in self.glices])
+
+    def _layers(self):
+        ''' Shader parameters for each layer '''
+        layers = []
+        for glice, threshold, opacity in zip(self.glices, self.thresholds,
+                                             self.opacities):
+            if threshold is None:
+                threshold = -1e30
+            elif glice.pixel_transfer:
+                # Texture holds LUT coordinates
+                bias, scale = glice._bias_scale()
+                threshold = threshold * glice.value_scale * scale + bias
+            else:
+                threshold = threshold * glice.value_scale
+            t_extent, s_extent = glice._extent
+            layers.append((glice._texture, glice._lut) +
+                          tuple(glice._shader_bias_scale()) +
+                          (threshold, opacity, (s_extent, t_extent)))
+        return layers
+
+    @property
+    def batchable(self):
+        ''' True unless a layer has a `lod` pyramid; see ``Glice.batchable``
+
+        Layered shaders draw in one pass, but ``blit`` selects pyramid levels
+        for the blit size.
+        '''
+        return all(glice._pyramid is None for glice in self.glices)
+
+    @property
+    def bind_key(self):
+        ''' Key identifying the GL state that ``bind`` sets '''
+        return (id(self.shader),) + tuple(
+            (layer[0].id, layer[1].id) + layer[2:]
+            for layer in self._layers())
+
+    def bind(self):
+        ''' Bind shader, and textures and parameters of all layers '''
+        for glice in self.glices:
+            glice._apply_frame()
+        self.shader.bind(self._layers())
+
+    def unbind(self):
+        self.shader.unbind()
+
+    def blit(self, x, y, w, h):
+        ''' Blit composited layers onto active framebuffer '''
+        for glice in self.glices:
+            glice._apply_frame()
+            if glice._pyramid is not None:
+                glice._select_level(w, h)
+        self.bind()
+        rect = (x, y, w, h)
+        self._quads.set_vertices(quad_vertices([rect + (0, 1, 0, 1)]), rect)
+        self._quads.draw()
+        self.unbind()
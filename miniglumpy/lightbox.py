@@ -0,0 +1,331 @@
+""" Lightbox of volume slices, drawn as a grid in one call """
+
+import ctypes
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+import pyglet.gl as gl
+
+from .textures import Texture2D, Texture2DArray, QuadBuffer, quad_vertices
+from .textures import native_dtype
+from .sources import VolumeSource
+from .glices import Glice
+from . import gshaders
+from .gshaders.lightbox import MAX_INSTANCES
+
+
+def texture_arrays_supported():
+    ''' True if the current GL can draw lightboxes from texture arrays '''
+    return (gl.gl_info.have_extension('GL_EXT_texture_array') and
+            gl.gl_info.have_extension('GL_ARB_draw_instanced'))
+
+
+def _gl_limit(name):
+    value = gl.GLint()
+    gl.glGetIntegerv(name, ctypes.byref(value))
+    return value.value
+
+
+class LightboxGlice(Glice):
+    ''' Grid of slices from a volume, with one shared window and LUT
+
+    With texture arrays (see ``texture_arrays_supported``), each slice is a
+    layer of one ``Texture2DArray``, and ``blit`` draws the whole grid with
+    one instanced draw per `MAX_INSTANCES` cells.  Otherwise, we pack the
+    slices into a ``Texture2D`` atlas, with `border` texels of edge padding
+    around each slice so interpolating shaders do not mix neighbouring
+    slices, and draw all cells from one vertex buffer in one call.
+
+    The texture has a layer or atlas slot for each slice shown.  When more
+    slices are shown, we grow the texture, doubling its slots, up to the
+    number of slices along `axis` and the GL limit on array layers or
+    texture size, and copy over the slices already in the texture.  Slices
+    keep their slots while shown, and slices no longer shown keep theirs
+    until new slices need them, least recently shown first.  So
+    ``set_slices`` uploads only slices not already in the texture, and
+    changing `columns`, `gap` or the blit rectangle uploads nothing.
+
+    LightboxGlice draws with ``blit``; ``draw_batch`` calls ``blit`` for it.
+    '''
+    batchable = False
+
+    def __init__(self, vol, axis=0, start=0, stop=None, step=1, columns=None,
+                 gap=0, shader=None, cmap=None, vmin=None, vmax=None,
+                 use_array=None, border=2):
+        ''' Create lightbox of slices ``start:stop:step`` along `axis`
+
+        Parameters
+        ----------
+        vol : 3D array or VolumeSource
+            volume to take slices from
+        axis : int, optional
+            volume axis to slice along
+        start, stop, step : None or int, optional
+            slices to show, as for Python ``slice``
+        columns : None or int, optional
+            number of grid cells per row; None for a near square grid
+        gap : float, optional
+            gap between grid cells, in window coordinates
+        shader : None or Shader, optional
+            a ``gshaders.LightboxShader`` such as ``gshaders.BilinearArray``
+            when using texture arrays, otherwise a 2D shader such as
+            ``gshaders.Bilinear``.  None for nearest interpolation.
+        cmap : None or str or array-like, optional
+            as for ``Glice``
+        vmin, vmax : None or float, optional
+            window; None for the range of the first slices shown
+        use_array : None or bool, optional
+            True to use a texture array, False for an atlas; None uses
+            texture arrays if the GL supports them
+        border : int, optional
+            texels of edge padding around slices in the atlas.  Bilinear
+            interpolation needs 1, bicubic 2.
+        '''
+        if use_array is None:
+            use_array = texture_arrays_supported()
+        self.use_array = use_array
+        self.border = border
+        self.columns = columns
+        self.gap = gap
+        self.pixel_transfer = False
+        self.keep_data = True
+        self.auto_window = None
+        self._frames = self._frame_queue()
+        self.uploads = 0
+        self._texture = None
+        self._capacity = 0
+        # Texture slot of each slice in the texture, least recently shown
+        # first
+        self._slots = OrderedDict()
+        self._layers = []
+        self._quads = QuadBuffer()
+        self.source = vol
+        self.axis = axis
+        self._slice = slice(start, stop, step)
+        self._sync()
+        if shader is None:
+            shader = self._default_shader()
+        if isinstance(shader, gshaders.LightboxShader) != use_array:
+            raise ValueError('Need LightboxShader for texture arrays, and '
+                             '2D shader for atlas')
+        self.shader = shader
+        self.cmap = cmap
+        if vmin is None or vmax is None:
+            shown = [self._get_slice(index) for index in self.slices]
+            if vmin is None:
+                vmin = min(arr.min() for arr in shown)
+            if vmax is None:
+                vmax = max(arr.max() for arr in shown)
+        self.vmin, self.vmax = vmin, vmax
+
+    def _default_shader(self):
+        if self.use_array:
+            return gshaders.NearestArray(True)
+        return gshaders.Nearest(True, False)
+
+    @property
+    def n_slices(self):
+        ''' Number of slices along `axis` of the volume '''
+        if isinstance(self.source, VolumeSource):
+            return self.source.volume_shape[self.axis]
+        return self.source.shape[self.axis]
+
+    @property
+    def slices(self):
+        ''' List of indices of slices shown, in grid order '''
+        return list(range(*self._slice.indices(self.n_slices)))
+
+    def _get_slice(self, index):
+        if isinstance(self.source, VolumeSource):
+            return self.source.get_slice(index, self.axis)
+        return self.source[(slice(None),) * self.axis + (index,)]
+
+    def set_slices(self, start=None, stop=None, step=None, axis=None):
+        ''' Show slices ``start:stop:step`` along `axis`
+
+        None for any parameter keeps its current value.  We upload only
+        slices not already in the texture; changing `axis` uploads all.
+        '''
+        if axis is not None and axis != self.axis:
+            self.axis = axis
+            self._slots = OrderedDict()
+        old = self._slice
+        self._slice = slice(old.start if start is None else start,
+                            old.stop if stop is None else stop,
+                            old.step if step is None else step)
+        self._sync()
+
+    def set_data(self, vol):
+        ''' Set new volume `vol`, re-uploading the slices shown '''
+        self.source = vol
+        self._slots = OrderedDict()
+        self._sync()
+
+    def _upload_data(self, arr, region=None):
+        self.set_data(arr)
+
+    def _max_slots(self, shape):
+        ''' Most slices of `shape` the GL lets the texture hold '''
+        if self.use_array:
+            return _gl_limit(gl.GL_MAX_ARRAY_TEXTURE_LAYERS)
+        size = _gl_limit(gl.GL_MAX_TEXTURE_SIZE)
+        b = self.border
+        return (size // (shape[0] + 2 * b)) * (size // (shape[1] + 2 * b))
+
+    def _allocate(self, n, shape, dtype):
+        ''' Make texture with `n` empty slots for slices of `shape`, `dtype`
+        '''
+        self._slots = OrderedDict()
+        self._shape, self._dtype = shape, dtype
+        self._texture = None
+        self._capacity = 0
+        self._resize(n)
+
+    def _resize(self, n):
+        ''' Give texture `n` slots, keeping slices in their slots '''
+        old, old_n = self._texture, self._capacity
+        self._capacity = n
+        if self.use_array:
+            self._texture = Texture2DArray.empty((n,) + self._shape,
+                                                 self._dtype)
+            if old is not None:
+                self._texture.copy_layers(old)
+            return
+        b = self.border
+        h, w = self._shape[0] + 2 * b, self._shape[1] + 2 * b
+        old_origins = [self._slot_origin(slot) for slot in range(old_n)]
+        self._atlas_columns = min(int(math.ceil(math.sqrt(n))),
+                                  _gl_limit(gl.GL_MAX_TEXTURE_SIZE) // w)
+        rows = -(-n // self._atlas_columns)
+        atlas = np.zeros((rows * h, self._atlas_columns * w),
+                         dtype=self._dtype)
+        for slot, (y, x) in enumerate(old_origins):
+            new_y, new_x = self._slot_origin(slot)
+            atlas[new_y:new_y + h, new_x:new_x + w] = \
+                self._atlas[y:y + h, x:x + w]
+        self._atlas = atlas
+        if old is None:
+            self._texture = Texture2D(atlas)
+        else:
+            self._texture.set_data(atlas)
+
+    def _slot_origin(self, slot):
+        ''' Atlas (row, column) of top left texel of padded `slot` '''
+        h, w = self._shape
+        b = self.border
+        row, column = divmod(slot, self._atlas_columns)
+        return row * (h + 2 * b), column * (w + 2 * b)
+
+    def _sync(self):
+        ''' Upload shown slices that are not in the texture '''
+        slices = self.slices
+        if not slices:
+            self._layers = []
+            return
+        first = self._get_slice(slices[0])
+        shape, dtype = first.shape, native_dtype(first.dtype)
+        n = len(slices)
+        max_slots = self._max_slots(shape)
+        if n > max_slots:
+            raise ValueError(
+                'Cannot show %d slices; the GL allows %d in one %s' %
+                (n, max_slots,
+                 'texture array' if self.use_array else 'atlas texture'))
+        if (self._texture is None or
+            (shape, dtype) != (self._shape, self._dtype)):
+            self._allocate(n, shape, dtype)
+        elif n > self._capacity:
+            self._resize(min(max(n, 2 * self._capacity), self.n_slices,
+                             max_slots))
+        # Free enough slots for new slices, least recently shown first
+        shown = set(slices)
+        n_new = len([index for index in slices if index not in self._slots])
+        free = sorted(set(range(self._capacity)) -
+                      set(self._slots.values()))
+        for index in list(self._slots):
+            if len(free) >= n_new:
+                break
+            if index not in shown:
+                free.append(self._slots.pop(index))
+        regions = []
+        for index in slices:
+            if index in self._slots:
+                # Now most recently shown
+                self._slots[index] = self._slots.pop(index)
+                continue
+            slot = free.pop(0)
+            arr = first if index == slices[0] else self._get_slice(index)
+            if self.use_array:
+                self._texture.set_layer(slot, arr)
+            else:
+                regions.append(self._pack(slot, arr))
+            self._slots[index] = slot
+            self.uploads += 1
+        if regions:
+            self._texture.set_data(self._atlas, regions=regions)
+        self._layers = [self._slots[index] for index in slices]
+
+    def _pack(self, slot, arr):
+        ''' Copy `arr` with edge padding into atlas `slot`; return region '''
+        b = self.border
+        y, x = self._slot_origin(slot)
+        h, w = self._shape
+        self._atlas[y:y + h + 2 * b, x:x + w + 2 * b] = np.pad(arr, b, 'edge')
+        return (x, y, w + 2 * b, h + 2 * b)
+
+    def _grid(self, w, h):
+        ''' Columns, and cell width, height for grid filling `w`, `h` '''
+        n = len(self._layers)
+        columns = self.columns or int(math.ceil(math.sqrt(n)))
+        rows = -(-n // columns)
+        return (columns,
+                (w - self.gap * (columns - 1)) / float(columns),
+                (h - self.gap * (rows - 1)) / float(rows))
+
+    def blit(self, x, y, w, h):
+        ''' Blit grid of slices onto active framebuffer
+
+        The grid fills rectangle `x`, `y`, `w`, `h`, with the first slice at
+        the top left.
+        '''
+        self._apply_frame()
+        layers = self._layers
+        if not layers:
+            return
+        columns, cw, ch = self._grid(w, h)
+        self.shader.bind(self._texture, self._lut, *self._bias_scale())
+        if self.use_array:
+            # One quad for the top left cell, drawn once per cell
+            rect = (x, y + h - ch, cw, ch)
+            self._quads.set_vertices(quad_vertices([rect + (0, 1, 0, 1)]),
+                                     rect)
+            for first in range(0, len(layers), MAX_INSTANCES):
+                cells = layers[first:first + MAX_INSTANCES]
+                self.shader.set_cells(cells, columns,
+                                      (cw + self.gap, ch + self.gap), first)
+                self._quads.draw(instances=len(cells))
+        else:
+            key = (x, y, w, h, columns, self.gap, tuple(layers))
+            if key != self._quads.key:
+                self._quads.set_vertices(
+                    quad_vertices(self._atlas_rects(x, y, h, columns,
+                                                    cw, ch)), key)
+            self._quads.draw()
+        self.shader.unbind()
+
+    def _atlas_rects(self, x, y, h, columns, cw, ch):
+        ''' Window rectangles and atlas texture coordinates of grid cells '''
+        b = self.border
+        sh, sw = self._shape
+        ah, aw = self._atlas.shape
+        rects = []
+        for i, slot in enumerate(self._layers):
+            row, column = divmod(i, columns)
+            ty, tx = self._slot_origin(slot)
+            rects.append((x + column * (cw + self.gap),
+                          y + h - ch - row * (ch + self.gap), cw, ch,
+                          (tx + b) / float(aw), (tx + b + sw) / float(aw),
+                          (ty + b) / float(ah), (ty + b + sh) / float(ah)))
+        return rects
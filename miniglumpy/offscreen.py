@@ -0,0 +1,250 @@
+""" Offscreen rendering into framebuffer objects, with readback to arrays
+
+Needs a current GL context, but no display; for example a pyglet headless
+window, with Mesa llvmpipe over EGL.  Headless windows need pyglet >= 1.5.
+"""
+
+import ctypes
+
+import numpy as np
+
+import pyglet.gl as gl
+
+from .contexts import current_space, delete_objects
+from .glices import Glice
+
+
+class OffscreenError(Exception):
+    pass
+
+
+class OffscreenTarget(object):
+    ''' Framebuffer object to draw into, and read back as RGBA arrays
+
+    Use as a context manager to draw into the target:
+
+        with target:
+            target.clear()
+            glice.blit(0, 0, target.width, target.height)
+        rgba = target.read()
+
+    Inside the ``with`` block, the viewport and projection map window
+    coordinates to target pixels.
+
+    ``read`` reads synchronously.  ``read_async`` starts a readback into one
+    of a ring of `n_buffers` pixel pack buffers, and returns the readback
+    started `n_buffers` - 1 calls before, so the GL copies out image N while
+    we draw image N + 1.
+
+    Parameters
+    ----------
+    width, height : int
+        target size in pixels
+    n_buffers : int, optional
+        number of pixel pack buffers for ``read_async``
+    '''
+    def __init__(self, width, height, n_buffers=2):
+        self.width, self.height = width, height
+        self._space = current_space()
+        fbo = gl.GLuint()
+        gl.glGenFramebuffers(1, ctypes.byref(fbo))
+        self._fbo = fbo
+        rbo = gl.GLuint()
+        gl.glGenRenderbuffers(1, ctypes.byref(rbo))
+        self._rbo = rbo
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, rbo)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_RGBA8,
+                                 width, height)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, 0)
+        previous = self._bound_fbo()
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, fbo)
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER,
+                                     gl.GL_COLOR_ATTACHMENT0,
+                                     gl.GL_RENDERBUFFER, rbo)
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, previous)
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            raise OffscreenError('Framebuffer incomplete; status 0x%x'
+                                 % status)
+        self.nbytes = width * height * 4
+        ids = (gl.GLuint * n_buffers)()
+        gl.glGenBuffers(n_buffers, ids)
+        for id in ids:
+            gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, id)
+            gl.glBufferData(gl.GL_PIXEL_PACK_BUFFER, self.nbytes, None,
+                            gl.GL_STREAM_READ)
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+        self._pbos = ids
+        self._head = 0
+        # Tags of readbacks in flight, by buffer
+        self._in_flight = [None] * n_buffers
+        self._saved = []
+
+    def __del__(self):
+        pbos = self.__dict__.get('_pbos', [])
+        delete_objects(self._space, gl.glDeleteBuffers, pbos)
+        delete_objects(self._space, gl.glDeleteRenderbuffers,
+                       [self._rbo.value])
+        delete_objects(self._space, gl.glDeleteFramebuffers,
+                       [self._fbo.value])
+
+    @staticmethod
+    def _bound_fbo():
+        previous = gl.GLint()
+        gl.glGetIntegerv(gl.GL_FRAMEBUFFER_BINDING, ctypes.byref(previous))
+        return previous.value
+
+    def bind(self):
+        ''' Draw into target, with pixel viewport and projection '''
+        viewport = (gl.GLint * 4)()
+        gl.glGetIntegerv(gl.GL_VIEWPORT, viewport)
+        self._saved.append((self._bound_fbo(), tuple(viewport)))
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._fbo)
+        gl.glViewport(0, 0, self.width, self.height)
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
+        gl.glOrtho(0, self.width, 0, self.height, -1, 1)
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
+
+    def unbind(self):
+        ''' Restore framebuffer, viewport and projection from ``bind`` '''
+        fbo, viewport = self._saved.pop()
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPopMatrix()
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glPopMatrix()
+        gl.glViewport(*viewport)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, fbo)
+
+    def __enter__(self):
+        self.bind()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.unbind()
+
+    def clear(self, color=(0.0, 0.0, 0.0, 0.0)):
+        ''' Clear bound target to `color` '''
+        gl.glClearColor(*color)
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+
+    def _read_pixels(self, data):
+        previous = self._bound_fbo()
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._fbo)
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+        gl.glReadPixels(0, 0, self.width, self.height,
+                        gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, data)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, previous)
+
+    def _as_image(self, arr):
+        ''' Flip GL bottom-up rows so row 0 is the top of the image '''
+        return arr.reshape((self.height, self.width, 4))[::-1]
+
+    def read(self):
+        ''' Return (height, width, 4) uint8 RGBA array of target contents
+
+        Row 0 is the top of the image.  Waits for drawing to finish.
+        '''
+        arr = np.empty(self.nbytes, dtype=np.uint8)
+        self._read_pixels(arr.ctypes.data)
+        return self._as_image(arr)
+
+    def read_async(self, tag=None):
+        ''' Start readback of target contents; return an earlier readback
+
+        Parameters
+        ----------
+        tag : object, optional
+            label for this readback, returned with its image
+
+        Returns
+        -------
+        result : None or tuple
+            None until all buffers are in flight, then ``(tag, rgba)`` for
+            the readback started ``n_buffers - 1`` calls before.
+        '''
+        i = self._head
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, self._pbos[i])
+        self._read_pixels(None)
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+        self._in_flight[i] = (tag,)
+        self._head = (i + 1) % len(self._pbos)
+        return self._finish(self._head)
+
+    def _finish(self, i):
+        ''' Map buffer `i`, returning ``(tag, rgba)``, or None if idle '''
+        if self._in_flight[i] is None:
+            return None
+        tag, = self._in_flight[i]
+        self._in_flight[i] = None
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, self._pbos[i])
+        ptr = gl.glMapBuffer(gl.GL_PIXEL_PACK_BUFFER, gl.GL_READ_ONLY)
+        if not ptr:
+            gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+            raise OffscreenError('Could not map pixel pack buffer')
+        buf = (ctypes.c_ubyte * self.nbytes).from_address(ptr)
+        arr = np.array(np.frombuffer(buf, dtype=np.uint8))
+        gl.glUnmapBuffer(gl.GL_PIXEL_PACK_BUFFER)
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+        return tag, self._as_image(arr)
+
+    def flush(self):
+        ''' Return list of ``(tag, rgba)`` for readbacks still in flight '''
+        results = []
+        n = len(self._pbos)
+        for i in range(n):
+            result = self._finish((self._head + i) % n)
+            if result is not None:
+                results.append(result)
+        return results
+
+
+def render_thumbnails(arrays, width, height, target=None, **kwargs):
+    ''' Generate RGBA thumbnails of 2D `arrays`
+
+    Draws each array through one ``Glice``, re-using its texture storage
+    for arrays of the same shape, into an ``OffscreenTarget``, and reads
+    back asynchronously, so drawing of one thumbnail overlaps readback of
+    the one before.
+
+    Parameters
+    ----------
+    arrays : iterable
+        2D arrays
+    width, height : int
+        thumbnail size
+    target : None or OffscreenTarget, optional
+        target to draw into; None makes a new target
+    kwargs : dict
+        keyword arguments for ``Glice``, such as `shader`, `cmap` or
+        `auto_window`.  Without `vmin`, `vmax` or `auto_window`, each
+        thumbnail is windowed to the range of its array.
+
+    Yields
+    ------
+    index, rgba : tuple
+        index of array in `arrays`, and (height, width, 4) uint8 thumbnail
+    '''
+    if target is None:
+        target = OffscreenTarget(width, height)
+    fixed_window = ('vmin' in kwargs or 'vmax' in kwargs or
+                    kwargs.get('auto_window', False) is not False)
+    glice = None
+    for i, arr in enumerate(arrays):
+        if glice is None:
+            glice = Glice(arr, **kwargs)
+        else:
+            glice.set_data(arr)
+            if not fixed_window:
+                glice.vmin, glice.vmax = arr.min(), arr.max()
+        with target:
+            target.clear()
+            glice.blit(0, 0, width, height)
+        result = target.read_async(i)
+        if result is not None:
+            yield result
+    for result in target.flush():
+        yield result
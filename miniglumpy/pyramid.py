@@ -0,0 +1,128 @@
+""" Multi-resolution image pyramids for level of detail drawing """
+
+import math
+
+import numpy as np
+
+
+_REDUCERS = {
+    'mean': np.mean,
+    'max': np.max,
+    'min': np.min}
+
+
+def reduce_block(arr, factor=2, method='mean'):
+    """ Reduce first two axes of `arr` by `factor` over blocks
+
+    Parameters
+    ----------
+    arr : array-like
+        2D array, or 3D array with colors in the last axis
+    factor : int, optional
+        block size along both axes
+    method : {'mean', 'max', 'min'}, optional
+        reduction over each block.  'max' and 'min' keep thin bright or dark
+        structures that the mean would blur away.
+
+    Returns
+    -------
+    reduced : array
+        array with first two axes of length ``ceil(n / factor)``.  We pad
+        `arr` with its edge values to a whole number of blocks.  Integer
+        arrays keep their dtype; means round to nearest.
+
+    Examples
+    --------
+    >>> arr = np.arange(9).reshape(3, 3)
+    >>> reduce_block(arr)
+    array([[2, 4],
+           [6, 8]])
+    >>> reduce_block(arr, method='min')
+    array([[0, 2],
+           [6, 8]])
+    """
+    arr = np.asarray(arr)
+    reducer = _REDUCERS[method]
+    rows, cols = arr.shape[:2]
+    pad_rows, pad_cols = -rows % factor, -cols % factor
+    if pad_rows or pad_cols:
+        pads = [(0, pad_rows), (0, pad_cols)] + [(0, 0)] * (arr.ndim - 2)
+        arr = np.pad(arr, pads, mode='edge')
+    blocks = arr.reshape((arr.shape[0] // factor, factor,
+                          arr.shape[1] // factor, factor) + arr.shape[2:])
+    reduced = reducer(blocks, axis=(1, 3))
+    if arr.dtype.kind in 'iu' and reduced.dtype != arr.dtype:
+        reduced = np.round(reduced).astype(arr.dtype)
+    return reduced
+
+
+class Pyramid(object):
+    """ Lazily built multi-resolution pyramid of 2D array
+
+    Level 0 is the array itself; each further level halves both sizes by
+    ``reduce_block``, down to one pixel.  We build levels when first asked
+    for, and keep them until ``set_data``.
+
+    Parameters
+    ----------
+    arr : array-like
+        2D array, or 3D array with colors in the last axis
+    method : {'mean', 'max', 'min'}, optional
+        block reduction; see ``reduce_block``
+    """
+    def __init__(self, arr, method='mean'):
+        if method not in _REDUCERS:
+            raise ValueError('method should be one of %s'
+                             % ', '.join(sorted(_REDUCERS)))
+        self.method = method
+        self.version = 0
+        self.set_data(arr)
+
+    def set_data(self, arr):
+        ''' Set new data, dropping the levels built from the old data '''
+        self._levels = [np.asarray(arr)]
+        self.version += 1
+
+    @property
+    def shape(self):
+        return self._levels[0].shape
+
+    @property
+    def n_levels(self):
+        return int(math.ceil(math.log(max(self.shape[:2]), 2))) + 1
+
+    def level(self, k):
+        ''' Return array for level `k` '''
+        if not 0 <= k < self.n_levels:
+            raise IndexError('No level %d in pyramid of %d levels'
+                             % (k, self.n_levels))
+        while len(self._levels) <= k:
+            self._levels.append(reduce_block(self._levels[-1], 2,
+                                             self.method))
+        return self._levels[k]
+
+    def level_for(self, density):
+        ''' Return coarsest level with at least one texel per screen pixel
+
+        `density` is the number of screen pixels per array element.
+        '''
+        if density <= 0:
+            return self.n_levels - 1
+        k = int(math.floor(math.log(1.0 / density, 2)))
+        return min(max(k, 0), self.n_levels - 1)
+
+    def extent(self, k):
+        ''' Fraction of level `k` (rows, columns) covering the array
+
+        Padding to whole blocks makes coarse levels cover a little more than
+        the array; draw only this fraction of the level.
+
+        Examples
+        --------
+        >>> Pyramid(np.zeros((5, 8))).extent(1)
+        (0.8333333333333334, 1.0)
+        '''
+        rows, cols = self.shape[:2]
+        level_rows, level_cols = self.level(k).shape[:2]
+        return (rows / float(level_rows * 2 ** k),
+                cols / float(level_cols * 2 ** k))
@@ -0,0 +1,228 @@
+""" Slice sources reading volumes lazily from disk
+
+A ``VolumeSource`` wraps a memory mapped 3D or 4D array, and returns
+contiguous 2D slices ready for upload, reading ahead of the scroll direction
+in background threads.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+import numpy as np
+
+from .textures import native_dtype
+
+
+class VolumeSource(object):
+    ''' Source of 2D slices from 3D or 4D volume on disk
+
+    Slices come from an LRU cache holding at most `cache_bytes` bytes of
+    contiguous slices, in the dtype we upload (see
+    ``textures.native_dtype``).  After each request, we queue the next
+    `prefetch` slices in the scroll direction for reading by `n_workers`
+    background threads.  Queued reads that have fallen out of the prefetch
+    window by the time a thread gets to them are dropped.  The threads do
+    not keep the source alive, and stop when it is garbage collected, or at
+    ``close``.
+
+    For 4D volumes, the first axis selects the volume (`frame`), and `axis`
+    refers to the last three axes.
+
+    Parameters
+    ----------
+    vol : array-like or str
+        Array, usually a ``np.memmap``, or the filename of a ``.npy`` file,
+        which we memory map.  See ``from_raw`` for raw files.
+    axis : int, optional
+        volume axis along which to take slices
+    prefetch : int, optional
+        number of slices to read ahead in the scroll direction
+    cache_bytes : int, optional
+        byte budget for the slice cache
+    n_workers : int, optional
+        number of prefetch threads
+    '''
+    def __init__(self, vol, axis=0, prefetch=4, cache_bytes=256 * 2**20,
+                 n_workers=2):
+        if isinstance(vol, str):
+            vol = np.load(vol, mmap_mode='r')
+        if vol.ndim not in (3, 4):
+            raise ValueError('Need 3D or 4D volume')
+        self.vol = vol
+        self.axis = axis
+        self.frame = 0
+        self.prefetch = prefetch
+        self.cache_bytes = cache_bytes
+        self.nbytes = 0
+        self.hits = self.misses = self.prefetched = 0
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._wanted = set()
+        self._last = None
+        self._lock = threading.Lock()
+        self._queue = Queue()
+        self._workers = []
+        ref = weakref.ref(self)
+        for i in range(n_workers):
+            worker = threading.Thread(target=_prefetch_work,
+                                      args=(ref, self._queue))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    @classmethod
+    def from_raw(klass, filename, shape, dtype, offset=0, **kwargs):
+        ''' Make source from raw file `filename` of array `shape`, `dtype`
+
+        `offset` is the byte offset of the data in the file.  Other keyword
+        arguments pass to the ``VolumeSource`` constructor.
+        '''
+        vol = np.memmap(filename, dtype=dtype, mode='r', offset=offset,
+                        shape=tuple(shape))
+        return klass(vol, **kwargs)
+
+    @property
+    def volume_shape(self):
+        ''' Shape of one 3D volume '''
+        return self.vol.shape[-3:]
+
+    def __len__(self):
+        return self.volume_shape[self.axis]
+
+    def __getitem__(self, index):
+        return self.get_slice(index)
+
+    def get_slice(self, index, axis=None, frame=None):
+        ''' Return contiguous slice `index` along `axis` of volume `frame`
+
+        None for `axis` or `frame` means the current ``axis`` or ``frame``.
+        Requesting a slice sets the current axis and frame, and queues reads
+        of the following slices in the scroll direction.
+        '''
+        if axis is not None:
+            self.axis = axis
+        if frame is not None:
+            self.frame = frame
+        n_slices = len(self)
+        if index < 0:
+            index += n_slices
+        if not 0 <= index < n_slices:
+            raise IndexError('Slice index %d out of range for axis %d'
+                             % (index, self.axis))
+        key = (self.frame, self.axis, index)
+        with self._lock:
+            arr = self._cache.pop(key, None)
+            if arr is not None:
+                self._cache[key] = arr
+                self.hits += 1
+            pending = self._pending.get(key)
+        if arr is None:
+            if pending is not None:
+                # Prefetch thread is reading this slice already
+                pending.wait()
+                with self._lock:
+                    arr = self._cache.get(key)
+            if arr is None:
+                arr = self._read(key)
+                with self._lock:
+                    self._store(key, arr)
+            self.misses += 1
+        self._schedule(key)
+        return arr
+
+    def _read(self, key):
+        ''' Read slice for `key` from disk into contiguous array '''
+        frame, axis, index = key
+        vol = self.vol[frame] if self.vol.ndim == 4 else self.vol
+        arr = vol[(slice(None),) * axis + (index,)]
+        return np.ascontiguousarray(arr, dtype=native_dtype(arr.dtype))
+
+    def _store(self, key, arr):
+        ''' Store `arr` in cache, evicting old slices; needs lock held '''
+        if key in self._cache:
+            return
+        self._cache[key] = arr
+        self.nbytes += arr.nbytes
+        while self.nbytes > self.cache_bytes and len(self._cache) > 1:
+            old_key, old = self._cache.popitem(last=False)
+            self.nbytes -= old.nbytes
+
+    def _schedule(self, key):
+        ''' Queue reads of slices after `key` in the scroll direction '''
+        frame, axis, index = key
+        step = 1
+        if self._last is not None and self._last[:2] == key[:2]:
+            step = -1 if index < self._last[2] else 1
+        self._last = key
+        if not self._workers:
+            return
+        indices = [index + step * i for i in range(1, self.prefetch + 1)]
+        wanted = set((frame, axis, i) for i in indices
+                     if 0 <= i < len(self))
+        with self._lock:
+            self._wanted = wanted
+            for want in sorted(wanted, key=lambda k: abs(k[2] - index)):
+                if want in self._cache or want in self._pending:
+                    continue
+                self._pending[want] = threading.Event()
+                self._queue.put(want)
+
+    def _prefetch(self, key):
+        ''' Read slice `key` into cache if still wanted; runs in thread '''
+        with self._lock:
+            wanted = key in self._wanted
+        arr = None
+        try:
+            if wanted:
+                arr = self._read(key)
+        except Exception:
+            # ``get_slice`` reads the slice itself, and raises the error
+            pass
+        finally:
+            with self._lock:
+                if arr is not None:
+                    self._store(key, arr)
+                    self.prefetched += 1
+                pending = self._pending.pop(key, None)
+            if pending is not None:
+                pending.set()
+
+    def close(self, wait=True):
+        ''' Stop prefetch threads; with `wait`, wait until they have stopped
+
+        ``get_slice`` still works after ``close``, without prefetching.
+        '''
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            self._queue.put(None)
+        with self._lock:
+            # Release readers waiting for slices no thread will read
+            for pending in self._pending.values():
+                pending.set()
+            self._pending = {}
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def __del__(self):
+        if '_workers' in self.__dict__:
+            # May run in a prefetch thread, which cannot join itself
+            self.close(wait=False)
+
+
+def _prefetch_work(ref, queue):
+    ''' Prefetch thread for VolumeSource weakly referenced by `ref` '''
+    while True:
+        key = queue.get()
+        if key is None:
+            return
+        source = ref()
+        if source is None:
+            return
+        source._prefetch(key)
+        del source
@@ -0,0 +1,17 @@
+""" Pytest fixtures for miniglumpy tests """
+
+import pytest
+import pyglet
+
+
+@pytest.fixture(scope='session')
+def gl_window():
+    ''' Hidden window with current GL context; skip test if none '''
+    try:
+        window = pyglet.window.Window(64, 64, visible=False)
+    except Exception as e:
+        pytest.skip('No GL context: %s' % e)
+    window.switch_to()
+    # Keep the window, and so the context, until exit; GL objects cached at
+    # module level free their names as the interpreter shuts down
+    return window
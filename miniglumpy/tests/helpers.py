@@ -0,0 +1,74 @@
+""" Helpers for tests """
+
+import time
+
+import numpy as np
+
+import pyglet.gl as gl
+
+from miniglumpy.offscreen import OffscreenTarget
+
+
+def render(obj, width, height, target=None):
+    ''' Return (height, width, 4) uint8 RGBA of `obj` blitted offscreen '''
+    if target is None:
+        target = OffscreenTarget(width, height)
+    with target:
+        target.clear()
+        obj.blit(0, 0, width, height)
+    return target.read()
+
+
+def bound_unpack_buffer():
+    ''' Return name of bound pixel unpack buffer, 0 for none '''
+    value = gl.GLint()
+    gl.glGetIntegerv(gl.GL_PIXEL_UNPACK_BUFFER_BINDING, value)
+    return value.value
+
+
+def wait_for(predicate, timeout=5.0):
+    ''' Wait up to `timeout` seconds for `predicate()`; return its value '''
+    end = time.time() + timeout
+    while not predicate() and time.time() < end:
+        time.sleep(0.01)
+    return predicate()
+
+
+def count_gl_calls(monkeypatch, *names):
+    ''' Patch GL functions `names` to count calls; return list of names '''
+    calls = []
+
+    def counter(name, func):
+        def counted(*args):
+            calls.append(name)
+            return func(*args)
+        return counted
+    for name in names:
+        monkeypatch.setattr(gl, name, counter(name, getattr(gl, name)))
+    return calls
+
+
+def count_uploads(monkeypatch, texture):
+    ''' Patch `texture` to count its uploads; return list of regions '''
+    uploads = []
+    subimage = texture._subimage
+
+    def counted(data, region=None):
+        uploads.append(region)
+        return subimage(data, region)
+    monkeypatch.setattr(texture, '_subimage', counted)
+    return uploads
+
+
+def read_texture(texture):
+    ''' Return (height, width) float32 values of 2D one-channel `texture`
+
+    Values are as the shaders see them, so integer types come back scaled
+    by ``texture.value_scale``.
+    '''
+    data = np.empty((texture.height, texture.width), dtype=np.float32)
+    gl.glBindTexture(texture.target, texture.id)
+    gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+    gl.glGetTexImage(texture.target, 0, gl.GL_ALPHA, gl.GL_FLOAT,
+                     data.ctypes.data)
+    return data
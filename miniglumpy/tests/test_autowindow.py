@@ -0,0 +1,82 @@
+""" Tests for robust automatic display window """
+
+import numpy as np
+
+from miniglumpy import Glice
+from miniglumpy.autowindow import AutoWindow
+
+
+def test_percentiles():
+    # Limits are percentiles of the subsample, and ignore outliers
+    rng = np.random.RandomState(6)
+    arr = rng.normal(100, 10, size=(1000, 1200))
+    arr[rng.uniform(size=arr.shape) < 1e-3] = 1e6
+    window = AutoWindow(1, 99, max_samples=2**14)
+    window.set_data(arr)
+    # Cost does not depend on image size
+    assert window._sample.size <= 2**14
+    vmin, vmax = window.limits
+    full_min, full_max = np.percentile(arr, [1, 99])
+    assert abs(vmin - full_min) < 1 and abs(vmax - full_max) < 1
+    assert window.limits is window.limits
+    # Other percentiles
+    window = AutoWindow(10, 90)
+    window.set_data(arr[:100, :100])
+    assert np.allclose(window.limits,
+                       np.percentile(arr[:100, :100], [10, 90]))
+
+
+def test_nonfinite_constant():
+    window = AutoWindow()
+    arr = np.full((50, 50), 3.0)
+    window.set_data(arr)
+    assert window.limits == (3.0, 4.0)
+    arr[10:20] = np.nan
+    arr[30] = np.inf
+    arr[40:] = 5.0
+    window.set_data(arr)
+    assert window.limits[0] == 3.0 and window.limits[1] == 5.0
+    window.set_data(np.full((5, 5), np.nan))
+    assert window.limits == (0.0, 1.0)
+
+
+def test_region_updates():
+    # Region updates give the same subsample and limits as a new subsample
+    rng = np.random.RandomState(7)
+    arr = rng.uniform(size=(300, 400))
+    window = AutoWindow(max_samples=1000)
+    window.set_data(arr)
+    version, limits = window.version, window.limits
+    new = arr.copy()
+    regions = [(13, 7, 50, 31), (250, 200, 200, 200), (0, 299, 400, 1)]
+    for x, y, w, h in regions:
+        new[y:y + h, x:x + w] = rng.uniform(5, 10, size=new[y:y + h,
+                                                              x:x + w].shape)
+    window.set_data(new, regions)
+    assert window.version == version + 1
+    fresh = AutoWindow(max_samples=1000)
+    fresh.set_data(new)
+    assert np.all(window._sample == fresh._sample)
+    assert window.limits == fresh.limits
+    assert window.limits != limits
+    # Changes outside the regions do not reach the subsample
+    new[0, 0] = 1e6
+    window.set_data(new, [(100, 100, 1, 1)])
+    assert np.all(window._sample == fresh._sample)
+
+
+def test_glice_auto_window(gl_window):
+    # Auto window follows data with drifting intensity
+    rng = np.random.RandomState(8)
+    arr = rng.uniform(size=(64, 64)).astype(np.float32)
+    glice = Glice(arr, auto_window=(5, 95))
+    assert np.allclose((glice.vmin, glice.vmax),
+                       np.percentile(arr, [5, 95]))
+    glice.set_data(arr * 100)
+    assert np.allclose((glice.vmin, glice.vmax),
+                       np.percentile(arr * 100, [5, 95]), rtol=1e-5)
+    # Given limits apply at creation only
+    glice = Glice(arr, vmin=0, vmax=2, auto_window=True)
+    assert (glice.vmin, glice.vmax) == (0, 2)
+    glice.set_data(arr)
+    assert np.allclose((glice.vmin, glice.vmax), np.percentile(arr, [1, 99]))
@@ -0,0 +1,22 @@
+""" Tests for batched drawing """
+
+import numpy as np
+
+from miniglumpy import Glice, LayeredGlice, draw_batch
+from miniglumpy.offscreen import OffscreenTarget
+
+from .helpers import render
+
+
+def test_lod_batch_matches_blit(gl_window):
+    arr = np.random.RandomState(3).uniform(size=(300, 500))
+    arr = arr.astype(np.float32)
+    for make in (lambda: Glice(arr, vmin=0, vmax=1, lod='mean'),
+                 lambda: LayeredGlice([Glice(arr, vmin=0, vmax=1,
+                                             lod='mean')])):
+        target = OffscreenTarget(500, 300)
+        with target:
+            target.clear()
+            stats = draw_batch([(make(), 0, 0, 500, 300)])
+        assert stats.draws == 1
+        assert np.all(target.read() == render(make(), 500, 300))
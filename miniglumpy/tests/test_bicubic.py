@@ -0,0 +1,113 @@
+""" Tests for bicubic shaders """
+
+import ctypes
+
+import numpy as np
+import pytest
+
+import pyglet.gl as gl
+
+from miniglumpy import Glice, draw_batch
+from miniglumpy.gshaders import Bicubic
+from miniglumpy.gshaders.bicubic import build_kernel
+from miniglumpy.contexts import context_cache
+from miniglumpy.offscreen import OffscreenTarget
+
+from .helpers import render
+
+
+def max_diff(a, b):
+    return np.abs(a.astype(int) - b.astype(int)).max()
+
+
+@pytest.mark.parametrize('filter', ['bspline', 'catmull-rom', 'lanczos'])
+@pytest.mark.parametrize('shape, size', [((15, 20), (64, 48)),
+                                         ((100, 90), (50, 40))])
+def test_separable_matches_one_pass(gl_window, filter, shape, size):
+    arr = np.random.RandomState(0).uniform(0, 100, shape).astype(np.float32)
+    width, height = size
+    outs = [render(Glice(arr, shader=Bicubic(True, filter=filter,
+                                             separable=separable),
+                         vmin=0, vmax=100), width, height)
+            for separable in (False, True)]
+    # Rounding of texture coordinates can select neighbouring kernel
+    # table entries
+    assert max_diff(*outs) <= 2
+
+
+def test_separable_target_reuse(gl_window):
+    rng = np.random.RandomState(1)
+    shader = Bicubic(True, separable=True)
+    glices = [Glice(rng.uniform(size=shape).astype(np.float32), shader=shader)
+              for shape in ((30, 40), (50, 40))]
+    target = OffscreenTarget(64, 64)
+    with target:
+        for glice in glices:
+            glice.blit(0, 0, 64, 64)
+        pass_targets = dict(shader._pass_targets)
+        assert sorted(pass_targets) == [(64, 30), (64, 50)]
+        # Alternating Glices of different heights reuse their targets
+        for i in range(10):
+            glices[i % 2].blit(0, 0, 64, 64)
+        assert shader._pass_targets == pass_targets
+        # New sizes displace the least recently used
+        for size in range(20, 20 + shader.max_pass_targets):
+            glices[0].blit(0, 0, size, size)
+        assert len(shader._pass_targets) == shader.max_pass_targets
+        assert (64, 30) not in shader._pass_targets
+
+
+def test_separable_restores_texture(gl_window):
+    arr = np.random.RandomState(2).uniform(size=(30, 40)).astype(np.float32)
+    glice = Glice(arr, shader=Bicubic(True, separable=True))
+    target = OffscreenTarget(64, 64)
+    bound = gl.GLint()
+    with target:
+        glice.bind()
+        glice.shader.blit(glice.texture, 0, 0, 64, 64)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D, ctypes.byref(bound))
+        glice.unbind()
+    assert bound.value == glice.texture.id
+
+
+def test_separable_compiles_two_programs(gl_window):
+    programs = context_cache('programs')
+    programs.clear()
+    Bicubic(True, separable=True, filter='mitchell')
+    assert len(programs) == 2
+
+
+def test_separable_batch(gl_window):
+    rng = np.random.RandomState(3)
+    shader = Bicubic(True, separable=True)
+    glices = [Glice(rng.uniform(size=(20, 30)).astype(np.float32),
+                    shader=shader) for i in range(3)]
+    blits = [(glice, i * 40, 0, 40, 32) for i, glice in enumerate(glices)]
+    target = OffscreenTarget(120, 32)
+    with target:
+        target.clear()
+        stats = draw_batch(blits)
+    batched = target.read()
+    with target:
+        target.clear()
+        for blit in blits:
+            blit[0].blit(*blit[1:])
+    assert max_diff(batched, target.read()) == 0
+    assert stats.draws == 3
+
+
+def test_separable_options():
+    with pytest.raises(ValueError):
+        Bicubic(True, lighted=True, separable=True)
+
+
+def test_unknown_filter(gl_window):
+    for filter in ('cubic', (1.0,), ('a', 'b'), 3):
+        with pytest.raises(ValueError) as excinfo:
+            build_kernel(filter=filter)
+        assert 'Unknown filter' in str(excinfo.value)
+        with pytest.raises(ValueError):
+            Bicubic(True, filter=filter)
+    # (B, C) sequences share the kernel of the float tuple
+    assert build_kernel(filter=[1, 0]) == build_kernel(filter=(1.0, 0.0))
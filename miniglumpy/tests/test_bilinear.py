@@ -0,0 +1,32 @@
+""" Tests for the Bilinear shader """
+
+import numpy as np
+import pytest
+
+from miniglumpy import Glice
+from miniglumpy.gshaders import Bilinear
+from miniglumpy.offscreen import OffscreenTarget
+
+from .helpers import render
+
+
+# Under Mesa llvmpipe, hardware filtering of 8 bit textures differs from
+# four fetches by up to 2 levels
+@pytest.mark.parametrize('dtype, tolerance',
+                         [('uint8', 2), ('uint16', 1), ('float32', 1)])
+@pytest.mark.parametrize('elevation', [0.0, 0.5])
+def test_hardware_matches_four_fetch(gl_window, dtype, tolerance, elevation):
+    rng = np.random.RandomState(42)
+    for shape, (width, height) in (((17, 23), (256, 192)),
+                                   ((256, 256), (512, 512)),
+                                   ((1024, 768), (300, 200))):
+        arr = rng.rand(*shape)
+        if dtype != 'float32':
+            arr *= np.iinfo(dtype).max
+        glice = Glice(arr.astype(dtype),
+                      shader=Bilinear(True, elevation=elevation))
+        target = OffscreenTarget(width, height)
+        four_fetch = render(glice, width, height, target).astype(int)
+        glice.shader = Bilinear(True, elevation=elevation, hardware=True)
+        hardware = render(glice, width, height, target)
+        assert np.abs(four_fetch - hardware).max() <= tolerance
@@ -0,0 +1,122 @@
+""" Tests for cine playback """
+
+import numpy as np
+import pytest
+
+from miniglumpy import CinePlayer
+
+from .helpers import read_texture, wait_for
+
+
+class Clock(object):
+    ''' Clock advanced by hand '''
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_frames(n_frames):
+    ''' Frames of shape (8, 10), frame `i` filled with `i` '''
+    frames = np.empty((n_frames, 8, 10), dtype=np.float32)
+    frames[:] = np.arange(n_frames)[:, None, None]
+    return frames
+
+
+def fill_ring(player):
+    ''' Tick until all textures not on screen hold frames ahead '''
+    full = 1 - 1.0 / player.n_textures
+    assert wait_for(lambda: player.tick() or player.occupancy >= full)
+
+
+def shown(player):
+    ''' Frame value in the presented texture '''
+    values = np.unique(read_texture(player.glice.texture))
+    assert len(values) == 1
+    return int(values[0])
+
+
+def test_steady_playback(gl_window):
+    clock = Clock()
+    player = CinePlayer(make_frames(20), fps=10, n_textures=4, clock=clock,
+                        vmin=0, vmax=20)
+    try:
+        assert player.tick()
+        assert player.frame == 0 and shown(player) == 0
+        fill_ring(player)
+        assert player.frame == 0
+        # Playback starts with the next frame
+        player.play()
+        for frame in range(1, 31):
+            assert player.tick()
+            assert player.frame == frame % 20
+            assert shown(player) == frame % 20
+            # No new frame is due until the clock moves on
+            assert not player.tick()
+            fill_ring(player)
+            clock.now += 0.1
+        stats = player.stats
+        assert stats.fps == pytest.approx(10)
+        assert stats.presented == 31 and stats.skipped == 0
+        assert stats.occupancy == 0.75
+        # Each frame uploads once, and presenting costs no upload
+        assert stats.uploads <= 31 + player.n_textures
+    finally:
+        player.close()
+
+
+def test_skip_when_behind(gl_window):
+    # When behind, we present the newest due frame, and do not stall
+    clock = Clock()
+    player = CinePlayer(make_frames(100), fps=10, n_textures=4,
+                        max_uploads=1, loop=False, clock=clock)
+    try:
+        player.tick()
+        fill_ring(player)
+        player.play()
+        clock.now += 0.15
+        # Frames 1 to 3 are on the GPU; frame 2 is due
+        assert player.tick()
+        assert player.frame == 2 and shown(player) == 2
+        assert player.stats.skipped == 1
+        # Far behind; we show the newest frame we have at once, dropping
+        # older frames, and the producer jumps ahead to the playhead
+        clock.now += 5
+        assert player.tick()
+        assert 3 <= player.frame < 52
+        assert wait_for(lambda: player.tick() and player.frame == 52 or
+                        player.frame == 52)
+        assert shown(player) == 52
+        stats = player.stats
+        assert stats.skipped == 52 - (stats.presented - 1)
+        assert stats.uploads < 20
+        # Pause holds the frame; seek shows the given frame
+        player.pause()
+        clock.now += 1
+        assert not player.tick()
+        player.seek(7)
+        assert wait_for(lambda: player.tick() or player.frame == 7)
+        assert player.frame == 7 and shown(player) == 7
+    finally:
+        player.close()
+
+
+def test_iterable_source(gl_window):
+    clock = Clock()
+    frames = make_frames(6)
+    player = CinePlayer(iter(frames), fps=10, n_textures=3, clock=clock)
+    try:
+        player.tick()
+        player.play()
+        for frame in range(1, 6):
+            assert wait_for(lambda: player.tick() or player.frame == frame)
+            assert shown(player) == frame
+            clock.now += 0.1
+        # The source has ended; the last frame stays on screen
+        assert not player.tick()
+        assert shown(player) == 5
+        with pytest.raises(ValueError):
+            player.seek(0)
+    finally:
+        player.close()
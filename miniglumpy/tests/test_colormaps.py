@@ -0,0 +1,65 @@
+""" Tests for colormap registry and shared LUT textures """
+
+import numpy as np
+import pytest
+
+from miniglumpy import Glice
+from miniglumpy.colormaps import (get_cmap, register_cmap, cmap_names,
+                                  lut_texture, LUT_SIZE, _makers, _cmaps)
+from miniglumpy.cpurender import render_glice
+
+from .helpers import render, count_uploads
+
+
+def test_get_cmap():
+    hot = get_cmap('hot')
+    assert hot is get_cmap('hot')
+    assert hot.shape == (LUT_SIZE, 3) and hot.dtype == np.float32
+    assert np.all(hot[0] == 0) and np.all(hot[-1] == 1)
+    assert {'grey', 'hot', 'viridis'} <= set(cmap_names())
+    with pytest.raises(ValueError):
+        get_cmap('no-such-map')
+
+
+def test_register_cmap(gl_window):
+    try:
+        register_cmap('test-red', [[0, 0, 0], [1, 0, 0]])
+        red = get_cmap('test-red')
+        assert np.allclose(red[:, 0], np.linspace(0, 1, LUT_SIZE))
+        assert np.all(red[:, 1:] == 0)
+        lut = lut_texture('test-red')
+        assert lut is lut_texture('test-red')
+        # Registering the name again gives a new LUT
+        register_cmap('test-red', lambda x: np.column_stack((x, x, 0 * x)))
+        assert np.all(get_cmap('test-red')[:, 1] == get_cmap('test-red')[:, 0])
+        assert lut_texture('test-red') is not lut
+    finally:
+        _makers.pop('test-red', None)
+        _cmaps.pop('test-red', None)
+
+
+def test_shared_luts(gl_window):
+    arr = np.random.RandomState(4).uniform(size=(8, 8))
+    first = Glice(arr, cmap='viridis')
+    second = Glice(arr, cmap='viridis')
+    assert second._lut is first._lut
+    # Arrays of equal contents share a LUT
+    colors = np.linspace(0, 1, 30)[:, None] * [1, 0.5, 0.25]
+    assert (Glice(arr, cmap=colors)._lut is
+            Glice(arr, cmap=colors.copy())._lut)
+    assert Glice(arr, cmap=colors[::-1])._lut is not first._lut
+
+
+@pytest.mark.parametrize('cmap', ['grey', 'hot', 'viridis',
+                                  [[0, 0, 1], [0, 1, 0], [1, 0, 0]]])
+def test_cmap_render(gl_window, monkeypatch, cmap):
+    # Colormapped drawing matches the reference renderer; changing colormap
+    # re-uploads no data
+    arr = np.random.RandomState(5).uniform(size=(20, 30)) * 10
+    glice = Glice(arr.astype(np.float32), vmin=1, vmax=9)
+    uploads = count_uploads(monkeypatch, glice.texture)
+    glice.cmap = cmap
+    gpu = render(glice, 30, 20).astype(int)
+    cpu = np.round(render_glice(glice, 30, 20) * 255).astype(int)
+    assert np.abs(gpu - cpu).max() <= 1
+    assert uploads == []
@@ -0,0 +1,49 @@
+""" Tests for per-context caches and deletion of GL objects """
+
+import pyglet.gl as gl
+
+from miniglumpy.contexts import context_cache, current_space, delete_objects
+from miniglumpy.textures import QuadBuffer
+
+
+class FakeSpace(object):
+    pass
+
+
+class FakeContext(object):
+    ''' Context sharing no objects with the real one, drawing with it '''
+    _gl_begin = False
+
+    def __init__(self, space):
+        self.object_space = space
+
+
+def test_delete_without_context(gl_window, monkeypatch):
+    quads = QuadBuffer()
+    quads.set_vertices([[0, 0, 0, 0]])
+    id = quads._id.value
+    monkeypatch.setattr(gl, 'current_context', None)
+    # Teardown with no context must not raise
+    quads.__del__()
+    monkeypatch.undo()
+    assert gl.glIsBuffer(id)
+    delete_objects(current_space(), gl.glDeleteBuffers, [id])
+    assert not gl.glIsBuffer(id)
+
+
+def test_delete_deferred(gl_window, monkeypatch):
+    space = FakeSpace()
+    ids = (gl.GLuint * 2)()
+    gl.glGenBuffers(2, ids)
+    for id in ids:
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, id)
+    gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+    # Objects of another object space wait for a context sharing it
+    delete_objects(space, gl.glDeleteBuffers, ids)
+    assert gl.glIsBuffer(ids[0]) and gl.glIsBuffer(ids[1])
+    context_cache('test')
+    assert gl.glIsBuffer(ids[0]) and gl.glIsBuffer(ids[1])
+    monkeypatch.setattr(gl, 'current_context', FakeContext(space))
+    context_cache('test')
+    monkeypatch.undo()
+    assert not gl.glIsBuffer(ids[0]) and not gl.glIsBuffer(ids[1])
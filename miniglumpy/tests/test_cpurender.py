@@ -0,0 +1,49 @@
+""" Tests for the NumPy reference renderer, against the GL shaders """
+
+import numpy as np
+import pytest
+
+from miniglumpy import Glice, gshaders
+from miniglumpy.cpurender import render, render_glice
+
+from .helpers import render as render_gl
+
+SHADERS = [('nearest', lambda: gshaders.Nearest(True), 0),
+           ('bilinear', lambda: gshaders.Bilinear(True), 1),
+           ('bicubic', lambda: gshaders.Bicubic(True), 2),
+           ('catmull-rom',
+            lambda: gshaders.Bicubic(True, filter='catmull-rom'), 2),
+           ('separable', lambda: gshaders.Bicubic(True, separable=True), 2)]
+
+
+@pytest.mark.parametrize('name, make_shader, tolerance', SHADERS)
+@pytest.mark.parametrize('dtype', [np.float32, np.uint8, np.int16])
+def test_matches_gl(gl_window, name, make_shader, tolerance, dtype):
+    arr = np.random.RandomState(0).uniform(size=(23, 37)) * 100
+    glice = Glice(arr.astype(dtype), shader=make_shader(), vmin=10, vmax=90)
+    for width, height in ((37, 23), (100, 70), (20, 13)):
+        gpu = render_gl(glice, width, height).astype(int)
+        cpu = np.round(render_glice(glice, width, height) * 255).astype(int)
+        assert np.abs(gpu - cpu).max() <= tolerance
+
+
+def test_chunks():
+    arr = np.random.RandomState(1).uniform(size=(40, 30)).astype(np.float32)
+    for interpolation in ('nearest', 'bilinear', 'bicubic'):
+        whole = render(arr, 45, 61, interpolation, chunk_rows=1000)
+        chunked = render(arr, 45, 61, interpolation, chunk_rows=7,
+                         n_threads=3)
+        assert np.all(whole == chunked)
+
+
+def test_chunk_memory():
+    # Only the source rows of each chunk are converted to float
+    tracemalloc = pytest.importorskip('tracemalloc')
+    arr = np.zeros((2000, 2000), dtype=np.uint8)
+    tracemalloc.start()
+    try:
+        render(arr, 100, 100, 'bicubic', vmin=0, vmax=1, chunk_rows=10)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < arr.size * 8 / 4
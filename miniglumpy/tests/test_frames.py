@@ -0,0 +1,66 @@
+""" Tests for frame queue and Glice submit """
+
+import gc
+import threading
+import weakref
+
+import numpy as np
+import pytest
+
+from miniglumpy import Glice
+from miniglumpy.frames import FrameQueue
+
+from .helpers import wait_for
+
+
+def test_close_and_resubmit():
+    queue = FrameQueue(lambda frame: frame * 2, n_workers=2)
+    queue.submit(1)
+    assert wait_for(lambda: queue._ready is not None)
+    assert queue.take() == 2
+    queue.close()
+    assert queue._workers == []
+    queue.submit(2)
+    assert wait_for(lambda: queue._ready is not None)
+    assert queue.take() == 4
+    queue.close()
+
+
+def test_glice_workers_stop(gl_window):
+    n_threads = threading.active_count()
+    glice = Glice(np.zeros((16, 16), np.float32), auto_window=True)
+    glice.submit(np.arange(256.).reshape((16, 16)))
+    assert threading.active_count() == n_threads + 2
+    assert wait_for(lambda: glice._frames._ready is not None)
+    glice.blit(0, 0, 16, 16)
+    assert glice.vmax > 200
+    glice.close()
+    assert threading.active_count() == n_threads
+    # Workers do not keep the Glice alive, and stop when it goes
+    glice.submit(np.ones((16, 16)))
+    ref = weakref.ref(glice)
+    del glice
+    gc.collect()
+    assert ref() is None
+    assert wait_for(lambda: threading.active_count() == n_threads)
+
+
+def test_prepare_error():
+    def prepare(frame):
+        if frame < 0:
+            raise ValueError('bad frame %d' % frame)
+        return frame * 2
+    queue = FrameQueue(prepare, n_workers=2)
+    for frame in (-1, -2):
+        queue.submit(frame)
+        assert wait_for(lambda: queue._ready is not None)
+        with pytest.raises(ValueError):
+            queue.take()
+    # The workers are still running
+    assert all(worker.is_alive() for worker in queue._workers)
+    queue.submit(3)
+    assert wait_for(lambda: queue._ready is not None)
+    assert queue.take() == 6
+    stats = queue.stats
+    assert (stats.errors, stats.delivered, stats.queued) == (2, 1, 0)
+    queue.close()
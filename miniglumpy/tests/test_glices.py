@@ -0,0 +1,37 @@
+""" Tests for Glice """
+
+import numpy as np
+import pytest
+
+from miniglumpy import Glice, gshaders
+
+from .helpers import render, count_uploads
+
+
+@pytest.mark.parametrize('make_shader', (
+    lambda: gshaders.Nearest(True),
+    lambda: gshaders.Bilinear(True),
+    lambda: gshaders.Bicubic(True)))
+@pytest.mark.parametrize('dtype', (np.float32, np.uint8, np.int16))
+def test_shader_window(gl_window, monkeypatch, make_shader, dtype):
+    # Window changes draw as a new Glice with that window, without upload;
+    # in pixel transfer mode, each update uploads.  Pixel transfer integer
+    # textures clamp to the window before interpolation, so we compare with
+    # new Glices in the same mode.
+    arr = (np.random.RandomState(12).uniform(size=(20, 30)) * 100
+           ).astype(dtype)
+    glice = Glice(arr, make_shader(), cmap='hot', vmin=0, vmax=100)
+    transfer = Glice(arr, make_shader(), cmap='hot', vmin=0, vmax=100,
+                     pixel_transfer=True)
+    uploads = count_uploads(monkeypatch, glice.texture)
+    transfer_uploads = count_uploads(monkeypatch, transfer.texture)
+    for vmin, vmax in ((20, 80), (-10, 50), (40, 41)):
+        glice.vmin, glice.vmax = vmin, vmax
+        transfer.vmin, transfer.vmax = vmin, vmax
+        transfer.update()
+        for windowed, pixel_transfer in ((glice, False), (transfer, True)):
+            fresh = Glice(arr, make_shader(), cmap='hot', vmin=vmin,
+                          vmax=vmax, pixel_transfer=pixel_transfer)
+            assert np.all(render(windowed, 45, 30) == render(fresh, 45, 30))
+    assert uploads == []
+    assert len(transfer_uploads) == 3
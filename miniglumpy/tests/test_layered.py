@@ -0,0 +1,70 @@
+""" Tests for LayeredGlice compositing """
+
+import numpy as np
+import pytest
+
+from miniglumpy import Glice, LayeredGlice, gshaders
+from miniglumpy.gshaders import layered_shader
+
+from .helpers import render
+
+WIDTH, HEIGHT = 48, 32
+
+
+def test_one_layer(gl_window):
+    arr = np.random.RandomState(9).uniform(size=(HEIGHT, WIDTH))
+    for shader in (gshaders.Nearest(True), gshaders.Bilinear(True)):
+        glice = Glice(arr, shader, cmap='hot', vmin=0.2, vmax=0.8)
+        layered = LayeredGlice([glice])
+        diff = (render(layered, WIDTH, HEIGHT).astype(int) -
+                render(glice, WIDTH, HEIGHT))
+        assert np.abs(diff).max() <= 1
+
+
+@pytest.mark.parametrize('pixel_transfer', (False, True))
+@pytest.mark.parametrize('dtype', (np.float32, np.uint8))
+def test_composite(gl_window, pixel_transfer, dtype):
+    # The top layer mixes over the bottom with its opacity, where its data
+    # reach the threshold.  The top layer has half the resolution, and
+    # stretches over the blit rectangle.
+    rng = np.random.RandomState(10)
+    base = (rng.uniform(size=(HEIGHT, WIDTH)) * 200).astype(dtype)
+    top_arr = (rng.uniform(size=(HEIGHT // 2, WIDTH // 2)) * 200 +
+               0.5).astype(dtype)
+    bottom = Glice(base, cmap='grey', vmin=0, vmax=200)
+    top = Glice(top_arr, cmap='hot', vmin=50, vmax=150,
+                pixel_transfer=pixel_transfer)
+    threshold, opacity = 100.25, 0.6
+    layered = LayeredGlice([bottom, top], thresholds=[None, threshold],
+                           opacities=[1.0, opacity])
+    under = render(bottom, WIDTH, HEIGHT)[..., :3].astype(float)
+    over = render(top, WIDTH, HEIGHT)[..., :3].astype(float)
+    shown = np.repeat(np.repeat(top_arr >= threshold, 2, 0), 2, 1)
+    assert 0 < shown.mean() < 1
+    alpha = opacity * shown[..., None]
+    expected = under * (1 - alpha) + over * alpha
+    result = render(layered, WIDTH, HEIGHT)
+    assert np.abs(result[..., :3] - expected).max() <= 1.5
+    assert np.all(result[..., 3] == 255)
+    # Each layer keeps its own window
+    top.vmax = 300
+    top.update()
+    over = render(top, WIDTH, HEIGHT)[..., :3].astype(float)
+    expected = under * (1 - alpha) + over * alpha
+    result = render(layered, WIDTH, HEIGHT)
+    assert np.abs(result[..., :3] - expected).max() <= 1.5
+
+
+def test_shared_programs(gl_window):
+    arr = np.zeros((4, 4), dtype=np.float32)
+    nearest = Glice(arr, gshaders.Nearest(True))
+    bilinear = Glice(arr, gshaders.Bilinear(True))
+    first = LayeredGlice([nearest, bilinear])
+    second = LayeredGlice([Glice(arr), Glice(arr, gshaders.Bilinear(True))])
+    assert first.shader is second.shader
+    assert first.shader is layered_shader(['nearest', 'bilinear'])
+    assert LayeredGlice([bilinear, nearest]).shader is not first.shader
+    with pytest.raises(ValueError):
+        LayeredGlice([])
+    with pytest.raises(ValueError):
+        LayeredGlice([Glice(arr, gshaders.Bicubic(True))]).shader
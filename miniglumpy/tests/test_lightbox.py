@@ -0,0 +1,95 @@
+""" Tests for lightbox """
+
+import numpy as np
+import pytest
+
+from miniglumpy import LightboxGlice, Texture2DArray, draw_batch
+from miniglumpy.lightbox import texture_arrays_supported
+from miniglumpy.offscreen import OffscreenTarget
+
+from .helpers import render
+
+
+def modes():
+    ''' `use_array` values the current GL supports '''
+    return [False, True] if texture_arrays_supported() else [False]
+
+
+def test_step_uploads_new_slices(gl_window):
+    vol = np.random.RandomState(0).uniform(size=(30, 12, 10))
+    vol = vol.astype(np.float32)
+    for use_array in modes():
+        lightbox = LightboxGlice(vol, step=3, use_array=use_array,
+                                 vmin=0, vmax=1)
+        assert lightbox.uploads == 10
+        lightbox.set_slices(step=2)
+        # Even slices; 0, 6, 12, 18, 24 are already in the texture
+        assert lightbox.uploads == 20
+        lightbox.set_slices(step=3)
+        assert lightbox.uploads == 20
+        fresh = LightboxGlice(vol, step=3, use_array=use_array,
+                              vmin=0, vmax=1)
+        assert np.all(render(lightbox, 80, 80) == render(fresh, 80, 80))
+
+
+def test_batch_falls_back_to_blit(gl_window):
+    vol = np.random.RandomState(1).uniform(size=(9, 8, 8))
+    lightbox = LightboxGlice(vol.astype(np.float32), vmin=0, vmax=1)
+    target = OffscreenTarget(48, 48)
+    with target:
+        target.clear()
+        stats = draw_batch([(lightbox, 0, 0, 48, 48)])
+    assert stats.draws == 1
+    assert np.all(target.read() == render(lightbox, 48, 48))
+
+
+def test_texture_array_empty(gl_window):
+    if not texture_arrays_supported():
+        pytest.skip('No texture arrays')
+    texture = Texture2DArray.empty((4, 6, 5), np.uint16)
+    assert (texture.depth, texture.height, texture.width) == (4, 6, 5)
+    assert texture.value_scale == Texture2DArray(
+        np.zeros((4, 6, 5), np.uint16)).value_scale
+    texture.set_layer(2, np.ones((6, 5), np.uint16))
+
+
+def test_long_axis(gl_window):
+    # Storage holds the slices shown, not every slice along the axis
+    vol = np.random.RandomState(2).uniform(size=(3000, 8, 6))
+    vol = vol.astype(np.float32)
+    for use_array in modes():
+        lightbox = LightboxGlice(vol, step=200, use_array=use_array,
+                                 vmin=0, vmax=1)
+        assert lightbox.uploads == 15
+        assert lightbox._capacity == 15
+        if not use_array:
+            assert lightbox._atlas.size < 20 * 12 * 10
+        fresh = LightboxGlice(vol[::200], use_array=use_array,
+                              vmin=0, vmax=1)
+        assert np.all(render(lightbox, 60, 64) == render(fresh, 60, 64))
+        # Growing keeps the slices in the texture
+        lightbox.set_slices(step=100)
+        assert lightbox.uploads == 30
+        assert lightbox._capacity == 30
+        fresh = LightboxGlice(vol[::100], use_array=use_array,
+                              vmin=0, vmax=1)
+        assert np.all(render(lightbox, 60, 64) == render(fresh, 60, 64))
+        # Slices not shown give up their slots to new slices
+        lightbox.set_slices(start=50)
+        assert lightbox._capacity == 30
+        assert lightbox.uploads == 60
+        fresh = LightboxGlice(vol[50::100], use_array=use_array,
+                              vmin=0, vmax=1)
+        assert np.all(render(lightbox, 60, 64) == render(fresh, 60, 64))
+
+
+def test_too_many_layers(gl_window):
+    if not texture_arrays_supported():
+        pytest.skip('No texture arrays')
+    vol = np.zeros((3000, 2, 2), dtype=np.uint8)
+    with pytest.raises(ValueError) as excinfo:
+        LightboxGlice(vol, use_array=True)
+    assert 'texture array' in str(excinfo.value)
+    # Atlases fit more small slices
+    lightbox = LightboxGlice(vol, use_array=False)
+    assert lightbox.uploads == 3000
@@ -0,0 +1,99 @@
+""" Tests for shader programs """
+
+import os
+
+import numpy as np
+import pytest
+
+import pyglet.gl as gl
+
+from miniglumpy import Glice, gshaders
+from miniglumpy.contexts import context_cache
+from miniglumpy.gshaders.shader import Shader, _source_key
+
+from .helpers import render, count_gl_calls
+
+VERTEX = '''
+void main()
+{
+    gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
+}
+'''
+
+FRAGMENT = '''
+uniform float level;
+void main()
+{
+    gl_FragColor = vec4(level);
+}
+'''
+
+
+def test_program_sharing(gl_window):
+    # Shaders with identical sources share one linked program
+    programs = context_cache('programs')
+    first = gshaders.Nearest(True, False)
+    n_programs = len(programs)
+    second = gshaders.Nearest(True, False)
+    assert len(programs) == n_programs
+    assert second.handle == first.handle
+    assert second.uniforms is first.uniforms
+    other = gshaders.Nearest(False, False)
+    assert other.handle != first.handle
+
+
+def test_program_binary_cache(gl_window, tmp_path, monkeypatch):
+    # A newly linked program goes to the cache directory, and a later build
+    # loads it without compiling
+    frag = '// %s\n' % tmp_path + FRAGMENT
+    monkeypatch.setattr('miniglumpy.gshaders.shader._program_cache_dir',
+                        str(tmp_path))
+    shader = Shader([VERTEX], [frag])
+    assert shader.linked
+    binaries = os.listdir(str(tmp_path))
+    if not binaries:
+        pytest.skip('GL cannot save program binaries')
+    assert len(binaries) == 1
+    del context_cache('programs')[_source_key([VERTEX], [frag])]
+
+    def no_compile(self, strings, stype):
+        raise AssertionError('Compiled cached program')
+    monkeypatch.setattr(Shader, '_build_shader', no_compile)
+    loaded = Shader([VERTEX], [frag])
+    assert loaded.linked
+    assert loaded.handle != shader.handle
+    assert 'level' in loaded.uniforms
+
+
+def test_skip_uniforms(gl_window, monkeypatch):
+    shader = Shader([VERTEX], ['// skip uniforms\n' + FRAGMENT])
+    calls = count_gl_calls(monkeypatch, 'glUniform1f', 'glUniform2f',
+                           'glUniform3f', 'glUniform4f', 'glUniform1i',
+                           'glUniform2i', 'glUniform3i', 'glUniform4i',
+                           'glUniform1fv', 'glUniformMatrix4fv')
+    shader.bind()
+    shader.set_uniforms(level=0.5)
+    assert calls == ['glUniform1f']
+    value = gl.GLfloat()
+    gl.glGetUniformfv(shader.handle, shader.uniforms['level'], value)
+    assert value.value == 0.5
+    # Same value, and uniforms not in the program, upload nothing
+    shader.set_uniforms(level=0.5, missing=1)
+    shader.uniformf('level', 0.5)
+    assert calls == ['glUniform1f']
+    # A Shader sharing the program knows the value is set
+    Shader([VERTEX], ['// skip uniforms\n' + FRAGMENT]).uniformf('level', 0.5)
+    assert calls == ['glUniform1f']
+    shader.set_uniforms(level=0.25)
+    assert calls == ['glUniform1f'] * 2
+    shader.unbind()
+    # Blitting a Glice again with the same window sets no uniforms
+    glice = Glice(np.random.RandomState(0).uniform(size=(16, 16)))
+    render(glice, 16, 16)
+    del calls[:]
+    render(glice, 16, 16)
+    assert calls == []
+    # A new window sets only bias and scale
+    glice.vmax = 2
+    render(glice, 16, 16)
+    assert calls == ['glUniform1f'] * 2
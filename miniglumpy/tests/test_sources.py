@@ -0,0 +1,73 @@
+""" Tests for slice sources """
+
+import gc
+import threading
+import time
+import weakref
+
+import numpy as np
+import pytest
+
+from miniglumpy.sources import VolumeSource
+
+from .helpers import wait_for
+
+
+class FailingSource(VolumeSource):
+    ''' Source failing slowly to read slice 3 '''
+    def _read(self, key):
+        if key[2] == 3:
+            time.sleep(0.2)
+            raise IOError('cannot read slice 3')
+        return VolumeSource._read(self, key)
+
+
+def test_read_error():
+    vol = np.arange(8 * 4 * 5, dtype=np.float32).reshape((8, 4, 5))
+    source = FailingSource(vol, prefetch=4)
+    assert np.all(source.get_slice(0) == vol[0])
+    errors = []
+
+    def get():
+        try:
+            source.get_slice(3)
+        except IOError as e:
+            errors.append(e)
+    # Slice 3 is prefetching; we must get its error, not wait forever
+    thread = threading.Thread(target=get)
+    thread.daemon = True
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert len(errors) == 1
+    # The prefetch threads carry on
+    assert all(worker.is_alive() for worker in source._workers)
+    assert np.all(source.get_slice(5) == vol[5])
+    assert wait_for(lambda: (0, 0, 7) in source._cache)
+    source.close()
+
+
+def test_shutdown():
+    vol = np.zeros((8, 4, 5), dtype=np.float32)
+    n_threads = threading.active_count()
+    source = VolumeSource(vol, n_workers=2)
+    source.get_slice(0)
+    assert threading.active_count() == n_threads + 2
+    source.close()
+    assert threading.active_count() == n_threads
+    # Reading still works, without prefetch
+    assert np.all(source.get_slice(1) == 0)
+    assert source._pending == {}
+    # Threads do not keep the source alive, and stop when it goes
+    source = VolumeSource(vol, n_workers=2)
+    source.get_slice(0)
+    ref = weakref.ref(source)
+    del source
+    gc.collect()
+    assert ref() is None
+    assert wait_for(lambda: threading.active_count() == n_threads)
+
+
+def test_bad_volume():
+    with pytest.raises(ValueError):
+        VolumeSource(np.zeros((4, 5)))
@@ -0,0 +1,235 @@
+""" Tests for textures """
+
+import ctypes
+
+import numpy as np
+import pytest
+
+import pyglet.gl as gl
+
+from miniglumpy import Glice
+from miniglumpy.contexts import context_cache
+from miniglumpy.textures import (Texture2D, TexturePool, texture_pool,
+                                 merge_regions, value_scale, TextureError)
+
+from .helpers import (render, bound_unpack_buffer, read_texture,
+                      count_gl_calls)
+
+
+def test_stream_new_shape(gl_window):
+    # Streaming set_data with a new shape gets new storage, and must not
+    # upload from ring buffers written for the old storage
+    rng = np.random.RandomState(0)
+    small = rng.uniform(size=(64, 64)).astype(np.float32)
+    large = rng.uniform(size=(128, 96)).astype(np.float32)
+    texture = Texture2D(small, streaming=2)
+    texture.set_data(large)
+    assert (texture.width, texture.height) == (96, 128)
+    assert bound_unpack_buffer() == 0
+    for pixel_transfer in (False, True):
+        streamed = Glice(small, streaming=2, pixel_transfer=pixel_transfer,
+                         vmin=0, vmax=1)
+        streamed.set_data(large)
+        assert bound_unpack_buffer() == 0
+        plain = Glice(large, pixel_transfer=pixel_transfer, vmin=0, vmax=1)
+        assert np.all(render(streamed, 96, 128) == render(plain, 96, 128))
+        # And new dtype
+        streamed.set_data((large * 255).astype(np.uint8))
+        assert bound_unpack_buffer() == 0
+
+
+def test_pool_reuse(gl_window, monkeypatch):
+    # New data of the same shape and type reuses the storage; storage left
+    # by a change of shape, or a deleted texture, goes to the next texture
+    # with that shape and type
+    rng = np.random.RandomState(11)
+    arrs = [rng.uniform(size=(19, 17)).astype(np.float32) for i in range(4)]
+    texture = Texture2D(arrs[0])
+    first_id = texture.id
+    allocations = count_gl_calls(monkeypatch, 'glGenTextures',
+                                 'glTexImage2D')
+    texture.set_data(arrs[1])
+    assert texture.id == first_id and allocations == []
+    assert np.all(read_texture(texture) == arrs[1])
+    texture.set_data(np.zeros((5, 7), dtype=np.float32))
+    assert allocations == ['glGenTextures', 'glTexImage2D']
+    other = Texture2D(arrs[2])
+    assert other.id == first_id
+    assert np.all(read_texture(other) == arrs[2])
+    del other
+    again = Texture2D(arrs[3])
+    assert again.id == first_id
+    assert np.all(read_texture(again) == arrs[3])
+    assert allocations == ['glGenTextures', 'glTexImage2D']
+
+
+def test_stream_ring(gl_window):
+    # Each new array goes into the ring once; the texture takes the previous
+    # frame, and re-uploads without new data take the newest frame from the
+    # ring without writing it again
+    rng = np.random.RandomState(13)
+    arrs = [rng.uniform(size=(24, 32)).astype(np.float32) for i in range(3)]
+    texture = Texture2D(arrs[0], streaming=2)
+    ring = texture.stream
+    assert ring.frames_streamed == 1
+    assert np.all(read_texture(texture) == arrs[0])
+    texture.set_data(arrs[1])
+    assert ring.frames_streamed == 2
+    assert np.all(read_texture(texture) == arrs[0])
+    texture.update()
+    texture.update()
+    assert ring.frames_streamed == 2
+    assert ring.bytes_streamed == 2 * arrs[0].nbytes
+    assert np.all(read_texture(texture) == arrs[1])
+    texture.set_data(arrs[2])
+    texture.update()
+    assert ring.frames_streamed == 3
+    assert np.all(read_texture(texture) == arrs[2])
+    # Pixel transfer window changes re-upload from the ring
+    glice = Glice(arrs[0], streaming=2, pixel_transfer=True, vmin=0, vmax=1)
+    n_frames = glice.stream.frames_streamed
+    glice.vmax = 2
+    glice.update()
+    assert glice.stream.frames_streamed == n_frames
+    fresh = Glice(arrs[0], pixel_transfer=True, vmin=0, vmax=2)
+    assert np.all(render(glice, 32, 24) == render(fresh, 32, 24))
+
+
+def test_pool_per_context(gl_window):
+    pool = texture_pool()
+    assert pool is texture_pool()
+    assert context_cache('textures')['pool'] is pool
+    texture = Texture2D(np.zeros((8, 8), dtype=np.uint8))
+    assert texture._pool is pool
+
+
+def test_pool_max_bytes(gl_window):
+    # 16 x 16 RGBA8 textures take 1024 bytes each; cap the pool at two
+    pool = TexturePool(max_per_key=4, max_bytes=2048)
+    textures = [Texture2D(np.zeros((16, 16, 4), dtype=np.uint8))
+                for i in range(3)]
+    key = textures[0]._key
+    assert pool.storage_bytes(key) == 1024
+    ids = [texture._id for texture in textures]
+    for texture in textures:
+        pool.release(key, texture._id)
+        # The storage now belongs to the pool
+        texture._id = 0
+    assert pool.nbytes == 2048
+    # The oldest release was deleted
+    assert not gl.glIsTexture(ids[0].value)
+    assert gl.glIsTexture(ids[1].value)
+    assert pool.acquire(key) is ids[2]
+    assert pool.nbytes == 1024
+    # Storage larger than the cap is deleted at once
+    big = Texture2D(np.zeros((32, 32, 4), dtype=np.uint8))
+    big_id = big._id
+    pool.release(big._key, big_id)
+    big._id = 0
+    assert not gl.glIsTexture(big_id.value)
+    pool.clear()
+    assert pool.nbytes == 0
+    assert not gl.glIsTexture(ids[1].value)
+    gl.glDeleteTextures(1, ctypes.byref(ids[2]))
+
+
+def test_region_upload(gl_window):
+    # Only the given rectangles upload; the rest keeps the old data.
+    # Overlapping rectangles upload as their bounding box, and rectangles
+    # clip to the texture.
+    rng = np.random.RandomState(1)
+    old = rng.uniform(size=(48, 64)).astype(np.float32)
+    new = rng.uniform(size=(48, 64)).astype(np.float32)
+    regions = [(5, 10, 25, 10), (20, 15, 20, 10), (50, 40, 30, 30)]
+    assert merge_regions(regions) == [(5, 10, 35, 15), (50, 40, 30, 30)]
+    expected = old.copy()
+    for x, y, w, h in merge_regions(regions):
+        expected[y:y + h, x:x + w] = new[y:y + h, x:x + w]
+    texture = Texture2D(old)
+    texture.set_data(new, regions=regions)
+    assert np.all(read_texture(texture) == expected)
+    # Glice regions match a full upload, with and without pixel transfer
+    for pixel_transfer in (False, True):
+        glice = Glice(old, pixel_transfer=pixel_transfer, vmin=0, vmax=1)
+        glice.set_data(new, region=regions)
+        full = Glice(expected, pixel_transfer=pixel_transfer, vmin=0, vmax=1)
+        assert np.all(render(glice, 64, 48) == render(full, 64, 48))
+    # A single rectangle for Glice, uploading through a streaming ring
+    glice = Glice(old, streaming=2, vmin=0, vmax=1)
+    glice.set_data(new, region=regions[0])
+    x, y, w, h = regions[0]
+    expected = old.copy()
+    expected[y:y + h, x:x + w] = new[y:y + h, x:x + w]
+    assert np.all(read_texture(glice.texture) == expected)
+
+
+def test_native_dtypes(gl_window):
+    # Integer and half float arrays upload without conversion, and the GL
+    # sees values scaled by value_scale; they draw as the float32 values
+    rng = np.random.RandomState(2)
+    for dtype, src_type, tol in ((np.uint8, gl.GL_UNSIGNED_BYTE, 1e-7),
+                                 (np.int8, gl.GL_BYTE, 1e-3),
+                                 (np.uint16, gl.GL_UNSIGNED_SHORT, 1e-7),
+                                 (np.int16, gl.GL_SHORT, 1e-7),
+                                 (np.uint32, gl.GL_UNSIGNED_INT, 1e-7),
+                                 (np.float16, gl.GL_HALF_FLOAT, 0)):
+        if np.dtype(dtype).kind == 'f':
+            arr = rng.uniform(-2, 2, size=(32, 48)).astype(dtype)
+        else:
+            # The GL clamps the most negative signed value to -1
+            info = np.iinfo(dtype)
+            low = info.min + 1 if info.min else 0
+            arr = rng.randint(low, info.max, size=(32, 48),
+                              dtype=np.int64).astype(dtype)
+        texture = Texture2D(arr)
+        assert texture.src_type == src_type
+        assert texture.value_scale == value_scale(dtype)
+        expected = arr.astype(np.float64) * value_scale(dtype)
+        assert np.allclose(read_texture(texture), expected, rtol=tol,
+                           atol=tol)
+        vmin, vmax = np.percentile(arr, [10, 90])
+        native = Glice(arr, vmin=vmin, vmax=vmax)
+        as_float = Glice(arr.astype(np.float32), vmin=vmin, vmax=vmax)
+        diff = (render(native, 48, 32).astype(int) -
+                render(as_float, 48, 32))
+        assert np.abs(diff).max() <= 1
+    # Other types upload as float32
+    texture = Texture2D(np.ones((4, 4), dtype=np.float64))
+    assert texture.src_type == gl.GL_FLOAT
+
+
+def test_strided_upload(gl_window):
+    # Views with evenly spaced contiguous rows upload in place, others via
+    # a copy; all read back as a contiguous copy of the view
+    vol = np.arange(20 * 30 * 40, dtype=np.float32).reshape((20, 30, 40))
+    for view, in_place in ((vol[:, 7, :], True),
+                           (vol[3, 5:25, 10:30], True),
+                           (vol[::2, 4, :], True),
+                           (vol[:, :, 3], False),
+                           (vol[3, :, ::2], False)):
+        texture = Texture2D(view)
+        assert np.shares_memory(texture._arr, vol) == in_place
+        assert np.all(read_texture(texture) == np.ascontiguousarray(view))
+    # Regions of a view upload from the view
+    texture = Texture2D(np.zeros((20, 40), dtype=np.float32))
+    view = vol[:, 11, :]
+    texture.set_data(view, regions=[(10, 5, 20, 10)])
+    expected = np.zeros((20, 40), dtype=np.float32)
+    expected[5:15, 10:30] = view[5:15, 10:30]
+    assert np.all(read_texture(texture) == expected)
+
+
+def test_drop_data(gl_window):
+    arr = np.arange(12, dtype=np.float32).reshape((3, 4))
+    texture = Texture2D(arr, keep_data=False)
+    assert texture._arr is None
+    assert np.all(read_texture(texture) == arr)
+    with pytest.raises(TextureError):
+        texture.update()
+    # Streaming textures re-upload from the ring
+    texture = Texture2D(arr, streaming=2, keep_data=False)
+    assert texture._arr is None
+    texture.update()
+    assert np.all(read_texture(texture) == arr)
+    glice = Glice(arr, keep_data=False)
+    assert glice._arr is None and glice.texture._arr is None
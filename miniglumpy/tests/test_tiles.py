@@ -0,0 +1,22 @@
+""" Tests for tiled slices """
+
+import numpy as np
+
+from miniglumpy import Glice, TiledGlice, draw_batch
+from miniglumpy.offscreen import OffscreenTarget
+
+from .helpers import render
+
+
+def test_batch_falls_back_to_blit(gl_window):
+    arr = np.random.RandomState(2).uniform(size=(40, 50)).astype(np.float32)
+    tiled = TiledGlice(arr, vmin=0, vmax=1, tile_size=16)
+    plain = Glice(arr, vmin=0, vmax=1)
+    target = OffscreenTarget(50, 40)
+    with target:
+        target.clear()
+        stats = draw_batch([(tiled, 0, 0, 50, 40), (plain, 0, 0, 10, 10)])
+    assert stats.draws == 2
+    expected = render(tiled, 50, 40)
+    # The batchable Glice draws first, so the tiles cover it
+    assert np.all(target.read() == expected)
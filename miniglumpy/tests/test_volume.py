@@ -0,0 +1,32 @@
+""" Tests for volume textures and VolumeGlice """
+
+import numpy as np
+import pytest
+
+from miniglumpy import Glice, VolumeGlice, gshaders
+
+from .helpers import render, count_uploads
+
+
+@pytest.mark.parametrize('makers, tol', (
+    ((gshaders.Nearest3D, gshaders.Nearest), 0),
+    ((gshaders.Bilinear3D, gshaders.Bilinear), 1)))
+def test_volume_slices(gl_window, monkeypatch, makers, tol):
+    # Each slice draws as a Glice of that slice, with no uploads
+    rng = np.random.RandomState(3)
+    vol = rng.uniform(size=(6, 10, 12)).astype(np.float32)
+    vol_maker, plane_maker = makers
+    vglice = VolumeGlice(vol, shader=vol_maker(True), vmin=0, vmax=1)
+    uploads = count_uploads(monkeypatch, vglice.texture)
+    for axis in range(3):
+        for index in (0, vol.shape[axis] // 2, vol.shape[axis] - 1):
+            vglice.set_slice(index, axis)
+            plane = np.take(vol, index, axis)
+            height, width = plane.shape
+            glice = Glice(plane, plane_maker(True), vmin=0, vmax=1)
+            diff = (render(vglice, width, height).astype(int) -
+                    render(glice, width, height))
+            assert np.abs(diff).max() <= tol
+    assert uploads == []
+    with pytest.raises(IndexError):
+        vglice.set_slice(12, 0)
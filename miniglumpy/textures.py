@@ -5,10 +5,14 @@
 '''
 # Modified from texture.py in glumpy - see COPYING.txt
 
+import ctypes
+
 import numpy as np
 
 import pyglet.gl as gl
 
+from .contexts import context_cache, current_space, delete_objects
+
 class TextureError(Exception):
     pass
 
@@ -35,13 +39,13 @@ def make_texture(arr, format=None):
 
     Returns
     -------
-    texture : Texture1D or Texture2D
+    texture : Texture1D, Texture2D or Texture3D
 
     Raises
     ------
     TextureError
         If the shape of the array does not match the given format, or cannot
-        fit into a 1 or 2D texture.
+        fit into a 1, 2 or 3D texture.
     """
     arr = np.asarray(arr)
     return texmaker_from_shape_fmt(arr.shape, format)(arr)
@@ -59,18 +63,20 @@ def texmaker_from_shape_fmt(shape, format):
         if the final dimension of the shape fits a format, we assume it is that
         format.  For example, if `shape` == (10,4), then we assume this is a 1D
         texture of type 'RGBA' length 10, rather than a 2D texture of type 'A'
-        and size (10,4).
+        and size (10,4).  Likewise, we assume a 3D array is a 2D texture with
+        colors; pass 'A' format for a 3D volume.
 
     Returns
     -------
     tex_maker : callable
-        In fact either ``Texture1D`` class or ``Texture2D`` class
+        In fact one of the ``Texture1D``, ``Texture2D`` or ``Texture3D``
+        classes
 
     Raises
     ------
     TextureError
         If the shape of the array does not match the given format, or cannot
-        fit into a 1 or 2D texture.
+        fit into a 1, 2 or 3D texture.
 
     Examples
     --------
@@ -80,23 +86,31 @@ def texmaker_from_shape_fmt(shape, format):
     True
     >>> texmaker_from_shape_fmt((10,4), 'A') is Texture2D
     True
+    >>> texmaker_from_shape_fmt((10,4,5), 'A') is Texture3D
+    True
+    >>> texmaker_from_shape_fmt((10,4,5,3), None) is Texture3D
+    True
     """
     ndim = len(shape)
-    if ndim > 3:
+    if ndim > 4:
         raise TextureError('Too many dimensions for input array')
     if format is None:
         # Assume 1D for 2D array if last dimension is compatible with colors
         if ndim == 1 or ndim == 2 and shape[-1] <=4:
             return Texture1D
+        if ndim == 4:
+            return Texture3D
         return Texture2D
     # Given format; check last dimension length
     if format == 'A':
         if ndim == 1 or ndim == 2 and shape[-1] == 1:
             return Texture1D
-        if ndim == 2 or shape[-1] == 1:
+        if ndim == 2 or ndim == 3 and shape[-1] == 1:
             return Texture2D
+        if ndim == 3 or shape[-1] == 1:
+            return Texture3D
         raise TextureError('A format array needs to have last dimension 1 '
-                           'or less than 3 dimensions')
+                           'or less than 4 dimensions')
     # Last dimension length has to match expected
     exp_dim = _FMT_TO_DIM[format]
     if shape[-1] != exp_dim:
@@ -104,33 +118,112 @@ def texmaker_from_shape_fmt(shape, format):
                             % (format, exp_dim))
     if ndim == 2:
         return Texture1D
-    return Texture2D
+    if ndim == 3:
+        return Texture2D
+    return Texture3D
 
 
-_DIM_TO_GL_FMTS = {
-    1: (gl.GL_ALPHA, gl.GL_ALPHA16),
-    2: (gl.GL_LUMINANCE_ALPHA, gl.GL_LUMINANCE16_ALPHA16),
-    3: (gl.GL_RGB, gl.GL_RGB16),
-    4: (gl.GL_RGBA, gl.GL_RGBA16)
+# Source format for number of channels in texture array
+_CHANNELS_TO_GL_FMT = {
+    1: gl.GL_ALPHA,
+    2: gl.GL_LUMINANCE_ALPHA,
+    3: gl.GL_RGB,
+    4: gl.GL_RGBA
 }
 
+# Internal formats for 1 to 4 channels, by storage kind
+_U8_FMTS = (gl.GL_ALPHA8, gl.GL_LUMINANCE8_ALPHA8, gl.GL_RGB8, gl.GL_RGBA8)
+_U16_FMTS = (gl.GL_ALPHA16, gl.GL_LUMINANCE16_ALPHA16, gl.GL_RGB16,
+             gl.GL_RGBA16)
+_F16_FMTS = (gl.GL_ALPHA16F_ARB, gl.GL_LUMINANCE_ALPHA16F_ARB,
+             gl.GL_RGB16F_ARB, gl.GL_RGBA16F_ARB)
+_F32_FMTS = (gl.GL_ALPHA32F_ARB, gl.GL_LUMINANCE_ALPHA32F_ARB,
+             gl.GL_RGB32F_ARB, gl.GL_RGBA32F_ARB)
+
+# (dtype, channels) -> (internal format, source format, source type).  Signed
+# types need float storage to keep negative values, and 16 bit signed types
+# need 32 bit float storage to keep their precision.
+_GL_FMTS = {}
+for _dtype, _src_type, _dst_fmts in (
+    (np.uint8, gl.GL_UNSIGNED_BYTE, _U8_FMTS),
+    (np.int8, gl.GL_BYTE, _F16_FMTS),
+    (np.uint16, gl.GL_UNSIGNED_SHORT, _U16_FMTS),
+    (np.int16, gl.GL_SHORT, _F32_FMTS),
+    (np.uint32, gl.GL_UNSIGNED_INT, _F32_FMTS),
+    (np.float16, gl.GL_HALF_FLOAT, _F16_FMTS),
+    (np.float32, gl.GL_FLOAT, _F32_FMTS)):
+    for _channels, _dst_fmt in enumerate(_dst_fmts, 1):
+        _GL_FMTS[np.dtype(_dtype), _channels] = (
+            _dst_fmt, _CHANNELS_TO_GL_FMT[_channels], _src_type)
+
+# Bytes per texel of internal formats
+_FMT_BYTES = {}
+for _dst_fmts, _bytes in ((_U8_FMTS, 1), (_U16_FMTS, 2), (_F16_FMTS, 2),
+                          (_F32_FMTS, 4)):
+    for _channels, _dst_fmt in enumerate(_dst_fmts, 1):
+        _FMT_BYTES[_dst_fmt] = _channels * _bytes
+
+
+def native_dtype(dtype):
+    """ Return dtype we can upload directly for data of type `dtype`
+
+    Examples
+    --------
+    >>> native_dtype(np.int16)
+    dtype('int16')
+    >>> native_dtype(np.float64)
+    dtype('float32')
+    """
+    dtype = np.dtype(dtype).newbyteorder('=')
+    if (dtype, 1) in _GL_FMTS:
+        return dtype
+    return np.dtype(np.float32)
+
+
+def value_scale(dtype):
+    """ Return factor scaling values of `dtype` to GL texture values
+
+    The GL maps unsigned integer types to [0, 1], and signed integer types to
+    [-1, 1].  Floating point values pass through unchanged.
+
+    Examples
+    --------
+    >>> value_scale(np.uint8) == 1. / 255
+    True
+    >>> value_scale(np.int16) == 1. / 32767
+    True
+    >>> value_scale(np.float32)
+    1.0
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'u':
+        return 1. / (2 ** (8 * dtype.itemsize) - 1)
+    if dtype.kind == 'i':
+        return 1. / (2 ** (8 * dtype.itemsize - 1) - 1)
+    return 1.0
+
 
-def fmts_from_shape(shape, texture_dim):
-    """ Return source and destination GL formats from array shape
+def fmts_from_shape(shape, texture_dim, dtype=np.float32):
+    """ Return GL formats and type from array shape and dtype
 
     Parameters
     ----------
     shape : tuple
     texture_dim : int
        shape index that should contain texture.  For 1D textures this will == 2,
-       for 2D arrays `texture_dim` == 3
+       for 2D arrays `texture_dim` == 3, and for 3D arrays `texture_dim` == 4
+    dtype : dtype specifier, optional
+       dtype of array; must be a dtype for which ``native_dtype`` returns the
+       same dtype.
 
     Returns
     -------
     src_format : int
         GL code for source array format
     dst_format : int
-        GL code for destination array format
+        GL code for destination (internal) texture format
+    src_type : int
+        GL code for source array type
     """
     ndim = len(shape)
     if ndim == texture_dim:
@@ -143,20 +236,419 @@ def fmts_from_shape(shape, texture_dim):
     else:
         raise TextureError('Texture must have %s or %s dimensions'
                           % (texture_dim, texture_dim-1))
-    return _DIM_TO_GL_FMTS[t_len]
+    try:
+        dst_format, src_format, src_type = _GL_FMTS[np.dtype(dtype), t_len]
+    except KeyError:
+        raise TextureError('Cannot upload arrays of type %s' % dtype)
+    return src_format, dst_format, src_type
+
+
+def unpack_row_length(arr, texture_dim):
+    """ Return GL unpack row length to upload `arr` in place, or None
+
+    We can upload in place when the pixels in each row are contiguous, and
+    rows are evenly spaced a whole number of pixels apart - as for rows or
+    sub-blocks of a C-contiguous parent array.  3D arrays must be contiguous.
+
+    Parameters
+    ----------
+    arr : ndarray
+    texture_dim : int
+       as for ``fmts_from_shape``
+
+    Returns
+    -------
+    row_length : None or int
+        row length in pixels, or None if we need a copy of `arr` to upload it
+
+    Examples
+    --------
+    >>> vol = np.zeros((4, 5, 6), dtype=np.float32)
+    >>> unpack_row_length(vol[0], 3)
+    6
+    >>> unpack_row_length(vol[:, 2, :], 3)
+    30
+    >>> unpack_row_length(vol[1:3, 1:4, 0], 3) is None
+    True
+    >>> unpack_row_length(vol, 4)
+    6
+    >>> unpack_row_length(vol[:, :3], 4) is None
+    True
+    """
+    shape, strides = arr.shape, arr.strides
+    pixel_bytes = arr.itemsize
+    if arr.ndim == texture_dim:
+        # Last dimension is color channels
+        if shape[-1] > 1 and strides[-1] != pixel_bytes:
+            return None
+        pixel_bytes *= shape[-1]
+        shape, strides = shape[:-1], strides[:-1]
+    if shape[-1] > 1 and strides[-1] != pixel_bytes:
+        return None
+    if len(shape) == 3:
+        if (shape[1] > 1 and strides[1] != shape[2] * pixel_bytes or
+            shape[0] > 1 and strides[0] != shape[1] * shape[2] * pixel_bytes):
+            return None
+        return shape[-1]
+    if len(shape) == 1 or shape[0] == 1:
+        return shape[-1]
+    row_stride = strides[0]
+    if row_stride % pixel_bytes or row_stride < shape[1] * pixel_bytes:
+        return None
+    return row_stride // pixel_bytes
+
+
+def merge_regions(regions):
+    """ Merge overlapping rectangles in `regions`
+
+    Parameters
+    ----------
+    regions : sequence
+        sequence of ``(x, y, width, height)`` rectangles
+
+    Returns
+    -------
+    merged : list
+        list of ``(x, y, width, height)`` rectangles, where each rectangle is
+        the bounding box of a group of overlapping input rectangles, and no
+        two output rectangles overlap.
+
+    Examples
+    --------
+    >>> merge_regions([(0, 0, 4, 4), (2, 2, 4, 4), (10, 10, 1, 1)])
+    [(0, 0, 6, 6), (10, 10, 1, 1)]
+    >>> merge_regions([(0, 0, 2, 2), (2, 0, 2, 2)])
+    [(0, 0, 2, 2), (2, 0, 2, 2)]
+    """
+    boxes = [(x, y, x + w, y + h) for x, y, w, h in regions if w > 0 and h > 0]
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for box in boxes:
+            for i, other in enumerate(out):
+                if (box[0] < other[2] and other[0] < box[2] and
+                    box[1] < other[3] and other[1] < box[3]):
+                    out[i] = (min(box[0], other[0]), min(box[1], other[1]),
+                              max(box[2], other[2]), max(box[3], other[3]))
+                    merged = True
+                    break
+            else:
+                out.append(box)
+        boxes = out
+    return [(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in boxes]
+
+
+class TexturePool(object):
+    """ Store of GL texture storage for reuse
+
+    Textures are keyed on ``(target, size, dst_format, src_format,
+    src_type)``.  A texture object released to the pool keeps its allocated
+    storage, so a later texture with the same key can take it over with
+    ``glTexSubImage*`` alone, skipping ``glGenTextures`` and ``glTexImage*``.
+
+    Texture objects belong to a GL context, so use ``texture_pool`` to get
+    the pool for the current context.  We keep at most `max_per_key` free
+    textures for each key, and at most `max_bytes` of free storage in all,
+    deleting the textures released longest ago first.
+    """
+    def __init__(self, max_per_key=4, max_bytes=128 * 2**20):
+        self.max_per_key = max_per_key
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._free = {}
+        # (key, id) of free textures, oldest release first
+        self._order = []
+        self._space = current_space()
+
+    @staticmethod
+    def storage_bytes(key):
+        """ Return approximate bytes of GL storage for texture `key` """
+        nbytes = _FMT_BYTES[key[2]]
+        for n in key[1]:
+            if n:
+                nbytes *= n
+        return nbytes
+
+    def acquire(self, key):
+        """ Return free texture id for `key`, or None if there is none """
+        ids = self._free.get(key)
+        if not ids:
+            return None
+        id = ids.pop()
+        self._order.remove((key, id))
+        self.nbytes -= self.storage_bytes(key)
+        return id
+
+    def release(self, key, id):
+        """ Return texture `id` with storage matching `key` to the pool """
+        nbytes = self.storage_bytes(key)
+        ids = self._free.setdefault(key, [])
+        if len(ids) >= self.max_per_key or nbytes > self.max_bytes:
+            self._delete([id])
+            return
+        ids.append(id)
+        self._order.append((key, id))
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            old_key, old_id = self._order.pop(0)
+            self._free[old_key].remove(old_id)
+            self.nbytes -= self.storage_bytes(old_key)
+            self._delete([old_id])
+
+    def clear(self):
+        """ Delete all pooled textures """
+        self._delete([id for key, id in self._order])
+        self._free = {}
+        self._order = []
+        self.nbytes = 0
+
+    def _delete(self, ids):
+        delete_objects(self._space, gl.glDeleteTextures,
+                       [id.value for id in ids])
+
+
+def texture_pool():
+    """ Return ``TexturePool`` for the current GL context """
+    pools = context_cache('textures')
+    if 'pool' not in pools:
+        pools['pool'] = TexturePool()
+    return pools['pool']
+
+
+class PixelBufferRing(object):
+    """ Ring of pixel unpack buffers for streaming texture uploads
+
+    Each new frame is copied into the next buffer in the ring, and the texture
+    is updated from the buffer holding the previous frame.  The GL can then
+    run the transfer of the previous frame while we draw, and while we copy
+    the next frame into a buffer the GL is not reading.  The texture therefore
+    lags one frame behind the data; a re-upload without new data (such as
+    ``Texture1D.update``) takes the newest frame.
+
+    Parameters
+    ----------
+    n_buffers : int, optional
+        number of buffers in ring, usually 2 or 3
+    """
+    def __init__(self, n_buffers=2):
+        if n_buffers < 2:
+            raise TextureError('Need at least 2 buffers for streaming')
+        ids = (gl.GLuint * n_buffers)()
+        gl.glGenBuffers(n_buffers, ids)
+        self._ids = ids
+        self._space = current_space()
+        self._head = 0
+        self._latest = None
+        # Storage key of the texture each buffer was written for
+        self._keys = [None] * n_buffers
+        self.bytes_streamed = 0
+        self.frames_streamed = 0
+
+    def __del__(self):
+        delete_objects(self._space, gl.glDeleteBuffers, self._ids)
+
+    @property
+    def n_buffers(self):
+        return len(self._ids)
+
+    def write(self, arr):
+        """ Copy `arr` into next buffer in ring, return buffer index """
+        i = self._head
+        nbytes = arr.nbytes
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, self._ids[i])
+        # Orphan old storage so we don't wait on a transfer still using it
+        gl.glBufferData(gl.GL_PIXEL_UNPACK_BUFFER, nbytes, None,
+                        gl.GL_STREAM_DRAW)
+        ptr = gl.glMapBuffer(gl.GL_PIXEL_UNPACK_BUFFER, gl.GL_WRITE_ONLY)
+        if not ptr:
+            gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+            raise TextureError('Could not map pixel buffer')
+        dst = np.frombuffer((ctypes.c_ubyte * nbytes).from_address(ptr),
+                            dtype=arr.dtype).reshape(arr.shape)
+        dst[...] = arr
+        gl.glUnmapBuffer(gl.GL_PIXEL_UNPACK_BUFFER)
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+        self._head = (i + 1) % len(self._ids)
+        self.bytes_streamed += nbytes
+        self.frames_streamed += 1
+        return i
+
+    def upload(self, texture, fresh=True):
+        """ Upload data for bound `texture` via the ring
+
+        Parameters
+        ----------
+        texture : Texture1D or Texture2D
+            texture to update; must be bound
+        fresh : bool, optional
+            True if the texture array has new data to stream into the ring.
+            Otherwise we re-upload the newest frame already in the ring.
+        """
+        src = self._latest
+        if src is not None and self._keys[src] != texture._key:
+            # Written for other storage, such as before a change of shape
+            src = None
+        if fresh or src is None:
+            if texture._arr is None:
+                raise TextureError('No data to stream; texture does not '
+                                   'keep data')
+            self._latest = self.write(texture._arr)
+            self._keys[self._latest] = texture._key
+        if src is None or not fresh:
+            src = self._latest
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, self._ids[src])
+        try:
+            texture._subimage(None)
+        finally:
+            gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def invalidate(self):
+        """ Mark ring contents as stale, so the next upload writes afresh """
+        self._latest = None
+
+
+def quad_vertices(rects):
+    """ Return vertices for textured quads from sequence of `rects`
+
+    Parameters
+    ----------
+    rects : array-like
+        shape (N, 8) sequence of ``(x, y, w, h, s0, s1, t0, t1)``, giving
+        the window rectangle and texture coordinate ranges of each quad.
+
+    Returns
+    -------
+    vertices : (N*4, 4) float32 array
+        interleaved ``(s, t, x, y)`` vertices, four per quad.  Texture row
+        `t0` is at the top of the quad.
+
+    Examples
+    --------
+    >>> quad_vertices([(0, 0, 2, 3, 0, 1, 0, 1)])
+    array([[0., 1., 0., 0.],
+           [0., 0., 0., 3.],
+           [1., 0., 2., 3.],
+           [1., 1., 2., 0.]], dtype=float32)
+    """
+    rects = np.asarray(rects, dtype=np.float32).reshape(-1, 8)
+    x, y, w, h, s0, s1, t0, t1 = rects.T
+    vertices = np.empty((len(rects), 4, 4), dtype=np.float32)
+    vertices[:, :, 0] = np.column_stack((s0, s0, s1, s1))
+    vertices[:, :, 1] = np.column_stack((t1, t0, t0, t1))
+    vertices[:, :, 2] = np.column_stack((x, x, x + w, x + w))
+    vertices[:, :, 3] = np.column_stack((y, y + h, y + h, y))
+    return vertices.reshape(-1, 4)
+
+
+class QuadBuffer(object):
+    """ Vertex buffer of textured quads
+
+    Holds the vertices from ``quad_vertices`` in a GL buffer, so drawing
+    costs a few GL calls however many quads there are.  ``set_vertices``
+    takes a `key` describing the vertices, and skips the upload when the key
+    has not changed.
+    """
+    def __init__(self):
+        vbo = gl.GLuint()
+        gl.glGenBuffers(1, ctypes.byref(vbo))
+        self._id = vbo
+        self._space = current_space()
+        self.key = None
+        self.n_quads = 0
+        self.uploads = 0
+
+    def __del__(self):
+        delete_objects(self._space, gl.glDeleteBuffers, [self._id.value])
+
+    def set_vertices(self, vertices, key=None):
+        """ Upload `vertices` unless `key` is not None and unchanged """
+        if key is not None and key == self.key:
+            return
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._id)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, vertices.nbytes,
+                        vertices.ctypes.data, gl.GL_DYNAMIC_DRAW)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        self.key = key
+        self.n_quads = len(vertices) // 4
+        self.uploads += 1
+
+    def draw(self, first=0, count=None, instances=None):
+        """ Draw `count` quads starting at quad `first`
+
+        If `instances` is not None, draw the quads `instances` times with
+        one instanced draw call (``GL_ARB_draw_instanced``).
+        """
+        if count is None:
+            count = self.n_quads - first
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._id)
+        gl.glPushClientAttrib(gl.GL_CLIENT_VERTEX_ARRAY_BIT)
+        gl.glEnableClientState(gl.GL_TEXTURE_COORD_ARRAY)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glTexCoordPointer(2, gl.GL_FLOAT, 16, 0)
+        gl.glVertexPointer(2, gl.GL_FLOAT, 16, 8)
+        if instances is None:
+            gl.glDrawArrays(gl.GL_QUADS, first * 4, count * 4)
+        else:
+            gl.glDrawArraysInstancedARB(gl.GL_QUADS, first * 4, count * 4,
+                                        instances)
+        gl.glPopClientAttrib()
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+
+# GL filter and wrap mode by texture filter name
+_FILTERS = {
+    'nearest': (gl.GL_NEAREST, gl.GL_CLAMP),
+    'linear': (gl.GL_LINEAR, gl.GL_CLAMP_TO_EDGE)}
 
 
 class Texture1D(object):
     target = gl.GL_TEXTURE_1D
     _texture_dim = 2
 
-    def __init__(self, arr):
+    def __init__(self, arr=None, streaming=0, keep_data=True, shape=None,
+                 dtype=np.float32):
+        ''' Create texture from array `arr`
+
+        Parameters
+        ----------
+        arr : None or array-like
+            data to upload.  If None, we allocate storage for an array of
+            `shape` and `dtype`, but do not upload.
+        streaming : int, optional
+            If non-zero, upload data asynchronously through a ring of
+            `streaming` pixel buffer objects.  See ``PixelBufferRing``.
+        keep_data : bool, optional
+            If False, drop our reference to the array after each upload, to
+            save host memory.  ``update`` then needs a new array via
+            ``set_data``, unless the texture is `streaming`.
+        shape : None or tuple, optional
+            array shape for storage when `arr` is None
+        dtype : dtype specifier, optional
+            array dtype for storage when `arr` is None
+        '''
         self._id = 0
-        self.set_data(arr)
+        self._key = None
+        self._quads = None
+        self._arr = None
+        self.keep_data = keep_data
+        self.stream = PixelBufferRing(streaming) if streaming else None
+        if arr is not None:
+            self.set_data(arr)
+            return
+        if shape is None:
+            raise TextureError('Need array or shape for texture')
+        dtype = native_dtype(dtype)
+        src_format, dst_format, src_type = fmts_from_shape(
+            shape, self._texture_dim, dtype)
+        self.value_scale = value_scale(dtype)
+        self._setup_storage((self.target, self._tex_size(shape),
+                             dst_format, src_format, src_type))
 
     def __del__(self):
         if self._id:
-            gl.glDeleteTextures(1, gl.byref(self._id))
+            self._pool.release(self._key, self._id)
 
     @property
     def width(self):
@@ -176,107 +668,360 @@ class Texture1D(object):
         '''
         return self._id.value
 
-    def set_data(self, arr):
+    def set_data(self, arr, bias=0.0, scale=1.0, regions=None):
+        ''' Set texture data from `arr`, uploading with `bias` and `scale`
+
+        If the new array has the same texture size, format and type as the
+        current one, we reuse the GL storage and only upload the data.
+        Otherwise we take matching storage from the texture pool, or allocate
+        new storage.
+
+        `regions` is None, or a sequence of ``(x, y, width, height)``
+        rectangles in array (column, row) coordinates that have changed since
+        the last upload.  If the GL storage can be reused, we only upload
+        these rectangles.  See ``Texture1D.update``.
+
+        We upload views into larger arrays in place where we can, such as
+        ``vol[:, k, :]`` from C-contiguous `vol`, and only copy when the
+        element strides need it.
+        '''
         arr = np.asarray(arr)
-        self.src_format, self.dst_format = fmts_from_shape(arr.shape,
-                                                           self._texture_dim)
-        # Float is default type
-        if arr.dtype == np.uint8:
-            arr = np.ascontiguousarray(arr)
-            self.src_type = gl.GL_UNSIGNED_BYTE
-        elif arr.dtype == np.float32:
-            arr = np.ascontiguousarray(arr)
-            self.src_type = gl.GL_FLOAT
-        else:
-            arr = np.astype(np.float32)
-            self.src_type = gl.GL_FLOAT
+        dtype = native_dtype(arr.dtype)
+        src_format, dst_format, src_type = fmts_from_shape(
+            arr.shape, self._texture_dim, dtype)
+        row_length = None
+        if arr.dtype == dtype:
+            row_length = unpack_row_length(arr, self._texture_dim)
+        if row_length is None:
+            # Types without a native upload path go to float32
+            arr = np.ascontiguousarray(arr, dtype=dtype)
+            row_length = unpack_row_length(arr, self._texture_dim)
+        self.value_scale = value_scale(dtype)
         self._arr = arr
+        self._row_length = row_length
+        self._fresh = True
+        key = (self.target, self._tex_size(arr.shape),
+               dst_format, src_format, src_type)
+        if self._id and key == self._key:
+            self.update(bias, scale, regions)
+        else:
+            self._setup_storage(key)
+            self.update(bias, scale)
+        if not self.keep_data:
+            self._arr = None
+
+    def _setup_storage(self, key):
+        ''' Take GL storage for `key` from pool, or allocate new storage '''
+        dst_format, src_format, src_type = key[2:]
         if self._id:
-            gl.glDeleteTextures(1, gl.byref(self._id))
-        id = gl.GLuint()
-        gl.glGenTextures(1, gl.byref(id))
-        self._id = id
+            self._pool.release(self._key, self._id)
+        if self.stream is not None:
+            # The ring holds data for the old storage
+            self.stream.invalidate()
+        self._key = key
+        self.src_format, self.dst_format, self.src_type = (
+            src_format, dst_format, src_type)
+        self._width, self._height = key[1][:2]
+        # Storage goes back to the pool of the context it came from
+        self._pool = texture_pool()
+        id = self._pool.acquire(key)
+        if id is None:
+            id = gl.GLuint()
+            gl.glGenTextures(1, ctypes.byref(id))
+            self._id = id
+            gl.glBindTexture (self.target, self._id)
+            gl.glTexParameterf (self.target,
+                                gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+            gl.glTexParameterf (self.target,
+                                gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+            gl.glTexParameterf (self.target, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP)
+            gl.glTexParameterf (self.target, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP)
+            self._setup_tex()
+            self._filter = 'nearest'
+        else:
+            self._id = id
+            # Pooled storage keeps the filter of its last user
+            self._filter = None
+
+    def set_filter(self, filter):
+        ''' Set texture filter to 'nearest' or 'linear'
+
+        Linear filtering clamps to the edge texels, rather than mixing in
+        the border color.  We skip the GL calls if the texture already has
+        this filter.
+        '''
+        if filter == self._filter:
+            return
+        gl_filter, wrap = _FILTERS[filter]
+        gl.glBindTexture(self.target, self._id)
+        gl.glTexParameteri(self.target, gl.GL_TEXTURE_MIN_FILTER, gl_filter)
+        gl.glTexParameteri(self.target, gl.GL_TEXTURE_MAG_FILTER, gl_filter)
+        gl.glTexParameteri(self.target, gl.GL_TEXTURE_WRAP_S, wrap)
+        gl.glTexParameteri(self.target, gl.GL_TEXTURE_WRAP_T, wrap)
+        self._filter = filter
+
+    def update(self, bias=0.0, scale=1.0, regions=None):
+        ''' Update texture with bias and scale
+
+        Parameters
+        ----------
+        bias : float, optional
+        scale : float, optional
+        regions : None or sequence, optional
+            If not None, a sequence of ``(x, y, width, height)`` rectangles in
+            array (column, row) coordinates.  We merge overlapping rectangles
+            and upload only the merged rectangles, reading directly from the
+            array via the GL unpack row length, without a staging copy.
+        '''
+        gl.glBindTexture(self.target, self._id)
         gl.glPixelStorei (gl.GL_UNPACK_ALIGNMENT, 1)
         gl.glPixelStorei (gl.GL_PACK_ALIGNMENT, 1)
-        gl.glBindTexture (self.target, self._id)
-        gl.glTexParameterf (self.target,
-                            gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
-        gl.glTexParameterf (self.target,
-                            gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
-        gl.glTexParameterf (self.target, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP)
-        gl.glTexParameterf (self.target, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP)
-        self._setup_tex()
-        self.update()
-
-    def update(self, bias=0.0, scale=1.0):
-        ''' Update texture with bias and scale '''
-        gl.glBindTexture(self.target, self._id)
         # Autoscale array using OpenGL pixel transfer parameters
-        if self.src_type == gl.GL_FLOAT:
+        transfer = bias != 0 or scale != 1
+        if transfer:
             gl.glPixelTransferf(gl.GL_ALPHA_SCALE, scale)
             gl.glPixelTransferf(gl.GL_ALPHA_BIAS, bias)
-        self._subimage()
-        if self.src_type == gl.GL_FLOAT:
+        if regions is None and self.stream is not None:
+            self.stream.upload(self, self._fresh)
+        else:
+            if self._arr is None:
+                raise TextureError('No data to upload; texture does not '
+                                   'keep data')
+            gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, self._row_length)
+            if regions is None:
+                self._subimage(self._arr.ctypes.data)
+            else:
+                self._subregions(regions)
+            gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, 0)
+        self._fresh = False
+        if transfer:
             # Reset to default parameters
             gl.glPixelTransferf(gl.GL_ALPHA_SCALE, 1)
             gl.glPixelTransferf(gl.GL_ALPHA_BIAS, 0)
 
+    def _subregions(self, regions):
+        ''' Upload rectangles `regions` straight from the array '''
+        width, height = self._width, max(self._height, 1)
+        pixel_bytes = self._arr.itemsize * (self._arr.size // (width * height))
+        for x, y, w, h in merge_regions(regions):
+            # Clip to texture
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + w, width), min(y + h, height)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            # Offset the data pointer rather than using GL_UNPACK_SKIP_PIXELS
+            # / ROWS, which some drivers (Mesa) ignore when pixel transfer
+            # scale / bias are active.
+            offset = (y0 * self._row_length + x0) * pixel_bytes
+            self._subimage(self._arr.ctypes.data + offset,
+                           (x0, y0, x1 - x0, y1 - y0))
+        if self.stream is not None:
+            # The ring no longer holds the current data
+            self.stream.invalidate()
+
     # The following are class-specific implementations
 
+    @staticmethod
+    def _tex_size(shape):
+        ''' Return (width, height) of texture for array `shape` '''
+        return shape[0], 0
+
     def _setup_tex(self):
-        self._width, self._height = self._arr.shape[0], 0
         gl.glTexImage1D (self.target, 0,
                          self.dst_format,
                          self._width, 0,
                          self.src_format, self.src_type, 0)
 
-    def _subimage(self):
-        gl.glTexSubImage1D (self.target, 0, 0,
-                            self._width,
+    def _subimage(self, data, region=None):
+        x, w = (0, self._width) if region is None else (region[0], region[2])
+        gl.glTexSubImage1D (self.target, 0, x,
+                            w,
                             self.src_format,
                             self.src_type,
-                            self._arr.ctypes.data)
+                            data)
 
-    def blit(self, x, y, w, h, z=0, s=(0,1), **kwargs):
-        ''' Draw texture to active framebuffer. '''
+    def bind(self):
+        ''' Enable and bind texture for fixed function drawing '''
+        gl.glDisable (gl.GL_TEXTURE_3D)
         gl.glDisable (gl.GL_TEXTURE_2D)
         gl.glEnable (gl.GL_TEXTURE_1D)
         gl.glBindTexture(self.target, self._id)
-        gl.glBegin(gl.GL_QUADS)
-        gl.glTexCoord1f(s[0]), gl.glVertex2f(x,   y)
-        gl.glTexCoord1f(s[0]), gl.glVertex2f(x,   y+h)
-        gl.glTexCoord1f(s[1]), gl.glVertex2f(x+w, y+h)
-        gl.glTexCoord1f(s[1]), gl.glVertex2f(x+w, y)
-        gl.glEnd()
+
+    def blit(self, x, y, w, h, z=0, s=(0,1), t=(0,1), **kwargs):
+        ''' Draw texture to active framebuffer.
+
+        The quad vertices live in a vertex buffer, which we only refill when
+        the rectangle or texture coordinates change.
+        '''
+        self.bind()
+        key = (x, y, w, h, tuple(s), tuple(t))
+        if self._quads is None:
+            self._quads = QuadBuffer()
+        if key != self._quads.key:
+            self._quads.set_vertices(
+                quad_vertices([(x, y, w, h) + key[4] + key[5]]), key)
+        self._quads.draw()
 
 
 class Texture2D(Texture1D):
     target = gl.GL_TEXTURE_2D
     _texture_dim = 3
 
+    @staticmethod
+    def _tex_size(shape):
+        return shape[1], shape[0]
+
     def _setup_tex(self):
-        self._height, self._width = self._arr.shape
         gl.glTexImage2D (self.target, 0, self.dst_format,
                          self._width, self._height, 0,
                          self.src_format, self.src_type, 0)
-        self.update()
 
-    def _subimage(self):
-        gl.glTexSubImage2D (self.target, 0, 0, 0,
-                            self._arr.shape[1],
-                            self._arr.shape[0],
+    def _subimage(self, data, region=None):
+        if region is None:
+            region = (0, 0, self._width, self._height)
+        x, y, w, h = region
+        gl.glTexSubImage2D (self.target, 0, x, y,
+                            w,
+                            h,
                             self.src_format,
                             self.src_type,
-                            self._arr.ctypes.data)
+                            data)
 
-    def blit(self, x, y, w, h, z=0, s=(0,1), **kwargs):
-        ''' Draw texture to active framebuffer. '''
+    def bind(self):
+        ''' Enable and bind texture for fixed function drawing '''
+        gl.glDisable (gl.GL_TEXTURE_3D)
         gl.glEnable (gl.GL_TEXTURE_2D)
         gl.glDisable (gl.GL_TEXTURE_1D)
         gl.glBindTexture(self.target, self._id)
-        gl.glBegin(gl.GL_QUADS)
-        gl.glTexCoord2f(s[0], 1), gl.glVertex2f(x,   y)
-        gl.glTexCoord2f(s[0], 0), gl.glVertex2f(x,   y+h)
-        gl.glTexCoord2f(s[1], 0), gl.glVertex2f(x+w, y+h)
-        gl.glTexCoord2f(s[1], 1), gl.glVertex2f(x+w, y)
-        gl.glEnd()
+
+
+class Texture3D(Texture2D):
+    ''' Volume texture from array of shape (depth, height, width[, colors])
+
+    Upload the whole volume once, and select slices on the GPU with the
+    ``gshaders.Nearest3D`` or ``gshaders.Bilinear3D`` shaders.
+    '''
+    target = gl.GL_TEXTURE_3D
+    _texture_dim = 4
+
+    @property
+    def depth(self):
+        return self._depth
+
+    @staticmethod
+    def _tex_size(shape):
+        return shape[2], shape[1], shape[0]
+
+    def _setup_storage(self, key):
+        self._depth = key[1][2]
+        Texture2D._setup_storage(self, key)
+
+    def _setup_tex(self):
+        gl.glTexParameterf (self.target, gl.GL_TEXTURE_WRAP_R, gl.GL_CLAMP)
+        gl.glTexImage3D (self.target, 0, self.dst_format,
+                         self._width, self._height, self._depth, 0,
+                         self.src_format, self.src_type, 0)
+
+    def _subimage(self, data, region=None):
+        if region is not None:
+            raise TextureError('Cannot upload regions of 3D textures')
+        gl.glTexSubImage3D (self.target, 0, 0, 0, 0,
+                            self._width, self._height, self._depth,
+                            self.src_format,
+                            self.src_type,
+                            data)
+
+    def _subregions(self, regions):
+        raise TextureError('Cannot upload regions of 3D textures')
+
+    def bind(self):
+        ''' Enable and bind texture for fixed function drawing '''
+        gl.glEnable (gl.GL_TEXTURE_3D)
+        gl.glBindTexture(self.target, self._id)
+
+
+class Texture2DArray(Texture3D):
+    ''' Array of 2D texture layers from array of shape (layers, height, width[,
+    colors])
+
+    Needs the ``GL_EXT_texture_array`` extension.  Texture arrays have no
+    fixed function drawing; draw layers with the ``gshaders.LightboxShader``
+    shaders.  ``set_layer`` uploads a single layer.
+    '''
+    target = gl.GL_TEXTURE_2D_ARRAY
+
+    @classmethod
+    def empty(klass, shape, dtype=np.float32):
+        ''' Return texture with storage for array `shape`, `dtype`
+
+        We allocate the storage, but do not upload; fill layers with
+        ``set_layer``.
+        '''
+        return klass(shape=shape, dtype=dtype, keep_data=False)
+
+    def _setup_tex(self):
+        gl.glTexImage3D (self.target, 0, self.dst_format,
+                         self._width, self._height, self._depth, 0,
+                         self.src_format, self.src_type, 0)
+
+    def set_layer(self, index, arr):
+        ''' Upload 2D array `arr` to layer `index`
+
+        `arr` must have the texture width, height, format and type, after
+        conversion with ``native_dtype``.  We upload views such as
+        ``vol[:, k, :]`` in place, as for ``set_data``.
+        '''
+        arr = np.asarray(arr)
+        dtype = native_dtype(arr.dtype)
+        src_format, dst_format, src_type = fmts_from_shape(
+            arr.shape, self._texture_dim - 1, dtype)
+        if ((arr.shape[1], arr.shape[0]) != (self._width, self._height) or
+            (dst_format, src_format, src_type) != self._key[2:]):
+            raise TextureError('Layer shape or type does not match texture')
+        if not 0 <= index < self._depth:
+            raise TextureError('Layer index %d out of range' % index)
+        row_length = None
+        if arr.dtype == dtype:
+            row_length = unpack_row_length(arr, self._texture_dim - 1)
+        if row_length is None:
+            arr = np.ascontiguousarray(arr, dtype=dtype)
+            row_length = unpack_row_length(arr, self._texture_dim - 1)
+        gl.glBindTexture(self.target, self._id)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, row_length)
+        gl.glTexSubImage3D (self.target, 0, 0, 0, index,
+                            self._width, self._height, 1,
+                            self.src_format,
+                            self.src_type,
+                            arr.ctypes.data)
+        gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, 0)
+
+    def copy_layers(self, other):
+        ''' Copy layers of texture array `other` to our first layers
+
+        `other` must have our width, height and formats, and no more layers
+        than we have.  We read `other` back from the GL as floats, which
+        keep the values of all our storage formats, so we need no host copy
+        of the data.
+        '''
+        if ((other.width, other.height) != (self._width, self._height) or
+            other._key[2:] != self._key[2:] or other.depth > self._depth):
+            raise TextureError('Texture array does not fit in this one')
+        channels = [n for n, fmt in _CHANNELS_TO_GL_FMT.items()
+                    if fmt == self.src_format][0]
+        data = np.empty((other.depth, self._height, self._width, channels),
+                        dtype=np.float32)
+        gl.glBindTexture(self.target, other.id)
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+        gl.glGetTexImage(self.target, 0, self.src_format, gl.GL_FLOAT,
+                         data.ctypes.data)
+        gl.glBindTexture(self.target, self._id)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glTexSubImage3D(self.target, 0, 0, 0, 0,
+                           self._width, self._height, other.depth,
+                           self.src_format, gl.GL_FLOAT, data.ctypes.data)
+
+    def bind(self):
+        ''' Bind texture; texture arrays cannot be enabled for fixed function
+        drawing '''
+        gl.glBindTexture(self.target, self._id)
@@ -0,0 +1,239 @@
+""" Tiled GL slice for images larger than one texture """
+
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+import pyglet.gl as gl
+
+from .textures import Texture2D, native_dtype, value_scale
+from .glices import Glice
+
+
+def tile_bounds(index, tile_size, border, length):
+    ''' Return array bounds of tile `index` and of its texture
+
+    Parameters
+    ----------
+    index : int
+        tile index along axis
+    tile_size : int
+        tile size along axis
+    border : int
+        number of texels from neighbouring tiles to include in texture
+    length : int
+        array length along axis
+
+    Returns
+    -------
+    start, stop : int
+        bounds of array elements the tile draws
+    tex_start, tex_stop : int
+        bounds of array elements in tile texture
+
+    Examples
+    --------
+    >>> tile_bounds(0, 4, 2, 10)
+    (0, 4, 0, 6)
+    >>> tile_bounds(2, 4, 2, 10)
+    (8, 10, 6, 10)
+    '''
+    start = index * tile_size
+    stop = min(start + tile_size, length)
+    return start, stop, max(start - border, 0), min(stop + border, length)
+
+
+class TiledGlice(Glice):
+    ''' GL slice object for arrays larger than fit in one texture
+
+    Splits the array into `tile_size` square tiles, each drawn from its own
+    ``Texture2D``.  ``blit`` uploads only the tiles intersecting the
+    viewport, and we keep uploaded tiles until their texture memory would
+    exceed `gpu_bytes`, when we reuse the textures of the least recently
+    drawn tiles.
+
+    Each tile texture includes `border` texels from the neighbouring tiles,
+    so interpolating shaders see the same texels at tile edges as they
+    would in one big texture, and draw no seams.  Bilinear interpolation
+    needs a border of 1, bicubic needs 2.
+
+    The window applies in the shader; there is no pixel transfer mode.
+    TiledGlice draws with ``blit``; ``draw_batch`` calls ``blit`` for it.
+    '''
+    batchable = False
+
+    def __init__(self, arr, shader=None, cmap=None, vmin=None, vmax=None,
+                 tile_size=512, border=2, gpu_bytes=256 * 2**20):
+        ''' Create tiled GL slice object from 2D array `arr`
+
+        `vmin` and `vmax` default to the range of a strided subsample of
+        `arr`, so we do not read all of a large memory mapped array.  Other
+        parameters are as for ``Glice``.
+        '''
+        self.tile_size = tile_size
+        self.border = border
+        self.gpu_bytes = gpu_bytes
+        self.pixel_transfer = False
+        self.keep_data = True
+        self.source = None
+        self.auto_window = None
+        self._frames = self._frame_queue()
+        self.uploads = 0
+        self.tiles_drawn = 0
+        self._tiles = OrderedDict()
+        self._nbytes = 0
+        self._version = 0
+        self.set_data(arr)
+        if shader is None:
+            shader = self._default_shader()
+        self.shader = shader
+        self.cmap = cmap
+        if vmin is None or vmax is None:
+            step = max(int(math.sqrt(arr.shape[0] * arr.shape[1] / 1e6)), 1)
+            sample = arr[::step, ::step]
+            if vmin is None:
+                vmin = sample.min()
+            if vmax is None:
+                vmax = sample.max()
+        self.vmin, self.vmax = vmin, vmax
+
+    @property
+    def value_scale(self):
+        return self._value_scale
+
+    @property
+    def n_tiles(self):
+        ''' Number of tiles along (rows, columns) '''
+        rows, cols = self._arr.shape[:2]
+        return (-(-rows // self.tile_size), -(-cols // self.tile_size))
+
+    @property
+    def nbytes(self):
+        ''' Bytes of texture memory held by tiles '''
+        return self._nbytes
+
+    def set_data(self, arr, region=None):
+        ''' Set new data from `arr`
+
+        Tiles upload again as they next come into view, reusing their
+        textures.  We ignore `region`.
+        '''
+        self._arr = arr
+        dtype = native_dtype(arr.dtype)
+        self._value_scale = value_scale(dtype)
+        colors = arr.shape[2] if arr.ndim == 3 else 1
+        self._pixel_bytes = dtype.itemsize * colors
+        self._version += 1
+
+    def _upload_data(self, arr, region=None):
+        self.set_data(arr)
+
+    def _tile_data(self, key):
+        ''' Array data for tile texture at (row, column) index `key` '''
+        rows, cols = self._arr.shape[:2]
+        r0, r1, tr0, tr1 = tile_bounds(key[0], self.tile_size,
+                                       self.border, rows)
+        c0, c1, tc0, tc1 = tile_bounds(key[1], self.tile_size,
+                                       self.border, cols)
+        return self._arr[tr0:tr1, tc0:tc1]
+
+    def _tile(self, key, visible):
+        ''' Return texture for tile `key`, uploading if necessary
+
+        Move tile to most recently used.  If a new tile would take us over
+        the byte budget, reuse the texture of the least recently used tile
+        not in `visible`.
+        '''
+        entry = self._tiles.pop(key, None)
+        if entry is not None and entry[2] == self._version:
+            self._tiles[key] = entry
+            return entry[0]
+        data = self._tile_data(key)
+        nbytes = data.shape[0] * data.shape[1] * self._pixel_bytes
+        if entry is not None:
+            texture = entry[0]
+            self._nbytes -= entry[1]
+            texture.set_data(data)
+        else:
+            texture = None
+            if self._tiles and self._nbytes + nbytes > self.gpu_bytes:
+                old_key = next(iter(self._tiles))
+                if old_key not in visible:
+                    texture, old_nbytes, version = self._tiles.pop(old_key)
+                    self._nbytes -= old_nbytes
+                    texture.set_data(data)
+            if texture is None:
+                texture = Texture2D(data)
+        self.uploads += 1
+        self._nbytes += nbytes
+        self._tiles[key] = (texture, nbytes, self._version)
+        return texture
+
+    def _evict(self, visible):
+        ''' Drop least recently used tiles not in `visible` over budget '''
+        while self._nbytes > self.gpu_bytes:
+            old_key = next(iter(self._tiles))
+            if old_key in visible:
+                break
+            texture, nbytes, version = self._tiles.pop(old_key)
+            self._nbytes -= nbytes
+
+    def visible_tiles(self, x, y, w, h, viewport=None):
+        ''' Return (row, column) indices of tiles visible for blit
+
+        Parameters
+        ----------
+        x, y, w, h : float
+            blit rectangle, in window coordinates
+        viewport : None or sequence, optional
+            ``(x, y, width, height)`` of visible window area.  None means
+            the GL viewport.  We assume a projection mapping window
+            coordinates to pixels, as set by the pyglet default
+            ``on_resize``.
+        '''
+        if viewport is None:
+            viewport = (gl.GLint * 4)()
+            gl.glGetIntegerv(gl.GL_VIEWPORT, viewport)
+        vx, vy, vw, vh = viewport
+        rows, cols = self._arr.shape[:2]
+        # Scale from array elements to window coordinates
+        sx, sy = w / float(cols), h / float(rows)
+        # Visible array bounds; row 0 is at the top
+        c0, c1 = (vx - x) / sx, (vx + vw - x) / sx
+        r0, r1 = (y + h - vy - vh) / sy, (y + h - vy) / sy
+        n_rows, n_cols = self.n_tiles
+        ts = float(self.tile_size)
+        i0, i1 = max(int(r0 // ts), 0), min(int(math.ceil(r1 / ts)), n_rows)
+        j0, j1 = max(int(c0 // ts), 0), min(int(math.ceil(c1 / ts)), n_cols)
+        return [(i, j) for i in range(i0, i1) for j in range(j0, j1)]
+
+    def blit(self, x, y, w, h, viewport=None):
+        ''' Blit visible tiles onto active framebuffer
+
+        See ``visible_tiles`` for `viewport`.
+        '''
+        self._apply_frame()
+        visible = self.visible_tiles(x, y, w, h, viewport)
+        visible_set = set(visible)
+        rows, cols = self._arr.shape[:2]
+        sx, sy = w / float(cols), h / float(rows)
+        bias, scale = self._bias_scale()
+        for key in visible:
+            texture = self._tile(key, visible_set)
+            r0, r1, tr0, tr1 = tile_bounds(key[0], self.tile_size,
+                                           self.border, rows)
+            c0, c1, tc0, tc1 = tile_bounds(key[1], self.tile_size,
+                                           self.border, cols)
+            # Texture coordinates of drawn part, inside the border
+            s = ((c0 - tc0) / float(texture.width),
+                 (c1 - tc0) / float(texture.width))
+            t = ((r0 - tr0) / float(texture.height),
+                 (r1 - tr0) / float(texture.height))
+            self.shader.bind(texture, self._lut, bias, scale)
+            self.shader.blit(texture, x + c0 * sx, y + h - r1 * sy,
+                             (c1 - c0) * sx, (r1 - r0) * sy, s=s, t=t)
+        if visible:
+            self.shader.unbind()
+        self.tiles_drawn = len(visible)
+        self._evict(visible_set)
@@ -26,7 +26,7 @@ setup(name='miniglumpy',
       author='Matthew Brett modifying/copying glumpy by Nicolas P. Rougier',
       author_email='matthew.brett@gmail.com',
       url='http://github.com/matthew-brett/miniglumpy',
-      packages=['miniglumpy', 'miniglumpy.gshaders'],
+      packages=['miniglumpy', 'miniglumpy.gshaders', 'miniglumpy.tests'],
       package_data = {'miniglumpy':
                       [pjoin('gshaders', '*.txt'),
                       ]},